@@ -0,0 +1,247 @@
+"""
+Typed PR snapshots and the partial GitHub schemas they are decoded from.
+
+GitHub responses are decoded with msgspec straight into the ``Wire*`` and
+``GraphQL*`` structs below, which declare only the fields the app reads;
+the decoder skips everything else instead of building dicts for it.
+``PRSnapshot`` is the compact, immutable result shared by the prompt
+builders, the classifier, the templates and the PR store. Accounts and
+labels repeat across commits and PRs, so they are interned.
+"""
+from typing import Any, Dict, List, Optional, Tuple, TypeVar, Union
+
+import msgspec
+
+# --- REST wire schemas ---
+
+
+class WireUser(msgspec.Struct):
+    login: str = ""
+    avatar_url: str = ""
+
+
+class WireLabel(msgspec.Struct):
+    name: str = ""
+
+
+class WireRef(msgspec.Struct):
+    sha: str = ""
+
+
+class WirePullRequest(msgspec.Struct):
+    """A pull request as returned by ``/pulls/{n}`` (and, without the counts, ``/pulls``)."""
+    number: int = 0
+    title: Optional[str] = None
+    body: Optional[str] = None
+    user: Optional[WireUser] = None
+    assignees: List[WireUser] = []
+    state: str = "open"
+    created_at: str = ""
+    updated_at: str = ""
+    head: Optional[WireRef] = None
+    additions: int = 0
+    deletions: int = 0
+    changed_files: int = 0
+
+
+class WireFile(msgspec.Struct):
+    """A changed file (its patch is not decoded)."""
+    filename: str = ""
+    status: str = "modified"
+    additions: int = 0
+    deletions: int = 0
+
+
+class WireCommit(msgspec.Struct):
+    """A PR commit's GitHub accounts (null when the git identity is not linked)."""
+    author: Optional[WireUser] = None
+    committer: Optional[WireUser] = None
+
+
+# --- GraphQL wire schemas (camelCase fields) ---
+
+
+class GraphQLUser(msgspec.Struct, rename="camel"):
+    login: str = ""
+    avatar_url: str = ""
+
+
+class GraphQLActor(msgspec.Struct):
+    user: Optional[GraphQLUser] = None
+
+
+class GraphQLCommitActors(msgspec.Struct):
+    author: Optional[GraphQLActor] = None
+    committer: Optional[GraphQLActor] = None
+
+
+class GraphQLCommitNode(msgspec.Struct):
+    commit: GraphQLCommitActors
+
+
+class GraphQLUserNodes(msgspec.Struct):
+    nodes: List[GraphQLUser] = []
+
+
+class GraphQLLabelNodes(msgspec.Struct):
+    nodes: List[WireLabel] = []
+
+
+class GraphQLCommitNodes(msgspec.Struct):
+    nodes: List[GraphQLCommitNode] = []
+
+
+class GraphQLFile(msgspec.Struct, rename="camel"):
+    path: str = ""
+    change_type: str = "MODIFIED"
+    additions: int = 0
+    deletions: int = 0
+
+
+class GraphQLFileNodes(msgspec.Struct):
+    nodes: List[GraphQLFile] = []
+
+
+class GraphQLPullRequest(msgspec.Struct, rename="camel"):
+    title: Optional[str] = None
+    body: Optional[str] = None
+    state: str = "OPEN"
+    created_at: str = ""
+    updated_at: str = ""
+    head_ref_oid: str = ""
+    additions: int = 0
+    deletions: int = 0
+    changed_files: int = 0
+    author: Optional[GraphQLUser] = None
+    assignees: GraphQLUserNodes = msgspec.field(default_factory=GraphQLUserNodes)
+    labels: GraphQLLabelNodes = msgspec.field(default_factory=GraphQLLabelNodes)
+    commits: GraphQLCommitNodes = msgspec.field(default_factory=GraphQLCommitNodes)
+    files: GraphQLFileNodes = msgspec.field(default_factory=GraphQLFileNodes)
+
+
+class GraphQLRepository(msgspec.Struct, rename="camel"):
+    pull_request: Optional[GraphQLPullRequest] = None
+
+
+class GraphQLData(msgspec.Struct):
+    repository: Optional[GraphQLRepository] = None
+
+
+class GraphQLResponse(msgspec.Struct):
+    data: Optional[GraphQLData] = None
+    errors: Optional[List[Any]] = None
+
+
+# --- Snapshot ---
+
+
+class Account(msgspec.Struct, frozen=True, gc=False):
+    """A GitHub user referenced by a PR (author, assignee)."""
+    login: str
+    avatar_url: str = ""
+
+
+class Label(msgspec.Struct, frozen=True, gc=False):
+    name: str
+
+
+class Contributor(msgspec.Struct, frozen=True, gc=False):
+    """A commit author or committer and their number of commits in the PR."""
+    login: str
+    name: str = ""
+    email: str = ""
+    avatar_url: str = ""
+    contributions: int = 0
+
+
+class ChangedFile(msgspec.Struct, frozen=True, gc=False):
+    """A file changed by the PR and its line counts."""
+    path: str
+    status: str = "modified"
+    additions: int = 0
+    deletions: int = 0
+
+
+class PRSnapshot(msgspec.Struct, frozen=True):
+    """Everything the app reads about one version of a PR."""
+    title: str = "Unknown PR"
+    # GitHub sends null for PRs without a description
+    body: Optional[str] = None
+    user: Optional[Account] = None
+    assignees: Tuple[Account, ...] = ()
+    labels: Tuple[Label, ...] = ()
+    state: str = "open"
+    created_at: str = ""
+    updated_at: str = ""
+    head_sha: str = ""
+    changed_files: int = 0
+    additions: int = 0
+    deletions: int = 0
+    repository: str = ""
+    pr_number: int = 0
+    contributors: Tuple[Contributor, ...] = ()
+    # Empty when unknown; may be shorter than changed_files for very large PRs
+    files: Tuple[ChangedFile, ...] = ()
+
+
+_T = TypeVar("_T")
+
+# Shared instances of equal accounts and labels; reset when it reaches the cap
+INTERN_MAX_ENTRIES = 65536
+_interned: Dict[Any, Any] = {}
+
+
+def intern(value: _T) -> _T:
+    """Return the shared instance equal to ``value`` (a frozen struct)."""
+    shared = _interned.get(value)
+    if shared is None:
+        if len(_interned) >= INTERN_MAX_ENTRIES:
+            _interned.clear()
+        shared = _interned[value] = value
+    return shared
+
+
+def to_account(user: Optional[Any]) -> Optional[Account]:
+    """Interned ``Account`` for a REST or GraphQL user (None for ghosts and unlinked identities)."""
+    if user is None or not user.login:
+        return None
+    return intern(Account(user.login, user.avatar_url))
+
+
+def to_labels(wire_labels: List[WireLabel]) -> Tuple[Label, ...]:
+    """Interned labels from REST or GraphQL label objects."""
+    return tuple(intern(Label(label.name)) for label in wire_labels)
+
+
+def interned(snapshot: PRSnapshot) -> PRSnapshot:
+    """Share the accounts and labels of a snapshot decoded from storage."""
+    return msgspec.structs.replace(
+        snapshot,
+        user=snapshot.user and intern(snapshot.user),
+        assignees=tuple(intern(assignee) for assignee in snapshot.assignees),
+        labels=tuple(intern(label) for label in snapshot.labels),
+    )
+
+
+_snapshot_decoder = msgspec.json.Decoder(PRSnapshot)
+_encoder = msgspec.json.Encoder()
+
+
+def decode_snapshot(data: Union[str, bytes]) -> PRSnapshot:
+    """Decode a stored snapshot; raises ``msgspec.DecodeError`` if it is not one."""
+    return interned(_snapshot_decoder.decode(data))
+
+
+def encode_snapshot(snapshot: PRSnapshot) -> bytes:
+    """JSON for the PR store."""
+    return _encoder.encode(snapshot)
+
+
+def to_builtins(snapshot: PRSnapshot) -> Dict[str, Any]:
+    """The snapshot as plain JSON-compatible Python objects."""
+    return msgspec.to_builtins(snapshot)
+
+
+def from_builtins(data: Dict[str, Any]) -> PRSnapshot:
+    """Rebuild a snapshot from ``to_builtins`` output."""
+    return interned(msgspec.convert(data, PRSnapshot))
@@ -1,8 +1,19 @@
 """
 Pydantic models for PR-related data structures.
 """
-from pydantic import BaseModel
-from typing import Dict, List, Optional
+from pydantic import BaseModel, BeforeValidator, ConfigDict, PlainSerializer
+from typing import Annotated, List, Optional
+
+from app.models.github_snapshot import PRSnapshot, from_builtins, to_builtins
+
+# Result models carry the snapshot as-is (an isinstance check, no per-field
+# validation); it is converted to plain JSON only when a result is dumped as JSON,
+# and converted back when a dumped result (e.g. a persisted job's) is validated.
+GitHubData = Annotated[
+    PRSnapshot,
+    BeforeValidator(lambda value: from_builtins(value) if isinstance(value, dict) else value),
+    PlainSerializer(to_builtins, when_used="json"),
+]
 
 
 class User(BaseModel):
@@ -18,6 +29,8 @@ class PRDescriptionRequest(BaseModel):
 
 class PRDescriptionResponse(BaseModel):
     """Response model for generated PR description."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     title: str
     repository: str
     description: str
@@ -25,7 +38,7 @@ class PRDescriptionResponse(BaseModel):
     priority: str
     assignee: str
     generated_description: str
-    github_data: Dict
+    github_data: GitHubData
 
 
 class PRReviewRequest(BaseModel):
@@ -35,6 +48,8 @@ class PRReviewRequest(BaseModel):
 
 class PRReviewResponse(BaseModel):
     """Response model for generated PR review."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
     title: str
     repository: str
     pr_type: str
@@ -42,24 +57,62 @@ class PRReviewResponse(BaseModel):
     assignee: str
     review_analysis: str
     review_score: int
-    github_data: Dict
+    github_data: GitHubData
+
+
+class PRAnalysisRequest(BaseModel):
+    """Request model for combined PR description and review generation."""
+    pr_url: str
+
 
+class PRAnalysisResponse(BaseModel):
+    """Response model for a PR description and review generated together."""
+    model_config = ConfigDict(arbitrary_types_allowed=True)
 
-class GitHubPRData(BaseModel):
-    """Model for GitHub PR data structure."""
     title: str
-    body: Optional[str] = ""
-    user: Dict
-    assignees: List[Dict]
-    labels: List[Dict]
+    repository: str
+    description: str
+    pr_type: str
+    priority: str
+    assignee: str
+    generated_description: str
+    review_analysis: str
+    review_score: int
+    github_data: GitHubData
+
+
+class PRSnapshotSummary(BaseModel):
+    """Typed subset of a PR snapshot returned instead of the raw ``github_data``."""
+    repository: str
+    pr_number: int
     state: str
+    author: str
+    labels: List[str]
     created_at: str
     updated_at: str
+    head_sha: str
     changed_files: int
     additions: int
     deletions: int
-    repository: str
-    pr_number: int
+    contributors: int
+
+    @classmethod
+    def from_snapshot(cls, github_data: PRSnapshot) -> "PRSnapshotSummary":
+        """Summarize a snapshot as built by the GitHub service (REST, GraphQL or mock)."""
+        return cls(
+            repository=github_data.repository,
+            pr_number=github_data.pr_number,
+            state=github_data.state,
+            author=github_data.user.login if github_data.user else "",
+            labels=[label.name for label in github_data.labels],
+            created_at=github_data.created_at,
+            updated_at=github_data.updated_at,
+            head_sha=github_data.head_sha,
+            changed_files=github_data.changed_files,
+            additions=github_data.additions,
+            deletions=github_data.deletions,
+            contributors=len(github_data.contributors),
+        )
 
 
 class PRMetadata(BaseModel):
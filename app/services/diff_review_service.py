@@ -0,0 +1,213 @@
+"""
+Diff-aware PR reviews for PRs of any size (map-reduce over the diff).
+
+The unified diff is streamed from GitHub and split into per-file/per-hunk
+chunks under a token budget. Each chunk is reviewed as soon as it is ready,
+so download and review overlap; with the default budgets a PR's chunks fit
+in one wave of parallel calls and the map step takes about one chunk review.
+The per-chunk notes are then reduced into the request for the final review,
+which keeps the sections the review template expects. Small diffs skip the
+map step and go into the final review as-is.
+
+Chunk and condense calls of all reviews in the process share one executor of
+``DIFF_REVIEW_CONCURRENCY`` threads, so concurrent reviews queue there
+instead of filling the server's threadpool and the LLM connection pool.
+"""
+import asyncio
+import concurrent.futures
+import contextvars
+import logging
+import os
+import requests
+from typing import Dict, List, Optional
+
+import httpx
+
+from app.models.github_snapshot import PRSnapshot
+from app.services import github_service
+from app.services.github_tokens import GitHubRateLimited, get_token_pool
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import llm_client
+from app.services.model_router import model_router
+from app.services.pr_review_service import build_pr_review_request
+from app.utils.diff_chunker import DiffChunk, DiffChunker
+from app.utils.metrics import record_fallback
+from app.utils.prompt_budget import count_tokens, token_usage
+from app.utils.trivial_pr import trivial_pr_detector
+
+logger = logging.getLogger(__name__)
+
+DIFF_REVIEW_ENABLED = os.getenv("DIFF_REVIEW", "true").lower() == "true"
+DIFF_REVIEW_CHUNK_TOKENS = int(os.getenv("DIFF_REVIEW_CHUNK_TOKENS", "3000"))
+# Chunks per PR; at most DIFF_REVIEW_CONCURRENCY keeps a single review to one wave of calls
+DIFF_REVIEW_MAX_CHUNKS = int(os.getenv("DIFF_REVIEW_MAX_CHUNKS", "16"))
+# Chunk and condense calls in flight across all reviews of this process
+DIFF_REVIEW_CONCURRENCY = int(os.getenv("DIFF_REVIEW_CONCURRENCY", "16"))
+
+# Budget for the notes handed to the final review; larger sets are condensed first
+REDUCE_NOTES_TOKENS = 6000
+
+_CHUNK_SYSTEM_PROMPT = (
+    "You are an expert code reviewer looking at one part of a larger pull request. "
+    "Report only concrete findings for the code shown: bugs, security concerns, edge cases, "
+    "code quality, missing tests or documentation. Reference file names. Be concise."
+)
+
+_CONDENSE_SYSTEM_PROMPT = (
+    "You merge code review notes from different parts of a pull request. "
+    "Keep every concrete finding with its file name, drop duplicates and filler. Be concise."
+)
+
+# Blocking chunk/condense calls run here rather than in the server's threadpool
+_executor = concurrent.futures.ThreadPoolExecutor(max_workers=DIFF_REVIEW_CONCURRENCY, thread_name_prefix="diff-review")
+
+
+async def build_diff_review_request(pr_data: PRSnapshot) -> Dict:
+    """Return the chat request for a review of ``pr_data`` that includes its diff.
+
+    Falls back to the metadata-only review request when diff reviews are
+    disabled, there is no OpenAI key or GitHub token, the diff cannot be
+    fetched, or the PR is trivial (its review is built locally).
+    """
+    request = build_pr_review_request(pr_data)
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not (DIFF_REVIEW_ENABLED and openai_api_key and get_token_pool() and pr_data.head_sha):
+        return request
+    if trivial_pr_detector.detect(pr_data, "review") is not None:
+        return request
+
+    owner, repo = pr_data.repository.split("/", 1)
+    chunker = DiffChunker(max_tokens=DIFF_REVIEW_CHUNK_TOKENS, max_chunks=DIFF_REVIEW_MAX_CHUNKS)
+    chunks: List[DiffChunk] = []
+    tasks: List[asyncio.Task] = []
+
+    def start(chunk: DiffChunk) -> None:
+        tasks.append(asyncio.create_task(_review_chunk(pr_data, chunk)))
+
+    def dispatch(ready: List[DiffChunk]) -> None:
+        # Start reviewing chunks while the rest of the diff is still downloading.
+        # The first one waits for a second, since a one-chunk diff needs no map step.
+        for chunk in ready:
+            chunks.append(chunk)
+            if len(chunks) == 2:
+                start(chunks[0])
+            if len(chunks) >= 2:
+                start(chunk)
+
+    try:
+        async for line in github_service.iter_pr_diff_lines(owner, repo, pr_data.pr_number):
+            dispatch(chunker.feed(line))
+        dispatch(chunker.close())
+    except (httpx.HTTPError, GitHubRateLimited) as e:
+        logger.warning("Error fetching PR diff: %s", e)
+        record_fallback("github", "diff_error")
+        for task in tasks:
+            task.cancel()
+        return request
+
+    if not chunks:
+        return request
+
+    if len(chunks) == 1:
+        if not chunker.skipped:
+            # The whole diff fits in one call: no need for a map step
+            return _with_review_context(request, "Diff", f"```diff\n{chunks[0].text}\n```")
+        start(chunks[0])
+
+    notes = [note for note in await asyncio.gather(*tasks) if note]
+    notes = await _condense_notes(pr_data, notes)
+    context = "\n\n".join(notes) or "No specific findings."
+    if chunker.skipped:
+        context += f"\n\nNot reviewed ({len(chunker.skipped)} files over the size budget or binary): "
+        context += ", ".join(chunker.skipped[:50])
+    return _with_review_context(request, "Findings from the diff, by part", context)
+
+
+def _with_review_context(request: Dict, heading: str, context: str) -> Dict:
+    """Append diff context to the user message of a review request."""
+    messages = [dict(message) for message in request["messages"]]
+    messages[-1]["content"] += f"\n\n**{heading}:**\n{context}"
+    return {**request, "messages": messages}
+
+
+async def _review_chunk(pr_data: PRSnapshot, chunk: DiffChunk) -> str:
+    """Map step: review one chunk of the diff."""
+    data = {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": _CHUNK_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": f"Pull request: {pr_data.title}\n"
+                           f"Files in this part: {', '.join(chunk.files)}\n\n```diff\n{chunk.text}\n```",
+            },
+        ],
+        "max_tokens": 400,
+        "temperature": 0.3,
+    }
+    note = await _run_complete("review_chunk", data)
+    return f"[{', '.join(chunk.files)}]\n{note}" if note else ""
+
+
+async def _condense_notes(pr_data: PRSnapshot, notes: List[str]) -> List[str]:
+    """Merge notes in parallel batches until they fit the final review's budget."""
+    while len(notes) > 1 and sum(count_tokens(note) for note in notes) > REDUCE_NOTES_TOKENS:
+        batches: List[List[str]] = [[]]
+        batch_tokens = 0
+        for note in notes:
+            tokens = count_tokens(note)
+            if batches[-1] and batch_tokens + tokens > REDUCE_NOTES_TOKENS // 2:
+                batches.append([])
+                batch_tokens = 0
+            batches[-1].append(note)
+            batch_tokens += tokens
+        if len(batches) == len(notes):
+            # Every note is already too large to pair up; keep them as they are
+            break
+        notes = await asyncio.gather(*(_condense_batch(pr_data, batch) for batch in batches))
+        notes = [note for note in notes if note]
+    return notes
+
+
+async def _condense_batch(pr_data: PRSnapshot, batch: List[str]) -> str:
+    if len(batch) == 1:
+        return batch[0]
+    data = {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {"role": "system", "content": _CONDENSE_SYSTEM_PROMPT},
+            {"role": "user", "content": "\n\n".join(batch)},
+        ],
+        "max_tokens": 600,
+        "temperature": 0.3,
+    }
+    return await _run_complete("review_condense", data)
+
+
+async def _run_complete(tool: str, data: Dict) -> Optional[str]:
+    """Route a map/reduce request by its own prompt size and run it on the shared executor."""
+    data, timeout = model_router.route_by_prompt(tool, data)
+    # Keep the caller's context so the call's timing reaches its Server-Timing header
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(_executor, context.run, _complete, tool, data, timeout)
+
+
+def _complete(tool: str, data: Dict, timeout: Optional[float] = None) -> Optional[str]:
+    """Run one cached chat completion; failures drop that part's notes."""
+    content = llm_cache.get(data)
+    if content is not None:
+        return content
+    try:
+        result = llm_client.complete(tool, data, timeout)
+        content = result["choices"][0]["message"]["content"].strip()
+    except requests.exceptions.RequestException as e:
+        logger.warning("Error calling OpenAI API: %s", e)
+        record_fallback("openai", "error")
+        return None
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning("Error parsing OpenAI response: %s", e)
+        record_fallback("openai", "error")
+        return None
+    token_usage.record_response(tool, data, result, content)
+    llm_cache.store(data, content)
+    return content
@@ -0,0 +1,180 @@
+"""
+Rate-limit-aware scheduling of GitHub API calls across a pool of tokens.
+
+Remaining quota is tracked per token and per rate-limit resource (``core``,
+``graphql``, ...) from the ``X-RateLimit-*`` response headers. Each call goes
+to the token with the most quota left; when every token is down to its
+reserve, callers wait for the earliest reset instead of failing.
+"""
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Mapping, Optional
+
+from app.utils.metrics import github_quota_limit, github_quota_remaining
+
+# GitHub's default hourly limit for authenticated REST calls, assumed until
+# the first response tells us the real numbers.
+DEFAULT_LIMIT = 5000
+
+
+class GitHubRateLimited(Exception):
+    """Every token is out of quota for longer than callers are willing to wait."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit exhausted, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Quota:
+    limit: int = DEFAULT_LIMIT
+    remaining: int = DEFAULT_LIMIT
+    reset_at: float = 0.0
+
+
+@dataclass
+class _TokenState:
+    token: str
+    quotas: Dict[str, _Quota] = field(default_factory=dict)
+    requests: int = 0
+
+    @property
+    def masked(self) -> str:
+        return f"...{self.token[-4:]}"
+
+    def quota(self, resource: str) -> _Quota:
+        quota = self.quotas.get(resource)
+        if quota is None:
+            quota = self.quotas[resource] = _Quota()
+        elif quota.reset_at and time.time() >= quota.reset_at:
+            # The window has rolled over; assume a full quota until told otherwise
+            quota.remaining = quota.limit
+            quota.reset_at = 0.0
+        return quota
+
+
+class TokenPool:
+    """Spreads GitHub calls over several tokens based on their remaining quota."""
+
+    def __init__(self, tokens: List[str], reserve: int = 50, max_wait: float = 30.0):
+        self._states = [_TokenState(token) for token in dict.fromkeys(tokens) if token]
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.delayed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+
+    def __bool__(self) -> bool:
+        return bool(self._states)
+
+    async def acquire(self, resource: str = "core") -> str:
+        """Pick the token with the most quota left, waiting for a reset if all are at their reserve."""
+        waited = False
+        while True:
+            best = max(self._states, key=lambda state: state.quota(resource).remaining)
+            quota = best.quota(resource)
+            if quota.remaining > self.reserve:
+                # Reserve the call up front so concurrent callers spread out
+                quota.remaining -= 1
+                best.requests += 1
+                _publish(best, resource)
+                return best.token
+
+            wait = self.retry_after(resource)
+            if wait > self.max_wait:
+                self.rejected += 1
+                raise GitHubRateLimited(wait)
+            if not waited:
+                self.delayed += 1
+                waited = True
+            self.wait_seconds += wait
+            await asyncio.sleep(wait)
+
+    def retry_after(self, resource: str = "core") -> float:
+        """Seconds until the earliest quota reset of ``resource`` across the pool (at least one)."""
+        now = time.time()
+        return max(min(state.quota(resource).reset_at or now + 60.0 for state in self._states) - now, 1.0)
+
+    def update(self, token: str, headers: Mapping[str, str]) -> None:
+        """Record the quota reported by a GitHub response."""
+        state = self._state(token)
+        if state is None or "X-RateLimit-Remaining" not in headers:
+            return
+        quota = state.quota(headers.get("X-RateLimit-Resource", "core"))
+        try:
+            quota.remaining = int(headers["X-RateLimit-Remaining"])
+            quota.limit = int(headers.get("X-RateLimit-Limit", quota.limit))
+            quota.reset_at = float(headers.get("X-RateLimit-Reset", quota.reset_at))
+        except ValueError:
+            pass
+        _publish(state, headers.get("X-RateLimit-Resource", "core"))
+
+    def mark_exhausted(self, token: str, resource: str, retry_after: Optional[float] = None) -> None:
+        """Take a token out of rotation after a rate-limit response."""
+        state = self._state(token)
+        if state is None:
+            return
+        quota = state.quota(resource)
+        quota.remaining = 0
+        if retry_after is not None:
+            quota.reset_at = max(quota.reset_at, time.time() + retry_after)
+        elif not quota.reset_at:
+            quota.reset_at = time.time() + 60.0
+        _publish(state, resource)
+
+    def _state(self, token: str) -> Optional[_TokenState]:
+        for state in self._states:
+            if state.token == token:
+                return state
+        return None
+
+    def stats(self) -> Dict:
+        """Return per-token quota (tokens are masked) and scheduling counters."""
+        now = time.time()
+        tokens = []
+        for state in self._states:
+            tokens.append({
+                "token": state.masked,
+                "requests": state.requests,
+                "quota": {
+                    resource: {
+                        "remaining": quota.remaining,
+                        "limit": quota.limit,
+                        "reset_in": max(0, round(quota.reset_at - now)) if quota.reset_at else None,
+                    }
+                    for resource, quota in state.quotas.items()
+                },
+            })
+        return {
+            "tokens": tokens,
+            "reserve": self.reserve,
+            "delayed": self.delayed,
+            "rejected": self.rejected,
+            "wait_seconds": round(self.wait_seconds, 3),
+        }
+
+
+def _publish(state: _TokenState, resource: str) -> None:
+    """Mirror one token's quota into the Prometheus gauges."""
+    quota = state.quotas[resource]
+    github_quota_remaining.set(quota.remaining, token=state.masked, resource=resource)
+    github_quota_limit.set(quota.limit, token=state.masked, resource=resource)
+
+
+_pool: Optional[TokenPool] = None
+
+
+def get_token_pool() -> TokenPool:
+    """Return the token pool configured by ``GITHUB_TOKENS`` and/or ``GITHUB_TOKEN``."""
+    global _pool
+    if _pool is None:
+        tokens = [token.strip() for token in os.getenv("GITHUB_TOKENS", "").split(",")]
+        tokens.append(os.getenv("GITHUB_TOKEN", ""))
+        _pool = TokenPool(
+            tokens,
+            reserve=int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "50")),
+            max_wait=float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "30")),
+        )
+    return _pool
@@ -0,0 +1,278 @@
+"""
+In-process job queue with a bounded pool of async workers.
+
+Generation work is submitted as coroutine functions and runs on a fixed
+number of workers, so a burst of requests queues here instead of exhausting
+the server's threadpool. Jobs get an ID that clients can poll; jobs submitted
+with ``persist=True`` are also written to the shared PR store, so a poll that
+lands on another worker still finds them. Streaming work runs as a job too and
+relays its events through a ``JobStream``.
+"""
+import asyncio
+import contextvars
+import os
+import secrets
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional
+
+from fastapi import HTTPException
+
+from app.services import pr_store
+
+
+@dataclass
+class Job:
+    """A unit of work and its lifecycle timestamps."""
+    id: str
+    kind: str
+    func: Callable[..., Awaitable[Any]]
+    args: tuple
+    status: str = "queued"  # queued, running, done or failed
+    result: Any = None
+    error: Optional[BaseException] = None
+    # Wall-clock timestamps, so workers reading a persisted job agree on them
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    persist: bool = False
+    done: asyncio.Event = field(default_factory=asyncio.Event)
+    # The submitter's context, so per-request state (e.g. Server-Timing entries) follows the job
+    context: contextvars.Context = field(default_factory=contextvars.copy_context)
+
+    @property
+    def wait_time(self) -> float:
+        """Seconds spent queued (so far, if not started yet)."""
+        return max(0.0, (self.started_at or time.time()) - self.created_at)
+
+    @property
+    def run_time(self) -> float:
+        """Seconds spent running (so far, if not finished yet)."""
+        if self.started_at is None:
+            return 0.0
+        return max(0.0, (self.finished_at or time.time()) - self.started_at)
+
+
+class JobStream:
+    """Events produced by a streaming job so far; each reader replays them from the start."""
+
+    def __init__(self) -> None:
+        self.events: List[str] = []
+        self.closed = False
+        self._changed = asyncio.Event()
+
+    def push(self, event: str) -> None:
+        self.events.append(event)
+        self._notify()
+
+    def close(self) -> None:
+        self.closed = True
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        index = 0
+        while True:
+            changed = self._changed
+            while index < len(self.events):
+                yield self.events[index]
+                index += 1
+            if self.closed:
+                return
+            await changed.wait()
+
+
+def _summary(samples: Deque[float]) -> Dict[str, float]:
+    """Average, p95 and max of recent duration samples."""
+    if not samples:
+        return {"avg": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    return {
+        "avg": round(sum(ordered) / len(ordered), 4),
+        "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class JobQueue:
+    """Bounded FIFO queue drained by a fixed number of asyncio workers."""
+
+    def __init__(self, workers: int = 8, max_pending: int = 100, retention: float = 600.0, max_jobs: int = 1000):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retention = retention
+        self.max_jobs = max_jobs
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running = 0
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self._run_times: Deque[float] = deque(maxlen=500)
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    async def start(self) -> None:
+        """Start the worker tasks on the running event loop."""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued jobs are dropped."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    async def submit(self, kind: str, func: Callable[..., Awaitable[Any]], *args: Any, persist: bool = False) -> Job:
+        """Queue ``func(*args)`` and return its job right away.
+
+        With ``persist`` the job and its result (a pydantic model) are kept in
+        the PR store until the retention passes, for ``lookup`` from any worker.
+        """
+        await self.start()
+        self._prune()
+        job = Job(id=secrets.token_urlsafe(12), kind=kind, func=func, args=args, persist=persist)
+        if persist:
+            # Written before the job is queued, so it cannot land after the worker's updates;
+            # the row of a rejected job is never handed out and is pruned like any other
+            await asyncio.to_thread(pr_store.prune_jobs, time.time() - self.retention)
+            await self._save(job)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Too many pending jobs, please retry shortly")
+        self._jobs[job.id] = job
+        return job
+
+    async def run(self, kind: str, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Queue ``func(*args)`` and wait for its result."""
+        job = await self.submit(kind, func, *args)
+        await job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    async def stream(self, kind: str, events: Callable[[], AsyncIterator[str]]) -> JobStream:
+        """Queue a job that produces ``events()`` and return the stream it fills.
+
+        The events are generated on a queue worker, so streaming responses
+        share the worker limit with every other generation.
+        """
+        channel = JobStream()
+
+        async def produce() -> None:
+            try:
+                async for event in events():
+                    channel.push(event)
+            finally:
+                channel.close()
+
+        await self.submit(kind, produce)
+        return channel
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Look up a job of this worker by ID."""
+        return self._jobs.get(job_id)
+
+    async def lookup(self, job_id: str, decode: Callable[[str, str], Any]) -> Optional[Job]:
+        """Look up a job by ID here, else among the persisted jobs of all workers.
+
+        ``decode(kind, result_json)`` rebuilds the result of a persisted job.
+        """
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        row = await asyncio.to_thread(pr_store.get_job, job_id)
+        if row is None:
+            return None
+        kind, status, created_at, started_at, finished_at, error, result = row
+        job = Job(
+            id=job_id, kind=kind, func=None, args=(), status=status,
+            result=decode(kind, result) if result is not None else None,
+            error=RuntimeError(error) if error is not None else None,
+            created_at=created_at, started_at=started_at, finished_at=finished_at,
+        )
+        if finished_at is not None:
+            job.done.set()
+        return job
+
+    def position(self, job: Job) -> int:
+        """1-based position of a queued job, 0 once it has started."""
+        if job.status != "queued":
+            return 0
+        queued = [j for j in self._jobs.values() if j.status == "queued"]
+        return queued.index(job) + 1 if job in queued else 0
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            self._running += 1
+            self._wait_times.append(job.wait_time)
+            try:
+                if job.persist:
+                    await self._save(job)
+                job.result = await asyncio.create_task(job.func(*job.args), context=job.context)
+                job.status = "done"
+                self.completed += 1
+            except Exception as e:
+                job.error = e
+                job.status = "failed"
+                self.failed += 1
+            finally:
+                job.finished_at = time.time()
+                self._running -= 1
+                self._run_times.append(job.run_time)
+                if job.persist:
+                    await self._save(job)
+                job.done.set()
+                self._queue.task_done()
+
+    async def _save(self, job: Job) -> None:
+        """Write a persisted job's current state to the PR store."""
+        error = None
+        if job.error is not None:
+            error = getattr(job.error, "detail", None) or str(job.error)
+        result = job.result.model_dump_json() if job.status == "done" else None
+        await asyncio.to_thread(
+            pr_store.save_job, job.id, job.kind, job.status,
+            job.created_at, job.started_at, job.finished_at, error, result,
+        )
+
+    def _prune(self) -> None:
+        """Forget finished jobs past their retention, and the oldest beyond ``max_jobs``."""
+        now = time.time()
+        for job_id, job in list(self._jobs.items()):
+            expired = job.finished_at is not None and now - job.finished_at > self.retention
+            if expired or (len(self._jobs) > self.max_jobs and job.finished_at is not None):
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, worker usage and recent wait/run times."""
+        return {
+            "workers": self.workers,
+            "running": self._running,
+            "depth": self._queue.qsize() if self._queue else 0,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_time_seconds": _summary(self._wait_times),
+            "run_time_seconds": _summary(self._run_times),
+        }
+
+
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "8")),
+    max_pending=int(os.getenv("JOB_MAX_PENDING", "100")),
+)
@@ -0,0 +1,192 @@
+"""
+Content-addressed cache for chat completion results.
+
+Completions are keyed by a hash of everything that influences the output
+(model, messages, temperature, max_tokens), so re-running a tool on an
+unchanged PR skips the OpenAI round-trip entirely.
+
+The optional disk tier is bounded too: reads refresh a file's mtime, and
+every ``sweep_every`` writes the directory is swept of files older than
+``disk_ttl`` and of the least recently used beyond ``disk_max_entries``.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def completion_key(payload: Dict) -> str:
+    """Hash the parts of a chat completion request that determine its output."""
+    material = {
+        "model": payload.get("model"),
+        "messages": payload.get("messages"),
+        "temperature": payload.get("temperature"),
+        "max_tokens": payload.get("max_tokens"),
+    }
+    encoded = json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class LLMCache:
+    """Thread-safe LRU of completions, optionally persisted as one file per key."""
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        directory: Optional[str] = None,
+        disk_max_entries: int = 10000,
+        disk_ttl: float = 7 * 24 * 3600,
+        sweep_every: int = 100,
+    ):
+        self.max_entries = max_entries
+        self.directory = directory or None
+        self.disk_max_entries = disk_max_entries
+        self.disk_ttl = disk_ttl
+        self.sweep_every = sweep_every
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Sweep on the first write, so a directory left oversized by a previous run shrinks
+        self._writes_since_sweep = sweep_every
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+
+    def get(self, payload: Dict) -> Optional[str]:
+        """Return the cached completion for a request payload, if any."""
+        key = completion_key(payload)
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return content
+
+        content = self._read_disk(key)
+        with self._lock:
+            if content is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, content)
+        return content
+
+    def store(self, payload: Dict, content: str) -> None:
+        """Cache a successful completion for a request payload."""
+        key = completion_key(payload)
+        with self._lock:
+            self._remember(key, content)
+        self._write_disk(key, content)
+
+    def _remember(self, key: str, content: str) -> None:
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            if self.disk_ttl and time.time() - os.stat(path).st_mtime > self.disk_ttl:
+                self._remove(path)
+                return None
+            with open(path, encoding="utf-8") as f:
+                content = json.load(f)["content"]
+            # The mtime is the entry's last use, for the sweep
+            os.utime(path)
+            return content
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Error reading LLM cache entry %s: %s", key, e)
+            return None
+
+    def _write_disk(self, key: str, content: str) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent workers never read a partial file
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"content": content}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Error writing LLM cache entry %s: %s", key, e)
+            return
+        with self._lock:
+            self._writes_since_sweep += 1
+            if self._writes_since_sweep < self.sweep_every:
+                return
+            self._writes_since_sweep = 0
+        self.sweep()
+
+    def sweep(self) -> int:
+        """Delete expired disk entries and the least recently used beyond ``disk_max_entries``; return how many."""
+        if not self.directory:
+            return 0
+        now = time.time()
+        entries: List[Tuple[float, str]] = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    entries.append((os.stat(path).st_mtime, path))
+                except OSError:
+                    continue  # removed by another worker's sweep
+        entries.sort(reverse=True)
+        stale = [
+            path
+            for index, (mtime, path) in enumerate(entries)
+            if (self.disk_ttl and now - mtime > self.disk_ttl) or (self.disk_max_entries and index >= self.disk_max_entries)
+        ]
+        removed = sum(self._remove(path) for path in stale)
+        with self._lock:
+            self.disk_evictions += removed
+        return removed
+
+    @staticmethod
+    def _remove(path: str) -> bool:
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_max_entries": self.disk_max_entries,
+                "disk_evictions": self.disk_evictions,
+            }
+
+
+llm_cache = LLMCache(
+    max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512")),
+    directory=os.getenv("LLM_CACHE_DIR", ""),
+    disk_max_entries=int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "10000")),
+    disk_ttl=float(os.getenv("LLM_CACHE_DISK_TTL", str(7 * 24 * 3600))),
+)
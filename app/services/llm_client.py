@@ -0,0 +1,308 @@
+"""
+Shared chat completions client used by every LLM call in the app.
+
+One ``requests.Session`` keeps pooled keep-alive connections to the provider.
+Calls that get a 429, a 5xx or a connection error are retried with jittered
+exponential backoff. Optionally (``LLM_HEDGE``), a non-streaming call still
+unanswered after that tool's recent p95 latency gets a second, identical
+request, and the first answer wins. A circuit breaker opens after repeated
+failures and fails calls fast until a probe succeeds. Retries, hedges and
+the breaker state are exported on ``/metrics`` and ``/stats``.
+"""
+import collections
+import concurrent.futures
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from typing import Callable, Deque, Dict, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.metrics import llm_circuit_rejections, llm_circuit_state, llm_hedges, llm_retries, upstream
+
+logger = logging.getLogger(__name__)
+
+# Overridable for OpenAI-compatible gateways or local stand-ins (see benchmarks/)
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_CHAT_URL = f"{OPENAI_BASE_URL}/chat/completions"
+
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "32"))
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+# Attempts per call, including the first; backoff doubles from the base up to the cap
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_CAP = float(os.getenv("LLM_BACKOFF_CAP", "8"))
+# Hedging doubles the cost of slow calls, so it is opt-in
+LLM_HEDGE = os.getenv("LLM_HEDGE", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "1"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Latencies kept per tool for the hedge delay, and how many are needed first
+LATENCY_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """The provider has been failing; the call was not attempted."""
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_timeout``.
+
+    While open every call fails fast. Once the timeout has passed a single
+    probe is let through: success closes the circuit, failure reopens it.
+    """
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    _GAUGE = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self._lock = threading.Lock()
+        llm_circuit_state.set(0)
+
+    def allow(self) -> bool:
+        """Whether a call may go out now."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._set(self.HALF_OPEN)
+                return True
+            # Open, or half-open with the probe still in flight
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set(self.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or (self.state == self.CLOSED and self.failures >= self.failure_threshold):
+                self.opened_at = time.monotonic()
+                self.opened += 1
+                self._set(self.OPEN)
+
+    def _set(self, state: str) -> None:
+        if state != self.state:
+            logger.warning("LLM circuit %s -> %s", self.state, state)
+        self.state = state
+        llm_circuit_state.set(self._GAUGE[state])
+
+
+def get_openai_headers(openai_api_key: str) -> Dict:
+    """Build the OpenAI request headers."""
+    return {
+        "Authorization": f"Bearer {openai_api_key}",
+        "Content-Type": "application/json"
+    }
+
+
+class LLMClient:
+    """Pooled, retrying, optionally hedging chat completions client."""
+
+    def __init__(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=LLM_POOL_SIZE)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET)
+        self._latencies: Dict[str, Deque[float]] = collections.defaultdict(lambda: collections.deque(maxlen=LATENCY_WINDOW))
+        self._hedge_pool = concurrent.futures.ThreadPoolExecutor(max_workers=LLM_POOL_SIZE, thread_name_prefix="llm-hedge")
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def complete(self, tool: str, data: Dict, timeout: Optional[float] = None) -> Dict:
+        """POST a chat completion and return the decoded JSON response.
+
+        ``timeout`` overrides ``LLM_TIMEOUT`` as the read timeout of this call.
+        """
+        response = self._call(tool, lambda: self._post_hedged(tool, data, timeout))
+        try:
+            return response.json()
+        finally:
+            response.close()
+
+    def stream(self, tool: str, data: Dict, timeout: Optional[float] = None) -> Iterator[str]:
+        """POST a chat completion with ``stream: true`` and yield content deltas.
+
+        Returns the list of yielded parts once the stream is finished. Only
+        the request is retried; a stream that breaks off raises.
+        """
+        payload = {**data, "stream": True}
+        response = self._call(tool, lambda: self._post(tool, payload, timeout, stream=True))
+        parts = []
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                chunk = line[len("data:"):].strip()
+                if chunk == "[DONE]":
+                    break
+                delta = json.loads(chunk)["choices"][0].get("delta", {})
+                content = delta.get("content")
+                if content:
+                    parts.append(content)
+                    yield content
+        return parts
+
+    def _call(self, tool: str, send: Callable[[], requests.Response]) -> requests.Response:
+        """Send through the circuit breaker, retrying 429s, 5xx and connection errors with backoff."""
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            if not self.breaker.allow():
+                self.rejected += 1
+                llm_circuit_rejections.inc(tool=tool)
+                raise CircuitOpenError("LLM provider unavailable (circuit open)")
+
+            retry_after = None
+            try:
+                response = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self.breaker.record_failure()
+                if attempt == LLM_MAX_ATTEMPTS or isinstance(e, requests.exceptions.ReadTimeout):
+                    # A read timeout already cost the full timeout; don't pay it again
+                    raise
+                reason = "connection"
+            except Exception:
+                # Anything else (a body cut off mid-read, an undecodable one) still counts
+                # against the provider, or a failed half-open probe would never be settled
+                self.breaker.record_failure()
+                raise
+            else:
+                if response.status_code not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    response.raise_for_status()
+                    return response
+                if response.status_code >= 500:
+                    self.breaker.record_failure()
+                else:
+                    # Rate limited: the provider is up, so the breaker stays as it is
+                    self.breaker.record_success()
+                if attempt == LLM_MAX_ATTEMPTS:
+                    response.raise_for_status()
+                reason = str(response.status_code)
+                retry_after = response.headers.get("Retry-After")
+                response.close()
+
+            self.retries += 1
+            llm_retries.inc(tool=tool, reason=reason)
+            time.sleep(self._backoff(attempt, retry_after))
+        raise AssertionError("unreachable")
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[str] = None) -> float:
+        """Full-jitter exponential backoff, or the server's ``Retry-After`` if it is sooner than the cap."""
+        if retry_after and retry_after.replace(".", "", 1).isdigit():
+            return min(float(retry_after), LLM_BACKOFF_CAP)
+        return random.uniform(0, min(LLM_BACKOFF_CAP, LLM_BACKOFF_BASE * 2 ** (attempt - 1)))
+
+    def _post(self, tool: str, data: Dict, timeout: Optional[float] = None, stream: bool = False) -> requests.Response:
+        headers = get_openai_headers(os.getenv("OPENAI_API_KEY", ""))
+        start = time.perf_counter()
+        with upstream("openai", tool) as call:
+            response = self.session.post(
+                OPENAI_CHAT_URL,
+                headers=headers,
+                json=data,
+                stream=stream,
+                timeout=(LLM_CONNECT_TIMEOUT, timeout or LLM_TIMEOUT),
+            )
+            call.status = response.status_code
+        if response.status_code < 400 and not stream:
+            self._latencies[tool].append(time.perf_counter() - start)
+        return response
+
+    def hedge_delay(self, tool: str) -> Optional[float]:
+        """Recent p95 latency of ``tool`` (at least ``LLM_HEDGE_MIN_DELAY``), or None without enough samples."""
+        samples = sorted(self._latencies[tool])
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(LLM_HEDGE_MIN_DELAY, samples[int(len(samples) * 0.95) - 1])
+
+    def _post_hedged(self, tool: str, data: Dict, timeout: Optional[float] = None) -> requests.Response:
+        """Send a request; if it is slower than the hedge delay, race it against a second copy."""
+        delay = self.hedge_delay(tool) if LLM_HEDGE else None
+        if delay is None:
+            return self._post(tool, data, timeout)
+
+        # Run both copies in the caller's context so their timings reach its Server-Timing header
+        primary = self._hedge_pool.submit(contextvars.copy_context().run, self._post, tool, data, timeout)
+        try:
+            return primary.result(timeout=delay)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        self.hedged += 1
+        hedge = self._hedge_pool.submit(contextvars.copy_context().run, self._post, tool, data, timeout)
+        pending = {primary, hedge}
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                winner = "hedge" if future is hedge else "primary"
+                self.hedge_wins += winner == "hedge"
+                llm_hedges.inc(tool=tool, winner=winner)
+                # The slower copy cannot be interrupted; drop its response when it arrives
+                for other in pending:
+                    other.add_done_callback(_close_response)
+                return future.result()
+        raise error
+
+    def stats(self) -> Dict:
+        """Return client counters and the circuit state."""
+        return {
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.opened,
+            "consecutive_failures": self.breaker.failures,
+            "retries": self.retries,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+            "hedge_delay": {tool: self.hedge_delay(tool) for tool in list(self._latencies)},
+        }
+
+    def warm(self) -> None:
+        """Open a pooled connection to the provider ahead of the first call."""
+        with upstream("openai", "models") as call:
+            response = self.session.get(
+                f"{OPENAI_BASE_URL}/models",
+                headers=get_openai_headers(os.getenv("OPENAI_API_KEY", "")),
+                timeout=(LLM_CONNECT_TIMEOUT, 10),
+            )
+            call.status = response.status_code
+        # Reading the body hands the connection back to the pool
+        response.content
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+
+def _close_response(future: concurrent.futures.Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+llm_client = LLMClient()
@@ -0,0 +1,166 @@
+"""
+Size-based model routing for PR descriptions and reviews.
+
+Each chat request is matched against an ordered table of routes using the
+PR's changed lines (additions + deletions), changed files, the request's
+prompt tokens and the ``pr_type``/``priority`` from ``analyze_pr_data``. The
+first route whose limits all hold sets the model, the tool's ``max_tokens``
+and the call's read timeout, so typo fixes get a fast, cheap model with a
+short answer and large refactors a stronger one with room to say more. The
+table can be replaced with a JSON file named by ``MODEL_ROUTES`` (same shape
+as ``DEFAULT_ROUTES``).
+"""
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.models.github_snapshot import PRSnapshot
+from app.utils.metrics import llm_routes
+from app.utils.pr_classifier import analyze_pr_data
+from app.utils.prompt_budget import count_messages
+
+logger = logging.getLogger(__name__)
+
+MODEL_ROUTING_ENABLED = os.getenv("MODEL_ROUTING", "true").lower() == "true"
+
+# Routes are checked in order; a limit that is missing (or null) always holds,
+# and the last route is used when none matches.
+DEFAULT_ROUTES: Dict = {
+    "routes": [
+        {
+            "name": "small",
+            "model": "gpt-4o-mini",
+            "timeout": 15,
+            "max_tokens": {"description": 500, "review": 700},
+            "max_changed_lines": 50,
+            "max_changed_files": 3,
+            "max_prompt_tokens": 1200,
+            "priorities": ["low", "medium"],
+        },
+        {
+            "name": "medium",
+            "model": "gpt-3.5-turbo",
+            "timeout": 30,
+            "max_tokens": {"description": 1000, "review": 1500},
+            "max_changed_lines": 1000,
+            "max_changed_files": 30,
+            "max_prompt_tokens": 3500,
+        },
+        {
+            "name": "large",
+            "model": "gpt-4o",
+            "timeout": 60,
+            "max_tokens": {"description": 1500, "review": 2000},
+        },
+    ],
+}
+
+
+@dataclass(frozen=True)
+class Route:
+    """A model, output budget and timeout, and the PRs they are used for."""
+    name: str
+    model: str
+    timeout: float
+    max_tokens: Dict[str, int] = field(default_factory=dict)
+    max_changed_lines: Optional[int] = None
+    max_changed_files: Optional[int] = None
+    max_prompt_tokens: Optional[int] = None
+    pr_types: Optional[Sequence[str]] = None
+    priorities: Optional[Sequence[str]] = None
+
+    def matches(self, changed_lines: int, changed_files: int, prompt_tokens: int, pr_type: str, priority: str) -> bool:
+        return (
+            (self.max_changed_lines is None or changed_lines <= self.max_changed_lines)
+            and (self.max_changed_files is None or changed_files <= self.max_changed_files)
+            and (self.max_prompt_tokens is None or prompt_tokens <= self.max_prompt_tokens)
+            and (self.pr_types is None or pr_type in self.pr_types)
+            and (self.priorities is None or priority in self.priorities)
+        )
+
+
+class ModelRouter:
+    """Picks a route per chat request and counts the choices."""
+
+    def __init__(self, table: Dict = DEFAULT_ROUTES):
+        self.routes: List[Route] = [Route(**route) for route in table["routes"]]
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def select(self, pr_data: PRSnapshot, data: Dict) -> Route:
+        """The first route matching the PR and the request's prompt size."""
+        metadata = analyze_pr_data(pr_data)
+        changed_lines = pr_data.additions + pr_data.deletions
+        prompt_tokens = count_messages(data)
+        for route in self.routes:
+            if route.matches(changed_lines, pr_data.changed_files, prompt_tokens, metadata["pr_type"], metadata["priority"]):
+                return route
+        return self.routes[-1]
+
+    def select_by_prompt(self, data: Dict) -> Route:
+        """The first route whose prompt limit holds for the request, ignoring the PR-level limits."""
+        prompt_tokens = count_messages(data)
+        for route in self.routes:
+            if route.max_prompt_tokens is None or prompt_tokens <= route.max_prompt_tokens:
+                return route
+        return self.routes[-1]
+
+    def route(self, tool: str, pr_data: PRSnapshot, data: Dict) -> Tuple[Dict, Optional[float]]:
+        """Return ``data`` with the routed model and ``max_tokens``, and the read timeout to use.
+
+        With routing disabled the request is returned as built, with no timeout override.
+        """
+        if not MODEL_ROUTING_ENABLED:
+            return data, None
+        return self._apply(tool, self.select(pr_data, data), data)
+
+    def route_by_prompt(self, tool: str, data: Dict) -> Tuple[Dict, Optional[float]]:
+        """Like ``route``, but for calls over one part of a PR (diff chunks, note merges).
+
+        Their prompts are capped however large the PR is, so only the prompt
+        size picks the route.
+        """
+        if not MODEL_ROUTING_ENABLED:
+            return data, None
+        return self._apply(tool, self.select_by_prompt(data), data)
+
+    def _apply(self, tool: str, route: Route, data: Dict) -> Tuple[Dict, Optional[float]]:
+        with self._lock:
+            tool_counts = self._counts.setdefault(tool, {})
+            tool_counts[route.name] = tool_counts.get(route.name, 0) + 1
+        llm_routes.inc(tool=tool, route=route.name)
+        routed = {**data, "model": route.model}
+        if tool in route.max_tokens:
+            routed["max_tokens"] = route.max_tokens[tool]
+        return routed, route.timeout
+
+    def stats(self) -> Dict:
+        """Return the route table and how often each route was chosen per tool."""
+        with self._lock:
+            return {
+                "enabled": MODEL_ROUTING_ENABLED,
+                "routes": {route.name: route.model for route in self.routes},
+                "chosen": {tool: dict(counts) for tool, counts in self._counts.items()},
+            }
+
+
+def _load_routes() -> Dict:
+    """Routes from ``MODEL_ROUTES`` if set, else the defaults."""
+    path = os.getenv("MODEL_ROUTES")
+    if not path:
+        return DEFAULT_ROUTES
+    try:
+        with open(path, encoding="utf-8") as f:
+            table = json.load(f)
+        # Validate before replacing the defaults
+        ModelRouter(table)
+        return table
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.warning("Error loading model routes from %s: %s", path, e)
+        return DEFAULT_ROUTES
+
+
+model_router = ModelRouter(_load_routes())
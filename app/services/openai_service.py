@@ -1,87 +1,155 @@
 """
 OpenAI API service for generating PR descriptions.
 """
+import logging
 import os
 import requests
-from typing import Dict
+from typing import Dict, Iterator
 
+from app.models.github_snapshot import PRSnapshot
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import llm_client
+from app.services.model_router import model_router
+from app.utils.metrics import record_fallback, stage
+from app.utils.prompt_budget import Section, count_messages, count_tokens, fit_sections, token_usage
+from app.utils.trivial_pr import trivial_description, trivial_pr_detector
 
-def generate_pr_description_with_openai(pr_data: Dict) -> str:
+logger = logging.getLogger(__name__)
+
+
+def generate_pr_description_with_openai(pr_data: PRSnapshot) -> str:
     """Generate PR description using OpenAI."""
+    trivial = trivial_pr_detector.detect(pr_data)
+    if trivial is not None:
+        trivial_pr_detector.record("description", trivial)
+        return trivial_description(pr_data, trivial)
+
     openai_api_key = os.getenv("OPENAI_API_KEY")
     
     if not openai_api_key:
         # Fallback to mock description if no API key is provided
+        record_fallback("openai", "no_key")
         return _get_mock_description(pr_data)
 
-    prompt = _build_pr_description_prompt(pr_data)
-
     try:
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are an expert software developer and technical writer. Please create comprehensive, professional pull request descriptions based on GitHub PR data. Focus on clarity, technical accuracy, and helpfulness for reviewers."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 1000,
-            "temperature": 0.7
-        }
+        data, timeout = model_router.route("description", pr_data, _build_pr_description_request(pr_data))
+
+        cached = llm_cache.get(data)
+        if cached is not None:
+            return cached
         
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", 
-            headers=headers, 
-            json=data, 
-            timeout=30
-        )
-        response.raise_for_status()
-        result = response.json()
-        generated_description = result["choices"][0]["message"]["content"]
-        return generated_description.strip()
+        result = llm_client.complete("description", data, timeout)
+        generated_description = result["choices"][0]["message"]["content"].strip()
+        token_usage.record_response("description", data, result, generated_description)
+        llm_cache.store(data, generated_description)
+        return generated_description
         
     except requests.exceptions.RequestException as e:
-        print(f"Error calling OpenAI API: {e}")
+        logger.warning("Error calling OpenAI API: %s", e)
+        record_fallback("openai", "error")
         return _get_error_description(str(e))
-    except (KeyError, IndexError) as e:
-        print(f"Error parsing OpenAI response: {e}")
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning("Error parsing OpenAI response: %s", e)
+        record_fallback("openai", "error")
         return _get_error_description("Unexpected response format")
 
 
-def _build_pr_description_prompt(pr_data: Dict) -> str:
-    """Build the prompt for OpenAI based on PR data."""
-    title = pr_data.get("title", "Unknown PR")
-    body = pr_data.get("body", "")
-    labels = [label.get("name", "") for label in pr_data.get("labels", [])]
-    assignees = [assignee.get("login", "") for assignee in pr_data.get("assignees", [])]
-    changed_files = pr_data.get("changed_files", 0)
-    additions = pr_data.get("additions", 0)
-    deletions = pr_data.get("deletions", 0)
-    repository = pr_data.get("repository", "Unknown repository")
-    contributors = pr_data.get("contributors", [])
+def stream_pr_description_with_openai(pr_data: PRSnapshot) -> Iterator[str]:
+    """Generate PR description using OpenAI, yielding text as it arrives."""
+    trivial = trivial_pr_detector.detect(pr_data)
+    if trivial is not None:
+        trivial_pr_detector.record("description", trivial)
+        yield trivial_description(pr_data, trivial)
+        return
+
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    if not openai_api_key:
+        record_fallback("openai", "no_key")
+        yield _get_mock_description(pr_data)
+        return
+
+    data, timeout = model_router.route("description", pr_data, _build_pr_description_request(pr_data))
+    cached = llm_cache.get(data)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        parts = yield from llm_client.stream("description", data, timeout)
+        generated_description = "".join(parts).strip()
+        token_usage.record_completion("description", count_messages(data), count_tokens(generated_description))
+        llm_cache.store(data, generated_description)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Error calling OpenAI API: %s", e)
+        record_fallback("openai", "error")
+        yield _get_error_description(str(e))
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning("Error parsing OpenAI response: %s", e)
+        record_fallback("openai", "error")
+        yield _get_error_description("Unexpected response format")
+
+
+def _build_pr_description_request(pr_data: PRSnapshot) -> Dict:
+    """Build the chat completion request body for a PR description."""
+    with stage("prompt"):
+        prompt = _build_pr_description_prompt(pr_data)
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {
+                "role": "system", 
+                "content": "You are an expert software developer and technical writer. Please create comprehensive, professional pull request descriptions based on GitHub PR data. Focus on clarity, technical accuracy, and helpfulness for reviewers."
+            },
+            {
+                "role": "user", 
+                "content": prompt
+            }
+        ],
+        "max_tokens": 1000,
+        "temperature": 0.7
+    }
+
+
+def _build_pr_description_prompt(pr_data: PRSnapshot) -> str:
+    """Build the prompt for OpenAI based on PR data.
+
+    PR-provided sections are fitted to the prompt token budget; contributors
+    are trimmed first, then the body, then labels and assignees.
+    """
+    title = pr_data.title
+    body = pr_data.body or ""
+    labels = [label.name for label in pr_data.labels]
+    assignees = [assignee.login for assignee in pr_data.assignees]
+    changed_files = pr_data.changed_files
+    additions = pr_data.additions
+    deletions = pr_data.deletions
+    repository = pr_data.repository
+    contributors = pr_data.contributors
     
     # Format contributors information
     contributors_info = ""
     if contributors:
         contributors_list = []
         for contributor in contributors:
-            login = contributor.get("login", "")
-            name = contributor.get("name", login)
-            contributions = contributor.get("contributions", 0)
+            login = contributor.login
+            name = contributor.name
+            contributions = contributor.contributions
             contributors_list.append(f"@{login} ({name}) - {contributions} commit{'s' if contributions != 1 else ''}")
         contributors_info = "\n".join(contributors_list)
     else:
         contributors_info = "No contributors found"
-    
+
+    fitted = fit_sections("description", [
+        Section("title", title, priority=0),
+        Section("labels", "\n".join(labels), priority=1, kind="lines"),
+        Section("assignees", "\n".join(assignees), priority=1, kind="lines"),
+        Section("body", body, priority=2),
+        Section("contributors", contributors_info, priority=3, kind="lines"),
+    ])
+    title, body, contributors_info = fitted["title"], fitted["body"], fitted["contributors"]
+    labels, assignees = fitted["labels"].splitlines(), fitted["assignees"].splitlines()
+
     prompt = f"""Please create a comprehensive, professional pull request description based on the following GitHub PR data:
 
 **PR Title:** {title}
@@ -110,20 +178,20 @@ Make the description clear, professional, and helpful for code reviewers. Focus
     return prompt
 
 
-def _get_mock_description(pr_data: Dict) -> str:
+def _get_mock_description(pr_data: PRSnapshot) -> str:
     """Return a mock description for testing or when OpenAI API key is not available."""
-    title = pr_data.get("title", "Unknown PR")
-    repository = pr_data.get("repository", "Unknown repository")
-    contributors = pr_data.get("contributors", [])
+    title = pr_data.title
+    repository = pr_data.repository
+    contributors = pr_data.contributors
     
     # Format contributors for mock description
     contributors_section = ""
     if contributors:
         contributors_list = []
         for contributor in contributors:
-            login = contributor.get("login", "")
-            name = contributor.get("name", login)
-            contributions = contributor.get("contributions", 0)
+            login = contributor.login
+            name = contributor.name
+            contributions = contributor.contributions
             contributors_list.append(f"- @{login} ({name}) - {contributions} commit{'s' if contributions != 1 else ''}")
         contributors_section = "\n".join(contributors_list)
     else:
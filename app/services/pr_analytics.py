@@ -0,0 +1,153 @@
+"""
+Repo-wide PR analytics over the snapshots in the PR store.
+
+The PR store keeps one already-classified analytics row per PR, and each
+worker reads only the rows written since its last ``seq``, so a store change
+costs a read of the changed PRs, not a decode and reclassification of all of
+them. The rows are kept in memory and turned into NumPy columns (categorical
+fields as integer codes, counts as integer arrays, contributors as exploded
+per-PR arrays) that are reused until the next change. Dashboard queries are
+then vectorized masks, ``bincount`` group-bys and percentiles instead of loops
+over Python dicts.
+"""
+import asyncio
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services import pr_store
+from app.utils.single_flight import SingleFlight
+
+PERCENTILES = (50, 75, 90, 95, 99)
+TOP_CONTRIBUTORS = 10
+
+
+def _factorize(values: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """Encode strings as integer codes into a list of categories."""
+    categories: Dict[str, int] = {}
+    codes = np.fromiter((categories.setdefault(value, len(categories)) for value in values), dtype=np.int32, count=len(values))
+    return codes, list(categories)
+
+
+# repository, pr_type, priority, additions, deletions, changed_files, ((login, contributions), ...), review_score
+AnalyticsRow = Tuple[str, str, str, int, int, int, Tuple[Tuple[str, int], ...], Optional[int]]
+
+
+class PRColumns:
+    """Columnar, read-only view of classified PRs and their review scores."""
+
+    def __init__(self, rows: Sequence[AnalyticsRow]):
+        self.size = len(rows)
+
+        self.repository, self.repositories = _factorize([row[0] for row in rows])
+        self.pr_type, self.pr_types = _factorize([row[1] for row in rows])
+        self.priority, self.priorities = _factorize([row[2] for row in rows])
+        self.additions = np.array([row[3] for row in rows], dtype=np.int64)
+        self.deletions = np.array([row[4] for row in rows], dtype=np.int64)
+        self.changed_files = np.array([row[5] for row in rows], dtype=np.int64)
+        self.review_score = np.array(
+            [np.nan if row[7] is None else row[7] for row in rows], dtype=np.float64
+        )
+
+        # One entry per (PR, contributor) pair
+        contributor_rows = [
+            (index, login, contributions)
+            for index, row in enumerate(rows)
+            for login, contributions in row[6]
+        ]
+        self.contributor_pr = np.array([row[0] for row in contributor_rows], dtype=np.int32)
+        self.contributor, self.contributors = _factorize([row[1] for row in contributor_rows])
+        self.contributions = np.array([row[2] for row in contributor_rows], dtype=np.int64)
+
+    def summary(self, repository: Optional[str] = None) -> Dict:
+        """Distributions, percentiles, score histogram and top contributors for one or all repos."""
+        start = time.perf_counter()
+        if repository:
+            code = self.repositories.index(repository) if repository in self.repositories else -1
+            mask = self.repository == code
+        else:
+            mask = np.ones(self.size, dtype=bool)
+        total = int(mask.sum())
+
+        scores = self.review_score[mask]
+        scores = scores[~np.isnan(scores)].astype(np.int64)
+        histogram = np.bincount(np.clip(scores, 1, 10), minlength=11)[1:]
+
+        contributor_mask = mask[self.contributor_pr] if self.contributor_pr.size else self.contributor_pr.astype(bool)
+        codes = self.contributor[contributor_mask]
+        commits = np.bincount(codes, weights=self.contributions[contributor_mask], minlength=len(self.contributors))
+        prs = np.bincount(codes, minlength=len(self.contributors))
+        top = np.argsort(commits, kind="stable")[::-1][:TOP_CONTRIBUTORS]
+
+        return {
+            "repository": repository or "",
+            "repositories": sorted(self.repositories),
+            "total_prs": total,
+            "pr_types": self._distribution(self.pr_type[mask], self.pr_types),
+            "priorities": self._distribution(self.priority[mask], self.priorities),
+            "additions": self._percentiles(self.additions[mask]),
+            "deletions": self._percentiles(self.deletions[mask]),
+            "changed_files": self._percentiles(self.changed_files[mask]),
+            "review_scores": {
+                "reviewed": int(scores.size),
+                "average": round(float(scores.mean()), 2) if scores.size else None,
+                "histogram": [int(count) for count in histogram],
+            },
+            "top_contributors": [
+                {"login": self.contributors[i], "commits": int(commits[i]), "prs": int(prs[i])}
+                for i in top
+                if commits[i] > 0
+            ],
+            "query_ms": round((time.perf_counter() - start) * 1000, 3),
+        }
+
+    @staticmethod
+    def _distribution(codes: np.ndarray, categories: List[str]) -> Dict[str, int]:
+        counts = np.bincount(codes, minlength=len(categories))
+        return {categories[i]: int(counts[i]) for i in np.argsort(counts, kind="stable")[::-1] if counts[i]}
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> Dict[str, int]:
+        if not values.size:
+            return {f"p{p}": 0 for p in PERCENTILES} | {"max": 0}
+        points = np.percentile(values, PERCENTILES)
+        return {f"p{p}": int(round(v)) for p, v in zip(PERCENTILES, points)} | {"max": int(values.max())}
+
+
+_columns: Optional[PRColumns] = None
+# (owner, repo, pr_number) -> row, and the highest store seq applied to it
+_rows: Dict[Tuple[str, str, int], AnalyticsRow] = {}
+_seq = 0
+analytics_flight = SingleFlight()
+
+
+def _apply(changes: Iterable[Tuple]) -> None:
+    """Merge analytics rows read from the store into ``_rows``."""
+    global _seq
+    for seq, owner, repo, pr_number, repository, pr_type, priority, additions, deletions, changed_files, contributors, review_score in changes:
+        _rows[(owner, repo, pr_number)] = (
+            repository, pr_type, priority, additions, deletions, changed_files,
+            tuple((login, contributions) for login, contributions in json.loads(contributors)),
+            review_score,
+        )
+        _seq = max(_seq, seq)
+
+
+async def _load_columns() -> PRColumns:
+    """Apply the store's changes since the last load, rebuilding the columns only if there were any."""
+    global _columns
+    if _columns is None:
+        await asyncio.to_thread(pr_store.backfill_analytics)
+    changes = await asyncio.to_thread(pr_store.analytics_changes, _seq)
+    if _columns is None or changes:
+        _apply(changes)
+        _columns = await asyncio.to_thread(PRColumns, list(_rows.values()))
+    return _columns
+
+
+async def get_pr_analytics(repository: Optional[str] = None) -> Dict:
+    """Return dashboard analytics for one repository (``owner/repo``) or all of them."""
+    columns = await analytics_flight.do("columns", _load_columns)
+    return columns.summary(repository)
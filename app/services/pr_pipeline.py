@@ -0,0 +1,133 @@
+"""
+End-to-end PR generation pipelines shared by the HTTP routes and the job queue.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from app.models.github_snapshot import PRSnapshot
+from app.models.pr_models import PRAnalysisResponse, PRDescriptionResponse, PRReviewResponse
+from app.services import pr_store
+from app.services.diff_review_service import build_diff_review_request
+from app.services.github_service import parse_github_pr_url, fetch_github_pr_data
+from app.services.openai_service import generate_pr_description_with_openai
+from app.services.pr_review_service import generate_pr_review_with_openai
+from app.utils.metrics import stage
+from app.utils.pr_classifier import analyze_pr_data
+from app.utils.single_flight import SingleFlight
+
+# Identical concurrent generations for the same PR and tool share one LLM call.
+generation_flight = SingleFlight()
+
+
+async def _generate(tool: str, owner: str, repo: str, pr_number: int, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+    """Run a generation step, coalesced per PR and tool."""
+    key = (owner.lower(), repo.lower(), pr_number, tool)
+    with stage(tool):
+        return await generation_flight.do(key, func, *args)
+
+
+async def _review(github_data: PRSnapshot) -> Tuple[str, int]:
+    """Review a PR including its diff (map-reduce over chunks for large diffs)."""
+    with stage("diff_review"):
+        review_request = await build_diff_review_request(github_data)
+    review_analysis, review_score, scored = await run_in_threadpool(
+        generate_pr_review_with_openai, github_data, review_request
+    )
+    if scored:
+        await asyncio.to_thread(record_review_score, github_data, review_score)
+    return review_analysis, review_score
+
+
+def record_review_score(github_data: PRSnapshot, review_score: int) -> None:
+    """Store a PR's review score for the analytics dashboard.
+
+    Only real scores belong here; mock and error placeholders would skew it.
+    """
+    owner, _, repo = github_data.repository.partition("/")
+    pr_store.save_review_score(owner, repo, github_data.pr_number, github_data.head_sha, review_score)
+
+
+async def build_pr_description(pr_url: str) -> PRDescriptionResponse:
+    """Generate PR description from GitHub URL."""
+    # Parse GitHub PR URL
+    owner, repo, pr_number = parse_github_pr_url(pr_url)
+
+    # Fetch PR data from GitHub
+    github_data = await fetch_github_pr_data(owner, repo, pr_number)
+
+    # Generate AI description (blocking HTTP call, keep it off the event loop)
+    generated_description = await _generate(
+        "description", owner, repo, pr_number, run_in_threadpool, generate_pr_description_with_openai, github_data
+    )
+
+    # Determine PR type and priority based on labels
+    with stage("classify"):
+        metadata = analyze_pr_data(github_data)
+
+    return PRDescriptionResponse(
+        title=github_data.title,
+        repository=github_data.repository,
+        description=github_data.body or "",
+        pr_type=metadata["pr_type"],
+        priority=metadata["priority"],
+        assignee=metadata["assignee"],
+        generated_description=generated_description,
+        github_data=github_data,
+    )
+
+
+async def build_pr_review(pr_url: str) -> PRReviewResponse:
+    """Generate PR review from GitHub URL."""
+    # Parse GitHub PR URL
+    owner, repo, pr_number = parse_github_pr_url(pr_url)
+
+    # Fetch PR data from GitHub
+    github_data = await fetch_github_pr_data(owner, repo, pr_number)
+
+    # Generate AI review from the PR metadata and its diff
+    review_analysis, review_score = await _generate("review", owner, repo, pr_number, _review, github_data)
+
+    # Determine PR type and priority based on labels
+    with stage("classify"):
+        metadata = analyze_pr_data(github_data)
+
+    return PRReviewResponse(
+        title=github_data.title,
+        repository=github_data.repository,
+        pr_type=metadata["pr_type"],
+        priority=metadata["priority"],
+        assignee=metadata["assignee"],
+        review_analysis=review_analysis,
+        review_score=review_score,
+        github_data=github_data,
+    )
+
+
+async def build_pr_analysis(pr_url: str) -> PRAnalysisResponse:
+    """Generate PR description and review together from one GitHub fetch."""
+    # Parse, fetch and classify once for both tools
+    owner, repo, pr_number = parse_github_pr_url(pr_url)
+    github_data = await fetch_github_pr_data(owner, repo, pr_number)
+    with stage("classify"):
+        metadata = analyze_pr_data(github_data)
+
+    # Run both generations concurrently; total latency is the slower of the two
+    generated_description, (review_analysis, review_score) = await asyncio.gather(
+        _generate("description", owner, repo, pr_number, run_in_threadpool, generate_pr_description_with_openai, github_data),
+        _generate("review", owner, repo, pr_number, _review, github_data),
+    )
+
+    return PRAnalysisResponse(
+        title=github_data.title,
+        repository=github_data.repository,
+        description=github_data.body or "",
+        pr_type=metadata["pr_type"],
+        priority=metadata["priority"],
+        assignee=metadata["assignee"],
+        generated_description=generated_description,
+        review_analysis=review_analysis,
+        review_score=review_score,
+        github_data=github_data,
+    )
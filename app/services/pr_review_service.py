@@ -1,77 +1,153 @@
 """
 PR Review service for generating AI-powered pull request reviews.
 """
+import logging
 import os
 import requests
-from typing import Dict
+from typing import Dict, Generator, Optional, Tuple
 
+from app.models.github_snapshot import PRSnapshot
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import llm_client
+from app.services.model_router import model_router
+from app.utils.metrics import record_fallback, stage
+from app.utils.prompt_budget import Section, count_messages, count_tokens, fit_sections, token_usage
+from app.utils.trivial_pr import trivial_pr_detector, trivial_review
+
+logger = logging.getLogger(__name__)
+
+
+def generate_pr_review_with_openai(pr_data: PRSnapshot, request: Optional[Dict] = None) -> Tuple[str, int, bool]:
+    """Generate PR review using OpenAI.
+
+    ``request`` overrides the default metadata-only chat request, e.g. with
+    one that includes the diff. Trivial PRs get a local review instead.
+    Returns the review, its score and whether the score is real (from the
+    LLM or the trivial-PR path) rather than a mock or error placeholder.
+    """
+    trivial = trivial_pr_detector.detect(pr_data, "review")
+    if trivial is not None:
+        trivial_pr_detector.record("review", trivial)
+        return (*trivial_review(pr_data, trivial), True)
 
-def generate_pr_review_with_openai(pr_data: Dict) -> tuple[str, int]:
-    """Generate PR review using OpenAI."""
     openai_api_key = os.getenv("OPENAI_API_KEY")
     
     if not openai_api_key:
         # Fallback to mock review if no API key is provided
-        return _get_mock_review(pr_data), _get_mock_score(pr_data)
-
-    prompt = _build_pr_review_prompt(pr_data)
+        record_fallback("openai", "no_key")
+        return _get_mock_review(pr_data), _get_mock_score(pr_data), False
 
     try:
-        headers = {
-            "Authorization": f"Bearer {openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        data = {
-            "model": "gpt-3.5-turbo",
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are an expert software developer and code reviewer. Please provide a comprehensive, constructive review of the pull request. Focus on code quality, potential issues, security concerns, and suggestions for improvement. Be thorough but fair."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "max_tokens": 1500,
-            "temperature": 0.7
-        }
-        
-        response = requests.post(
-            "https://api.openai.com/v1/chat/completions", 
-            headers=headers, 
-            json=data, 
-            timeout=30
-        )
-        response.raise_for_status()
-        result = response.json()
-        review_analysis = result["choices"][0]["message"]["content"]
+        data, timeout = model_router.route("review", pr_data, request or build_pr_review_request(pr_data))
+
+        review_analysis = llm_cache.get(data)
+        if review_analysis is None:
+            result = llm_client.complete("review", data, timeout)
+            review_analysis = result["choices"][0]["message"]["content"]
+            token_usage.record_response("review", data, result, review_analysis)
+            llm_cache.store(data, review_analysis)
         
         # Generate a review score based on the analysis
         review_score = _generate_review_score(review_analysis, pr_data)
         
-        return review_analysis.strip(), review_score
+        return review_analysis.strip(), review_score, True
         
     except requests.exceptions.RequestException as e:
-        print(f"Error calling OpenAI API: {e}")
-        return _get_error_review(str(e)), 5
-    except (KeyError, IndexError) as e:
-        print(f"Error parsing OpenAI response: {e}")
-        return _get_error_review("Unexpected response format"), 5
-
-
-def _build_pr_review_prompt(pr_data: Dict) -> str:
-    """Build the prompt for OpenAI based on PR data."""
-    title = pr_data.get("title", "Unknown PR")
-    body = pr_data.get("body", "")
-    labels = [label.get("name", "") for label in pr_data.get("labels", [])]
-    assignees = [assignee.get("login", "") for assignee in pr_data.get("assignees", [])]
-    changed_files = pr_data.get("changed_files", 0)
-    additions = pr_data.get("additions", 0)
-    deletions = pr_data.get("deletions", 0)
-    repository = pr_data.get("repository", "Unknown repository")
-    
+        logger.warning("Error calling OpenAI API: %s", e)
+        record_fallback("openai", "error")
+        return _get_error_review(str(e)), 5, False
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning("Error parsing OpenAI response: %s", e)
+        record_fallback("openai", "error")
+        return _get_error_review("Unexpected response format"), 5, False
+
+
+def stream_pr_review_with_openai(pr_data: PRSnapshot, request: Optional[Dict] = None) -> Generator[str, None, Tuple[int, bool]]:
+    """Generate PR review using OpenAI, yielding text as it arrives.
+
+    The review score and whether it is real are the generator's return
+    value. ``request`` works as in ``generate_pr_review_with_openai``.
+    """
+    trivial = trivial_pr_detector.detect(pr_data, "review")
+    if trivial is not None:
+        trivial_pr_detector.record("review", trivial)
+        review_analysis, review_score = trivial_review(pr_data, trivial)
+        yield review_analysis
+        return review_score, True
+
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+
+    if not openai_api_key:
+        record_fallback("openai", "no_key")
+        yield _get_mock_review(pr_data)
+        return _get_mock_score(pr_data), False
+
+    data, timeout = model_router.route("review", pr_data, request or build_pr_review_request(pr_data))
+    review_analysis = llm_cache.get(data)
+    if review_analysis is not None:
+        yield review_analysis.strip()
+        return _generate_review_score(review_analysis, pr_data), True
+
+    try:
+        parts = yield from llm_client.stream("review", data, timeout)
+    except requests.exceptions.RequestException as e:
+        logger.warning("Error calling OpenAI API: %s", e)
+        record_fallback("openai", "error")
+        yield _get_error_review(str(e))
+        return 5, False
+    except (KeyError, IndexError, ValueError) as e:
+        logger.warning("Error parsing OpenAI response: %s", e)
+        record_fallback("openai", "error")
+        yield _get_error_review("Unexpected response format")
+        return 5, False
+
+    review_analysis = "".join(parts)
+    token_usage.record_completion("review", count_messages(data), count_tokens(review_analysis))
+    llm_cache.store(data, review_analysis)
+    return _generate_review_score(review_analysis, pr_data), True
+
+
+def build_pr_review_request(pr_data: PRSnapshot) -> Dict:
+    """Build the chat completion request body for a PR review."""
+    with stage("prompt"):
+        prompt = _build_pr_review_prompt(pr_data)
+    return {
+        "model": "gpt-3.5-turbo",
+        "messages": [
+            {
+                "role": "system", 
+                "content": "You are an expert software developer and code reviewer. Please provide a comprehensive, constructive review of the pull request. Focus on code quality, potential issues, security concerns, and suggestions for improvement. Be thorough but fair."
+            },
+            {
+                "role": "user", 
+                "content": prompt
+            }
+        ],
+        "max_tokens": 1500,
+        "temperature": 0.7
+    }
+
+
+def _build_pr_review_prompt(pr_data: PRSnapshot) -> str:
+    """Build the prompt for OpenAI based on PR data, fitted to the prompt token budget."""
+    title = pr_data.title
+    body = pr_data.body or ""
+    labels = [label.name for label in pr_data.labels]
+    assignees = [assignee.login for assignee in pr_data.assignees]
+    changed_files = pr_data.changed_files
+    additions = pr_data.additions
+    deletions = pr_data.deletions
+    repository = pr_data.repository
+
+    fitted = fit_sections("review", [
+        Section("title", title, priority=0),
+        Section("labels", "\n".join(labels), priority=1, kind="lines"),
+        Section("assignees", "\n".join(assignees), priority=1, kind="lines"),
+        Section("body", body, priority=2),
+    ])
+    title, body = fitted["title"], fitted["body"]
+    labels, assignees = fitted["labels"].splitlines(), fitted["assignees"].splitlines()
+
     prompt = f"""Please provide a comprehensive code review for the following pull request:
 
 **PR Title:** {title}
@@ -97,7 +173,7 @@ Be constructive, specific, and actionable in your feedback. Focus on helping the
     return prompt
 
 
-def _generate_review_score(review_analysis: str, pr_data: Dict) -> int:
+def _generate_review_score(review_analysis: str, pr_data: PRSnapshot) -> int:
     """Generate a review score (1-10) based on the analysis and PR data."""
     # This is a simplified scoring algorithm
     # In a real implementation, you might use more sophisticated analysis
@@ -122,7 +198,7 @@ def _generate_review_score(review_analysis: str, pr_data: Dict) -> int:
         score -= 1
     
     # Adjust based on PR characteristics
-    changed_files = pr_data.get("changed_files", 0)
+    changed_files = pr_data.changed_files
     if changed_files > 10:
         score -= 1  # Large changes are riskier
     elif changed_files < 3:
@@ -132,10 +208,10 @@ def _generate_review_score(review_analysis: str, pr_data: Dict) -> int:
     return max(1, min(10, score))
 
 
-def _get_mock_review(pr_data: Dict) -> str:
+def _get_mock_review(pr_data: PRSnapshot) -> str:
     """Return a mock review for testing or when OpenAI API key is not available."""
-    title = pr_data.get("title", "Unknown PR")
-    repository = pr_data.get("repository", "Unknown repository")
+    title = pr_data.title
+    repository = pr_data.repository
     
     return f"""## Overall Assessment
 This pull request {title.lower()} in the {repository} repository appears to be a well-structured change.
@@ -167,7 +243,7 @@ This pull request {title.lower()} in the {repository} repository appears to be a
 **Note:** This is a sample review generated when OpenAI API is not available. Please configure your OpenAI API key for AI-powered reviews."""
 
 
-def _get_mock_score(pr_data: Dict) -> int:
+def _get_mock_score(pr_data: PRSnapshot) -> int:
     """Return a mock score for testing."""
     return 7
 
@@ -0,0 +1,320 @@
+"""
+Persistent PR snapshot store shared by all app workers.
+
+Snapshots are the ``PRSnapshot`` structs built by ``fetch_github_pr_data``
+and are stored as JSON in a local SQLite database in WAL mode, so one
+worker's fetch is a local read for every other worker and survives restarts.
+Background jobs are kept here too, so any worker can answer a status poll, and
+so is a classified per-PR analytics row that dashboards read incrementally.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import msgspec
+
+from app.models.github_snapshot import PRSnapshot, decode_snapshot, encode_snapshot
+from app.utils.pr_classifier import analyze_pr_data
+
+logger = logging.getLogger(__name__)
+
+PR_STORE_PATH = os.getenv("PR_STORE_PATH", os.path.join("data", "pr_store.sqlite3"))
+
+_local = threading.local()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pr_snapshots (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    updated_at TEXT NOT NULL,
+    head_sha TEXT NOT NULL,
+    snapshot TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (owner, repo, pr_number, updated_at, head_sha)
+);
+CREATE TABLE IF NOT EXISTS pr_review_scores (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    head_sha TEXT NOT NULL,
+    review_score INTEGER NOT NULL,
+    reviewed_at REAL NOT NULL,
+    PRIMARY KEY (owner, repo, pr_number)
+);
+CREATE TABLE IF NOT EXISTS repo_sync_cursors (
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (owner, repo)
+);
+-- One row per PR with the fields the dashboard reads; every write takes a new,
+-- higher seq, so readers load only the rows changed since their last seq
+CREATE TABLE IF NOT EXISTS pr_analytics (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    owner TEXT NOT NULL,
+    repo TEXT NOT NULL,
+    pr_number INTEGER NOT NULL,
+    repository TEXT NOT NULL,
+    pr_type TEXT NOT NULL,
+    priority TEXT NOT NULL,
+    additions INTEGER NOT NULL,
+    deletions INTEGER NOT NULL,
+    changed_files INTEGER NOT NULL,
+    contributors TEXT NOT NULL,
+    review_score INTEGER,
+    UNIQUE (owner, repo, pr_number)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    error TEXT,
+    result TEXT
+);
+"""
+
+_ANALYTICS_COLUMNS = (
+    "owner, repo, pr_number, repository, pr_type, priority, additions, deletions, changed_files, contributors, review_score"
+)
+
+
+def is_enabled() -> bool:
+    """Whether a store path is configured."""
+    return bool(PR_STORE_PATH)
+
+
+def _connect() -> sqlite3.Connection:
+    """Return this thread's connection, creating the database on first use."""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(PR_STORE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(PR_STORE_PATH, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        _local.conn = conn
+    return conn
+
+
+def get_pr_snapshot(owner: str, repo: str, pr_number: int, updated_at: str, head_sha: str) -> Optional[PRSnapshot]:
+    """Return the stored snapshot for this exact PR version, if any."""
+    if not is_enabled():
+        return None
+    try:
+        row = _connect().execute(
+            "SELECT snapshot FROM pr_snapshots "
+            "WHERE owner = ? AND repo = ? AND pr_number = ? AND updated_at = ? AND head_sha = ?",
+            (owner.lower(), repo.lower(), pr_number, updated_at, head_sha),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Error reading PR store: %s", e)
+        return None
+    return _decode(row[0]) if row else None
+
+
+def _decode(snapshot: str) -> Optional[PRSnapshot]:
+    """Decode a stored snapshot; rows that no longer fit the schema are treated as missing."""
+    try:
+        return decode_snapshot(snapshot)
+    except msgspec.DecodeError as e:
+        logger.warning("Skipping unreadable PR snapshot: %s", e)
+        return None
+
+
+def save_pr_snapshot(owner: str, repo: str, pr_number: int, snapshot: PRSnapshot) -> None:
+    """Store a snapshot, replacing older versions of the same PR."""
+    if not is_enabled():
+        return
+    key = (owner.lower(), repo.lower(), pr_number)
+    analytics = _analytics_values(snapshot)
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "DELETE FROM pr_snapshots WHERE owner = ? AND repo = ? AND pr_number = ?",
+                key,
+            )
+            conn.execute(
+                "INSERT INTO pr_snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (*key, snapshot.updated_at, snapshot.head_sha, encode_snapshot(snapshot).decode(), time.time()),
+            )
+            _write_analytics(conn, key, analytics)
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+
+
+def save_review_score(owner: str, repo: str, pr_number: int, head_sha: str, review_score: int) -> None:
+    """Remember the latest review score of a PR for analytics."""
+    if not is_enabled():
+        return
+    key = (owner.lower(), repo.lower(), pr_number)
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pr_review_scores VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, head_sha, review_score, time.time()),
+            )
+            # Re-insert the PR's analytics row (if any) with the score, under a new seq
+            conn.execute(
+                f"INSERT OR REPLACE INTO pr_analytics ({_ANALYTICS_COLUMNS}) "
+                f"SELECT {_ANALYTICS_COLUMNS.replace('review_score', '?')} FROM pr_analytics "
+                "WHERE owner = ? AND repo = ? AND pr_number = ?",
+                (review_score, *key),
+            )
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+
+
+def get_sync_cursor(owner: str, repo: str) -> Optional[str]:
+    """Return the newest PR ``updated_at`` synced for a repository, if any."""
+    if not is_enabled():
+        return None
+    try:
+        row = _connect().execute(
+            "SELECT updated_at FROM repo_sync_cursors WHERE owner = ? AND repo = ?",
+            (owner.lower(), repo.lower()),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Error reading PR store: %s", e)
+        return None
+    return row[0] if row else None
+
+
+def save_sync_cursor(owner: str, repo: str, updated_at: str) -> None:
+    """Advance a repository's sync high-water mark."""
+    if not is_enabled():
+        return
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO repo_sync_cursors VALUES (?, ?, ?, ?)",
+                (owner.lower(), repo.lower(), updated_at, time.time()),
+            )
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+
+
+def save_job(
+    job_id: str,
+    kind: str,
+    status: str,
+    created_at: float,
+    started_at: Optional[float],
+    finished_at: Optional[float],
+    error: Optional[str],
+    result: Optional[str],
+) -> None:
+    """Store the current state of a background job (``result`` is JSON)."""
+    if not is_enabled():
+        return
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, status, created_at, started_at, finished_at, error, result),
+            )
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+
+
+def get_job(job_id: str) -> Optional[Tuple]:
+    """Return ``(kind, status, created_at, started_at, finished_at, error, result)`` of a job, if stored."""
+    if not is_enabled():
+        return None
+    try:
+        return _connect().execute(
+            "SELECT kind, status, created_at, started_at, finished_at, error, result FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning("Error reading PR store: %s", e)
+        return None
+
+
+def prune_jobs(before: float) -> None:
+    """Delete jobs that finished (or, if abandoned by their worker, were created) before ``before``."""
+    if not is_enabled():
+        return
+    try:
+        conn = _connect()
+        with conn:
+            conn.execute("DELETE FROM jobs WHERE COALESCE(finished_at, created_at) < ?", (before,))
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+
+
+def _analytics_values(snapshot: PRSnapshot) -> Tuple:
+    """Analytics columns of a snapshot, classified once here instead of on every load."""
+    metadata = analyze_pr_data(snapshot)
+    contributors = json.dumps([[contributor.login, contributor.contributions] for contributor in snapshot.contributors])
+    return (
+        snapshot.repository, metadata["pr_type"], metadata["priority"],
+        snapshot.additions, snapshot.deletions, snapshot.changed_files, contributors,
+    )
+
+
+def _write_analytics(conn: sqlite3.Connection, key: Tuple, values: Tuple, replace: bool = True) -> None:
+    """Upsert a PR's analytics row under a new ``seq``, carrying over its latest review score."""
+    conn.execute(
+        f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO pr_analytics ({_ANALYTICS_COLUMNS}) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+        "(SELECT review_score FROM pr_review_scores WHERE owner = ? AND repo = ? AND pr_number = ?))",
+        (*key, *values, *key),
+    )
+
+
+def backfill_analytics() -> int:
+    """Add analytics rows for snapshots stored without one (e.g. by an older version); returns how many."""
+    if not is_enabled():
+        return 0
+    try:
+        conn = _connect()
+        rows = conn.execute(
+            "SELECT s.owner, s.repo, s.pr_number, s.snapshot FROM pr_snapshots s "
+            "LEFT JOIN pr_analytics a ON a.owner = s.owner AND a.repo = s.repo AND a.pr_number = s.pr_number "
+            "WHERE a.seq IS NULL"
+        ).fetchall()
+        decoded = [(owner, repo, pr_number, _decode(snapshot)) for owner, repo, pr_number, snapshot in rows]
+        missing = [((owner, repo, pr_number), _analytics_values(snapshot)) for owner, repo, pr_number, snapshot in decoded if snapshot]
+        with conn:
+            for key, values in missing:
+                # A concurrent save already wrote a newer row
+                _write_analytics(conn, key, values, replace=False)
+    except sqlite3.Error as e:
+        logger.warning("Error writing PR store: %s", e)
+        return 0
+    return len(missing)
+
+
+def analytics_changes(since: int) -> List[Tuple]:
+    """Analytics rows written after ``since`` (a ``seq``), oldest first.
+
+    Rows are ``(seq, owner, repo, pr_number, repository, pr_type, priority,
+    additions, deletions, changed_files, contributors, review_score)`` with
+    ``contributors`` as JSON ``[[login, contributions], ...]`` and
+    ``review_score`` None until the PR is reviewed.
+    """
+    if not is_enabled():
+        return []
+    try:
+        return _connect().execute(
+            f"SELECT seq, {_ANALYTICS_COLUMNS} FROM pr_analytics WHERE seq > ? ORDER BY seq", (since,)
+        ).fetchall()
+    except sqlite3.Error as e:
+        logger.warning("Error reading PR store: %s", e)
+        return []
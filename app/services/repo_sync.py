@@ -0,0 +1,142 @@
+"""
+Incremental sync of a repository's pull requests into the PR store.
+
+PRs are listed newest-updated first, 100 per page, and the walk stops at the
+repository's high-water mark (the newest ``updated_at`` synced so far), so a
+resync costs one list page plus one fetch per PR that changed since. Listed
+PRs whose exact version is already stored are skipped without fetching.
+"""
+import asyncio
+import hmac
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.models.github_snapshot import WirePullRequest
+from app.services import pr_store
+from app.services.github_service import fetch_github_pr_data, list_pull_requests
+from app.services.github_tokens import GitHubRateLimited, get_token_pool
+from app.utils.single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+
+# PR fetches per sync run; a first sync of a large repo backfills over several runs
+REPO_SYNC_MAX_PRS = int(os.getenv("REPO_SYNC_MAX_PRS", "500"))
+REPO_SYNC_CONCURRENCY = int(os.getenv("REPO_SYNC_CONCURRENCY", "8"))
+
+# Bearer token the sync endpoint requires; the endpoint is disabled while unset
+REPO_SYNC_TOKEN = os.getenv("REPO_SYNC_TOKEN", "")
+
+# Concurrent syncs of the same repository share one run
+sync_flight = SingleFlight()
+
+
+def verify_sync_token(authorization: Optional[str]) -> bool:
+    """Check an ``Authorization: Bearer ...`` header against ``REPO_SYNC_TOKEN``."""
+    if not REPO_SYNC_TOKEN or not authorization:
+        return False
+    scheme, _, token = authorization.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), REPO_SYNC_TOKEN)
+
+
+async def sync_repository(owner: str, repo: str) -> Dict:
+    """Fetch the PRs of ``owner/repo`` updated since the last sync into the PR store."""
+    key = (owner.lower(), repo.lower())
+    return await sync_flight.do(key, _sync_repository, owner, repo)
+
+
+async def _sync_repository(owner: str, repo: str) -> Dict:
+    """Sync one repository without coalescing."""
+    if not get_token_pool():
+        raise HTTPException(status_code=400, detail="Repository sync requires a GitHub token")
+    if not pr_store.is_enabled():
+        raise HTTPException(status_code=400, detail="Repository sync requires the PR store (PR_STORE_PATH)")
+
+    start = time.perf_counter()
+    cursor = await asyncio.to_thread(pr_store.get_sync_cursor, owner, repo)
+    semaphore = asyncio.Semaphore(REPO_SYNC_CONCURRENCY)
+    summary = {
+        "repository": f"{owner}/{repo}",
+        "previous_cursor": cursor,
+        "pages": 0,
+        "listed": 0,
+        "unchanged": 0,
+        "fetched": 0,
+        "failed": 0,
+    }
+    newest: Optional[str] = None
+    complete = True
+    page = 1
+
+    while True:
+        try:
+            items = await list_pull_requests(owner, repo, page, PAGE_SIZE)
+        except GitHubRateLimited as e:
+            raise HTTPException(
+                status_code=503,
+                detail=str(e),
+                headers={"Retry-After": str(int(e.retry_after) + 1)},
+            )
+        except httpx.HTTPError as e:
+            logger.warning("Error listing pull requests: %s", e)
+            raise HTTPException(status_code=502, detail=f"Error listing pull requests for {owner}/{repo}")
+        summary["pages"] += 1
+
+        # Everything at or below the high-water mark was synced by an earlier run
+        changed = [item for item in items if cursor is None or item.updated_at > cursor]
+        summary["listed"] += len(changed)
+        if changed and newest is None:
+            newest = changed[0].updated_at
+
+        budget = REPO_SYNC_MAX_PRS - summary["fetched"] - summary["failed"]
+        results = await asyncio.gather(*(_sync_pr(owner, repo, item, semaphore) for item in changed[:max(budget, 0)]))
+        for result in results:
+            summary[result] += 1
+
+        if len(changed) > budget or "failed" in results:
+            # Keep the old mark so the next run picks up what was skipped here
+            complete = False
+            break
+        if len(changed) < len(items) or len(items) < PAGE_SIZE:
+            break
+        page += 1
+
+    if complete and newest:
+        await asyncio.to_thread(pr_store.save_sync_cursor, owner, repo, newest)
+        cursor = newest
+
+    summary["cursor"] = cursor
+    summary["complete"] = complete
+    summary["elapsed"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+async def _sync_pr(owner: str, repo: str, item: WirePullRequest, semaphore: asyncio.Semaphore) -> str:
+    """Store one listed PR and return "unchanged", "fetched" or "failed"."""
+    pr_number = item.number
+    head_sha = item.head.sha if item.head else ""
+    stored = await asyncio.to_thread(
+        pr_store.get_pr_snapshot, owner, repo, pr_number, item.updated_at, head_sha
+    )
+    if stored is not None:
+        return "unchanged"
+
+    async with semaphore:
+        try:
+            snapshot = await fetch_github_pr_data(owner, repo, pr_number)
+        except HTTPException as e:
+            logger.warning("Error syncing %s/%s#%s: %s", owner, repo, pr_number, e.detail)
+            return "failed"
+    # Fetch errors fall back to mock data and partial fetches are not stored; either way
+    # the PR is retried by the next run
+    stored = await asyncio.to_thread(
+        pr_store.get_pr_snapshot, owner, repo, pr_number, snapshot.updated_at, snapshot.head_sha
+    )
+    return "fetched" if snapshot.head_sha and stored is not None else "failed"
+
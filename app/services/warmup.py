@@ -0,0 +1,104 @@
+"""
+Startup warm-up and readiness.
+
+Runs in the background once the app is serving. It does the work that
+would otherwise land on the first real requests:
+
+- compiling every template (through the persistent bytecode cache when
+  ``JINJA_CACHE_DIR`` is set);
+- importing modules deferred at startup (NumPy for analytics) and loading
+  the tokenizer;
+- opening pooled connections to GitHub and the LLM provider, so the DNS,
+  TCP and TLS setup is already done.
+
+``/ready`` answers 503 until it has finished. A failed step is logged and
+reported, but does not hold readiness back, because the app can still
+serve without it.
+"""
+import asyncio
+import importlib
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from jinja2 import Environment
+
+from app.services.github_service import warm_github_client
+from app.services.github_tokens import get_token_pool
+from app.services.llm_client import llm_client
+from app.utils.metrics import stage
+from app.utils.prompt_budget import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Imported by the warm-up instead of at startup
+DEFERRED_IMPORTS = ("app.services.pr_analytics",)
+
+
+def compile_templates(env: Environment) -> int:
+    """Load (compile) every template of ``env``; returns how many there are."""
+    names = env.list_templates(extensions=("html",))
+    for name in names:
+        env.get_template(name)
+    return len(names)
+
+
+def _load_deferred() -> None:
+    for module in DEFERRED_IMPORTS:
+        importlib.import_module(module)
+    # Loads the tiktoken encoding, when installed
+    count_tokens("warm-up")
+
+
+class Warmup:
+    """Runs the warm-up steps once and tracks readiness."""
+
+    def __init__(self):
+        self.ready = False
+        self.seconds: Optional[float] = None
+        self.steps: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self.templates = 0
+
+    async def run(self, env: Environment) -> None:
+        """Run every step, then mark the app ready."""
+        start = time.perf_counter()
+        with stage("warmup"):
+            steps = [
+                self._step("templates", lambda: asyncio.to_thread(self._compile, env)),
+                self._step("imports", lambda: asyncio.to_thread(_load_deferred)),
+            ]
+            if get_token_pool():
+                steps.append(self._step("github", warm_github_client))
+            if os.getenv("OPENAI_API_KEY"):
+                steps.append(self._step("openai", lambda: asyncio.to_thread(llm_client.warm)))
+            await asyncio.gather(*steps)
+        self.seconds = time.perf_counter() - start
+        self.ready = True
+        logger.info("Warm-up finished in %.3fs: %s", self.seconds, self.steps)
+
+    def _compile(self, env: Environment) -> None:
+        self.templates = compile_templates(env)
+
+    async def _step(self, name: str, func: Callable[[], Awaitable[None]]) -> None:
+        start = time.perf_counter()
+        try:
+            await func()
+        except Exception as e:
+            logger.warning("Warm-up step %s failed: %s", name, e)
+            self.errors[name] = str(e)
+        self.steps[name] = round(time.perf_counter() - start, 4)
+
+    def stats(self) -> Dict:
+        """Return readiness, warm-up timings and failed steps."""
+        return {
+            "ready": self.ready,
+            "warmup_seconds": round(self.seconds, 4) if self.seconds is not None else None,
+            "steps": dict(self.steps),
+            "templates": self.templates,
+            "errors": dict(self.errors),
+        }
+
+
+warmup = Warmup()
@@ -0,0 +1,108 @@
+"""
+GitHub webhook ingestion: precompute results before anyone asks for them.
+
+``pull_request`` opened/synchronize/edited deliveries invalidate the cached
+GitHub responses for that PR and queue a background analysis (snapshot,
+classification, description and review). The results land in the PR store
+and the LLM cache, so the first interactive request is usually a cache hit.
+
+Precomputes run on their own small queue, so a burst of deliveries cannot
+crowd interactive requests out of the main job queue. Snapshots are shared
+through the PR store, but generated text is only shared between workers when
+the LLM cache is on disk (``LLM_CACHE_DIR``); invalidation only reaches this
+worker's GitHub response cache, the others revalidate within
+``GITHUB_CACHE_TTL``.
+"""
+import hashlib
+import hmac
+import logging
+import os
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.services.github_service import github_response_cache
+from app.services.job_queue import Job, JobQueue
+from app.services.llm_cache import llm_cache
+from app.services.pr_pipeline import build_pr_analysis
+
+logger = logging.getLogger(__name__)
+
+GITHUB_WEBHOOK_SECRET = os.getenv("GITHUB_WEBHOOK_SECRET", "")
+
+# Whether accepted deliveries queue a precomputation (else they only invalidate)
+WEBHOOK_PRECOMPUTE = os.getenv("WEBHOOK_PRECOMPUTE", "true").lower() == "true"
+
+PRECOMPUTE_ACTIONS = ("opened", "synchronize", "edited")
+
+# Background precomputes, kept apart from (and smaller than) the interactive job queue;
+# when it is full, deliveries only invalidate
+precompute_queue = JobQueue(
+    workers=int(os.getenv("WEBHOOK_PRECOMPUTE_WORKERS", "2")),
+    max_pending=int(os.getenv("WEBHOOK_PRECOMPUTE_MAX_PENDING", "50")),
+)
+_warned_memory_cache = False
+
+# Latest precompute job per PR, so bursts of pushes queue one job rather than many
+_pending: Dict[Tuple[str, str, int], Job] = {}
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """Return the ``X-Hub-Signature-256`` value GitHub would send for ``body``."""
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body: bytes, signature: Optional[str]) -> bool:
+    """Check a delivery's ``X-Hub-Signature-256`` against ``GITHUB_WEBHOOK_SECRET``."""
+    if not GITHUB_WEBHOOK_SECRET or not signature:
+        return False
+    return hmac.compare_digest(sign_payload(body, GITHUB_WEBHOOK_SECRET), signature)
+
+
+def invalidate_pr(owner: str, repo: str, pr_number: int) -> int:
+    """Drop cached GitHub responses for a PR and the repository's PR listing."""
+    base = f"/repos/{owner}/{repo}"
+    dropped = github_response_cache.discard(f"{base}/pulls/{pr_number}")
+    for prefix in (f"{base}/pulls/{pr_number}/", f"{base}/issues/{pr_number}/", f"{base}/pulls?"):
+        dropped += github_response_cache.invalidate(prefix)
+    return dropped
+
+
+async def handle_pull_request_event(payload: Dict) -> Dict:
+    """Invalidate and schedule precomputation for one ``pull_request`` delivery."""
+    action = payload.get("action", "")
+    pull_request = payload.get("pull_request") or {}
+    repository = (payload.get("repository") or {}).get("full_name", "")
+    owner, _, repo = repository.partition("/")
+    pr_number = pull_request.get("number")
+    if action not in PRECOMPUTE_ACTIONS or not repo or not pr_number:
+        return {"status": "ignored", "action": action}
+
+    invalidated = invalidate_pr(owner, repo, pr_number)
+    result = {"status": "invalidated", "action": action, "pr": f"{repository}#{pr_number}", "invalidated": invalidated}
+    if not WEBHOOK_PRECOMPUTE or pull_request.get("state", "open") != "open":
+        return result
+
+    key = (owner.lower(), repo.lower(), pr_number)
+    job = _pending.get(key)
+    if job is None or job.status != "queued":
+        # A queued job has not fetched yet, so it will see this update too
+        pr_url = pull_request.get("html_url") or f"https://github.com/{owner}/{repo}/pull/{pr_number}"
+        try:
+            # Persisted so /jobs/{id} finds it from any worker
+            job = await precompute_queue.submit("analysis", build_pr_analysis, pr_url, persist=True)
+        except HTTPException:
+            return {**result, "precompute": "skipped, queue full"}
+        _warn_memory_cache()
+        for pending_key in [k for k, j in _pending.items() if j.finished_at is not None]:
+            del _pending[pending_key]
+        _pending[key] = job
+    return {**result, "status": "queued", "job_id": job.id}
+
+
+def _warn_memory_cache() -> None:
+    """Say once that precomputed text stays in this worker without a disk LLM cache."""
+    global _warned_memory_cache
+    if llm_cache.directory is None and not _warned_memory_cache:
+        _warned_memory_cache = True
+        logger.warning("LLM_CACHE_DIR is not set: precomputed descriptions and reviews are only cached in this worker")
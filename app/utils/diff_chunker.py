@@ -0,0 +1,159 @@
+"""
+Incremental splitting of a unified diff into review-sized chunks.
+
+Lines are fed one at a time as they are downloaded. Small files are grouped
+together, large files are split at hunk boundaries, and oversized hunks are
+truncated, so every chunk stays under a token budget and at most one file is
+held in memory before it is handed off. Lines are measured with the same
+counter as the rest of the prompt budgeting (``prompt_budget.count_tokens``).
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from app.utils.prompt_budget import count_tokens
+
+
+def _line_tokens(line: str) -> int:
+    """Tokens of one diff line, plus one for its newline."""
+    return count_tokens(line) + 1
+
+
+@dataclass
+class DiffChunk:
+    """A slice of the diff small enough for one review call."""
+    files: List[str]
+    text: str
+
+    @property
+    def tokens(self) -> int:
+        return count_tokens(self.text)
+
+
+@dataclass
+class _File:
+    name: str
+    header: List[str] = field(default_factory=list)
+    header_tokens: int = 0
+    hunks: List[List[str]] = field(default_factory=list)
+    hunk_tokens: List[int] = field(default_factory=list)
+    tokens: int = 0
+    hunk_truncated: bool = False
+
+
+class DiffChunker:
+    """Turn unified diff lines into chunks of at most ``max_tokens`` each.
+
+    Once ``max_chunks`` chunks have been produced, the remaining files are only
+    listed in ``skipped`` so memory stays bounded for huge diffs.
+    """
+
+    def __init__(self, max_tokens: int = 3000, max_chunks: int = 60):
+        self.max_tokens = max_tokens
+        self.max_chunks = max_chunks
+        self.emitted = 0
+        self.files = 0
+        self.skipped: List[str] = []
+        self._file: Optional[_File] = None
+        self._group: List[_File] = []
+        self._group_tokens = 0
+        self._ready: List[DiffChunk] = []
+
+    def feed(self, line: str) -> List[DiffChunk]:
+        """Consume one diff line and return any chunks that are now complete."""
+        if line.startswith("diff --git "):
+            self._finish_file()
+            # "diff --git a/path b/path": the new path is the reviewer-relevant one
+            name = line.rsplit(" b/", 1)[-1] if " b/" in line else line[len("diff --git "):]
+            tokens = _line_tokens(line)
+            self._file = _File(name=name, header=[line], header_tokens=tokens, tokens=tokens)
+        elif self._file is None:
+            pass
+        elif self.emitted >= self.max_chunks:
+            # Over the chunk budget: stop keeping content, the file is only listed
+            pass
+        elif line.startswith("@@"):
+            self._close_hunk(self._file)
+            tokens = _line_tokens(line)
+            self._file.hunks.append([line])
+            self._file.hunk_tokens.append(tokens)
+            self._file.tokens += tokens
+        elif self._file.hunks:
+            tokens = _line_tokens(line)
+            if self._file.hunk_tokens[-1] + tokens > self.max_tokens:
+                self._file.hunk_truncated = True
+            else:
+                self._file.hunks[-1].append(line)
+                self._file.hunk_tokens[-1] += tokens
+                self._file.tokens += tokens
+        else:
+            tokens = _line_tokens(line)
+            self._file.header.append(line)
+            self._file.header_tokens += tokens
+            self._file.tokens += tokens
+        return self._take_ready()
+
+    def close(self) -> List[DiffChunk]:
+        """Flush the last file and group once the diff has been read."""
+        self._finish_file()
+        self._emit_group()
+        return self._take_ready()
+
+    def _take_ready(self) -> List[DiffChunk]:
+        ready, self._ready = self._ready, []
+        return ready
+
+    @staticmethod
+    def _close_hunk(diff_file: _File) -> None:
+        if diff_file.hunk_truncated:
+            diff_file.hunks[-1].append("... [hunk truncated]")
+            diff_file.hunk_truncated = False
+
+    def _finish_file(self) -> None:
+        current, self._file = self._file, None
+        if current is None:
+            return
+        self.files += 1
+        if self.emitted >= self.max_chunks or not current.hunks:
+            # Over budget, binary, or a pure rename/mode change: nothing to review
+            self.skipped.append(current.name)
+            return
+        self._close_hunk(current)
+
+        if current.tokens <= self.max_tokens:
+            if self._group_tokens + current.tokens > self.max_tokens:
+                self._emit_group()
+            self._group.append(current)
+            self._group_tokens += current.tokens
+            return
+
+        # Too big to share a chunk: split this file at hunk boundaries
+        self._emit_group()
+        piece: List[str] = list(current.header)
+        piece_tokens = current.header_tokens
+        for hunk, hunk_tokens in zip(current.hunks, current.hunk_tokens):
+            if piece_tokens + hunk_tokens > self.max_tokens and len(piece) > len(current.header):
+                self._emit([current.name], piece)
+                piece = list(current.header)
+                piece_tokens = current.header_tokens
+            piece.extend(hunk)
+            piece_tokens += hunk_tokens
+        self._emit([current.name], piece)
+
+    def _emit_group(self) -> None:
+        if not self._group:
+            return
+        lines: List[str] = []
+        for diff_file in self._group:
+            lines.extend(diff_file.header)
+            for hunk in diff_file.hunks:
+                lines.extend(hunk)
+        self._emit([diff_file.name for diff_file in self._group], lines)
+        self._group = []
+        self._group_tokens = 0
+
+    def _emit(self, files: List[str], lines: List[str]) -> None:
+        if self.emitted >= self.max_chunks:
+            self.skipped.extend(name for name in files if name not in self.skipped)
+            return
+        self.emitted += 1
+        self._ready.append(DiffChunk(files=files, text="\n".join(lines)))
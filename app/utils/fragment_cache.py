@@ -0,0 +1,149 @@
+"""
+Rendered-fragment cache with conditional and compressed responses.
+
+Pages and partials are rendered once per template and version key (static
+pages have none, results use the PR snapshot version plus a digest of the
+generated content) and kept as bytes with a strong ETag. Responses answer
+``If-None-Match`` with ``304 Not Modified`` and reuse gzip/brotli encodings
+computed on first use, so repeat views skip rendering, compression and most
+of the bytes. Brotli is used when the optional ``brotli`` package is installed.
+"""
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.templating import Jinja2Templates
+from pydantic import BaseModel
+
+from app.utils.metrics import stage
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+# Smaller bodies are sent uncompressed; the framing overhead outweighs the savings
+COMPRESS_MIN_BYTES = 1024
+
+
+@dataclass
+class Fragment:
+    """Rendered HTML, its ETag and its compressed encodings (filled on first use)."""
+    body: bytes
+    etag: str
+    encodings: Dict[str, bytes] = field(default_factory=dict)
+
+    def encoded(self, encoding: str) -> bytes:
+        content = self.encodings.get(encoding)
+        if content is None:
+            if encoding == "br":
+                content = brotli.compress(self.body, quality=5)
+            else:
+                content = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self.encodings[encoding] = content
+        return content
+
+
+def _accepted_encoding(request: Request) -> Optional[str]:
+    """Pick br or gzip from ``Accept-Encoding`` (ignoring entries with q=0)."""
+    accepted = set()
+    for item in request.headers.get("Accept-Encoding", "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            accepted.add(name.strip().lower())
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+def result_key(result: BaseModel) -> Tuple:
+    """Version key of a result model: its PR snapshot version plus a digest of the generated fields."""
+    github_data = getattr(result, "github_data", None)
+    generated = result.model_dump_json(exclude={"github_data"}).encode()
+    version = (
+        (github_data.repository, github_data.pr_number, github_data.updated_at, github_data.head_sha)
+        if github_data is not None else ()
+    )
+    return (*version, hashlib.blake2b(generated, digest_size=16).hexdigest())
+
+
+class FragmentCache:
+    """Thread-safe LRU of rendered fragments keyed by template and version key."""
+
+    def __init__(self, templates: Jinja2Templates, max_entries: int = 256):
+        self.templates = templates
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Fragment]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def render(self, template_name: str, context: Any, key: Hashable = ()) -> Fragment:
+        """Return the cached fragment for ``template_name`` and ``key``, rendering it on a miss.
+
+        ``context`` is a dict, or a callable returning one, and is only used on
+        a miss; it must not depend on anything outside ``key``.
+        """
+        # get_template checks the file for changes, so edited templates are re-rendered
+        template = self.templates.get_template(template_name)
+        cache_key = (template_name, id(template), key)
+        with self._lock:
+            fragment = self._entries.get(cache_key)
+            if fragment is not None:
+                self._entries.move_to_end(cache_key)
+                self.hits += 1
+                return fragment
+            self.misses += 1
+
+        with stage("render"):
+            body = template.render(context() if callable(context) else context).encode()
+        fragment = Fragment(body, f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"')
+        with self._lock:
+            self._entries[cache_key] = fragment
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fragment
+
+    def respond(self, request: Request, fragment: Fragment, cache_control: str = "no-cache") -> Response:
+        """Serve a fragment with its ETag, as a 304 if the client has it, compressed if accepted."""
+        headers = {
+            "ETag": fragment.etag,
+            "Cache-Control": cache_control,
+            # Pages serve a partial or the full layout depending on HX-Request
+            "Vary": "HX-Request, Accept-Encoding",
+        }
+        if_none_match = request.headers.get("If-None-Match", "")
+        if fragment.etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(",")):
+            with self._lock:
+                self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+
+        content = fragment.body
+        encoding = _accepted_encoding(request) if len(content) >= COMPRESS_MIN_BYTES else None
+        if encoding is not None:
+            content = fragment.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+        return Response(content, media_type="text/html", headers=headers)
+
+    def page(self, request: Request, template_name: str) -> Response:
+        """Serve a static page or partial."""
+        return self.respond(request, self.render(template_name, {}))
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+                "brotli": brotli is not None,
+            }
@@ -0,0 +1,66 @@
+"""
+Lean JSON responses for API clients of the generation routes.
+
+By default a result is returned with its typed fields only: the raw
+``github_data`` snapshot (contributors, avatars, emails, users) is replaced
+by a ``pr`` summary (``PRSnapshotSummary``). ``view=full`` restores the raw
+snapshot and ``fields=`` keeps only the listed top-level fields. Bodies are
+encoded with ``orjson`` when it is installed, ``msgspec`` (a core dependency)
+otherwise.
+"""
+from typing import Any, Dict, Iterable, Optional
+
+import msgspec
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from app.models.pr_models import PRSnapshotSummary
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+_encoder = msgspec.json.Encoder()
+
+
+def dumps(content: Any) -> bytes:
+    """Compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return _encoder.encode(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """``JSONResponse`` encoded with ``dumps()``."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(value: Optional[str]) -> Optional[list]:
+    """Split a ``fields=title,review_score`` value; ``None`` when no selection was given."""
+    if not value:
+        return None
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def result_payload(result: BaseModel, view: str = "lean", fields: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """Serialize a generation result in the ``lean`` or ``full`` view, keeping only ``fields`` if given.
+
+    Raises ``ValueError`` naming the fields that the view does not have.
+    """
+    if view == "full":
+        payload = result.model_dump(mode="json")
+    else:
+        payload = result.model_dump(exclude={"github_data"})
+        github_data = getattr(result, "github_data", None)
+        if github_data is not None:
+            payload["pr"] = PRSnapshotSummary.from_snapshot(github_data).model_dump()
+
+    if fields is None:
+        return payload
+    unknown = [name for name in fields if name not in payload]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)} (available: {', '.join(payload)})")
+    return {name: payload[name] for name in fields}
@@ -0,0 +1,295 @@
+"""
+Latency histograms and counters for the hot path, in the Prometheus text format.
+
+Pipeline stages (URL parsing, the GitHub fetch, prompt building, generation,
+classification, rendering) are timed with ``stage()`` and upstream HTTP calls
+with ``upstream()``, labelled by service, endpoint and status. Timings taken
+while serving a request are also collected for its ``Server-Timing`` header
+by ``MetricsMiddleware``.
+"""
+import bisect
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    """A named metric with one series per combination of label values."""
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], *extra: Tuple[str, str]) -> str:
+        pairs = [*zip(self.labelnames, key), *extra]
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key: Tuple[str, ...], value: object) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def _samples(self, key: Tuple[str, ...], value: float) -> List[str]:
+        return [f"{self.name}_total{self._labels(key)} {value:g}"]
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = float(value)
+
+    def _samples(self, key: Tuple[str, ...], value: float) -> List[str]:
+        return [f"{self.name}{self._labels(key)} {value:g}"]
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket latency histogram."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def _samples(self, key: Tuple[str, ...], value: list) -> List[str]:
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip((*self.buckets, float("inf")), counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else f"{bound:g}"
+            lines.append(f"{self.name}_bucket{self._labels(key, ('le', le))} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {total:.6f}")
+        lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    """The metrics served on ``/metrics``."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        metric = Gauge(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self._metrics for line in metric.render()) + "\n"
+
+
+registry = Registry()
+
+http_seconds = registry.histogram(
+    "pr_toolbox_http_request_duration_seconds", "Time to serve HTTP requests.", ("method", "route", "status")
+)
+stage_seconds = registry.histogram(
+    "pr_toolbox_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",)
+)
+upstream_seconds = registry.histogram(
+    "pr_toolbox_upstream_request_duration_seconds", "Upstream HTTP calls by service, endpoint and status.",
+    ("service", "endpoint", "status"),
+)
+fallbacks = registry.counter(
+    "pr_toolbox_fallbacks", "Results served from mock or error fallbacks instead of upstream data.",
+    ("service", "reason"),
+)
+llm_retries = registry.counter(
+    "pr_toolbox_llm_retries", "LLM calls retried after a 429, 5xx or connection error.", ("tool", "reason")
+)
+llm_hedges = registry.counter(
+    "pr_toolbox_llm_hedges", "Hedged second LLM requests by which copy answered first.", ("tool", "winner")
+)
+llm_circuit_state = registry.gauge(
+    "pr_toolbox_llm_circuit_state", "LLM circuit breaker state (0 closed, 1 half-open, 2 open)."
+)
+llm_circuit_rejections = registry.counter(
+    "pr_toolbox_llm_circuit_rejections", "LLM calls failed fast while the circuit was open.", ("tool",)
+)
+llm_routes = registry.counter(
+    "pr_toolbox_llm_routes", "LLM requests by tool and the model route chosen for them.", ("tool", "route")
+)
+github_quota_remaining = registry.gauge(
+    "pr_toolbox_github_quota_remaining", "GitHub rate-limit calls left per pooled token and resource.",
+    ("token", "resource"),
+)
+github_quota_limit = registry.gauge(
+    "pr_toolbox_github_quota_limit", "GitHub rate-limit size per pooled token and resource.", ("token", "resource")
+)
+trivial_prs = registry.counter(
+    "pr_toolbox_trivial_prs", "Results served by the trivial-PR fast path instead of the LLM.", ("tool", "category")
+)
+
+# (name, seconds) entries for the Server-Timing header of the current request
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("server_timings", default=None)
+
+
+def _record(name: str, seconds: float) -> None:
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a pipeline stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stage_seconds.observe(elapsed, stage=name)
+        _record(name, elapsed)
+
+
+class UpstreamCall:
+    """Outcome of an upstream call; set ``status`` once the response arrives."""
+    status: object = "error"
+
+
+@contextmanager
+def upstream(service: str, endpoint: str) -> Iterator[UpstreamCall]:
+    """Time an upstream HTTP call; calls that raise before a response count as "error"."""
+    call = UpstreamCall()
+    start = time.perf_counter()
+    try:
+        yield call
+    finally:
+        elapsed = time.perf_counter() - start
+        upstream_seconds.observe(elapsed, service=service, endpoint=endpoint, status=call.status)
+        _record(f"{service}.{_short_endpoint(endpoint)}", elapsed)
+
+
+_PLACEHOLDER = re.compile(r"\{[^}]*\}")
+
+
+def _short_endpoint(endpoint: str) -> str:
+    """Last literal path segment of an endpoint label ("/repos/{owner}/{repo}/pulls/{n}/files" -> "files")."""
+    segments = [_PLACEHOLDER.sub("", part).strip(".") for part in endpoint.split("/")]
+    return next((segment for segment in reversed(segments) if segment), endpoint)
+
+
+def record_fallback(service: str, reason: str) -> None:
+    """Count a mock or error fallback."""
+    fallbacks.inc(service=service, reason=reason)
+
+
+def github_endpoint(url: str) -> str:
+    """Low-cardinality endpoint label for a GitHub API URL (owner, repo and numbers templated)."""
+    parts = url.split("?", 1)[0].strip("/").split("/")
+    if parts[0] == "repos" and len(parts) >= 3:
+        parts[1:3] = ["{owner}", "{repo}"]
+    return "/" + "/".join("{n}" if part.isdigit() else part for part in parts)
+
+
+_TIMING_NAME = re.compile(r"[^A-Za-z0-9_.-]")
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: float) -> str:
+    """Format timings as a ``Server-Timing`` value, summing repeated names."""
+    merged: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        entry = merged.setdefault(_TIMING_NAME.sub("_", name), [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+    parts = [
+        f'{name};desc="{count} calls";dur={seconds * 1000:.1f}' if count > 1 else f"{name};dur={seconds * 1000:.1f}"
+        for name, (seconds, count) in merged.items()
+    ]
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    """ASGI middleware that times each request and adds its ``Server-Timing`` header."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: List[Tuple[str, float]] = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing_header(timings, time.perf_counter() - start))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            # Route templates keep the label set small (no stream or job IDs)
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_seconds.observe(time.perf_counter() - start, method=scope["method"], route=route, status=status)
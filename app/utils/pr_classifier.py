@@ -1,79 +1,230 @@
 """
 Utility functions for classifying PR types and priorities.
+
+The rule tables are compiled once: each rule's keywords are grouped by a
+shared stem (the shortest keyword that prefixes the others, e.g. "fix" for
+"fixes") with one whole-word regex per group. Classifying is not a single
+pass: rules are checked in order and each keyword group searches the text on
+its own until a field finds its first matching rule, like the original
+if/elif chains. A group costs one C-level substring search for its stem, and
+the regex only runs from where the stem occurs. Results are memoized per PR
+version. Rules
+can be replaced with a JSON file named by ``PR_CLASSIFIER_RULES`` (same shape
+as ``DEFAULT_RULES``); an invalid file is ignored.
 """
-from typing import Dict, List
+import json
+import logging
+import os
+import re
+import string
+from typing import Dict, Iterable, List, Pattern, Sequence, Tuple
+
+from app.models.github_snapshot import Account, Label, PRSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Rules are checked in order; the first label rule that matches wins, then the
+# first keyword rule. Keywords are single words (hyphens allowed) matched as
+# whole words ("add" does not match "address"), so inflections are listed.
+DEFAULT_RULES: Dict = {
+    "pr_type": {
+        "labels": [
+            ["feature", ["feature", "enhancement", "new-feature"]],
+            ["bugfix", ["bug", "bugfix", "fix"]],
+            ["docs", ["docs", "documentation"]],
+            ["refactor", ["refactor", "refactoring"]],
+        ],
+        "keywords": [
+            ["bugfix", ["fix", "fixes", "fixed", "fixing", "bug", "bugs", "bugfix", "issue", "issues", "problem", "problems"]],
+            ["feature", ["feature", "features", "add", "adds", "added", "adding", "new", "implement", "implements", "implemented"]],
+            ["docs", ["doc", "docs", "documentation", "readme", "comment", "comments"]],
+            ["refactor", ["refactor", "refactors", "refactored", "refactoring", "clean", "cleanup", "improve", "improves", "improved"]],
+        ],
+        "default": "feature",
+    },
+    "priority": {
+        "labels": [
+            ["urgent", ["urgent", "critical", "hotfix"]],
+            ["high", ["high", "high-priority"]],
+            ["low", ["low", "low-priority"]],
+        ],
+        "keywords": [
+            ["urgent", ["urgent", "critical", "hotfix", "emergency"]],
+            ["high", ["high", "important", "blocking", "blocker"]],
+            ["low", ["low", "minor", "nice-to-have"]],
+        ],
+        "default": "medium",
+    },
+}
+
+
+# Whitespace and punctuation end words, except the hyphens and underscores inside them
+_PUNCTUATION = "".join(sorted(set(string.punctuation) - {"-", "_"}))
+_WORD_CHAR = rf"[^\s{re.escape(_PUNCTUATION)}]"
+
+# Classifications memoized per PR version; reset when it reaches the cap
+MEMO_MAX_ENTRIES = 8192
+
+
+def _is_boundary(char: str) -> bool:
+    return char in _PUNCTUATION or char.isspace()
+
+
+def _keyword_groups(words: Iterable[str]) -> List[Tuple[str, Pattern]]:
+    """``(stem, whole-word regex)`` for keywords sharing a stem; none can occur where the stem does not."""
+    groups: Dict[str, List[str]] = {}
+    for word in sorted(set(words), key=len):
+        stem = next((other for other in groups if word.startswith(other)), word)
+        groups.setdefault(stem, []).append(re.escape(word))
+    return [
+        (stem, re.compile(rf"(?<!{_WORD_CHAR})(?:{'|'.join(reversed(alternatives))})(?!{_WORD_CHAR})"))
+        for stem, alternatives in groups.items()
+    ]
+
+
+def _check_rules(rules: Dict) -> None:
+    """Raise ``ValueError`` unless ``rules`` has the shape of ``DEFAULT_RULES``."""
+    if not isinstance(rules, dict) or not rules:
+        raise ValueError("rules must be a non-empty object of fields")
+    for field, table in rules.items():
+        if not isinstance(table, dict) or not isinstance(table.get("default"), str):
+            raise ValueError(f"{field}: needs a string default")
+        for kind in ("labels", "keywords"):
+            entries = table.get(kind)
+            if not isinstance(entries, list):
+                raise ValueError(f"{field}.{kind}: must be a list of [value, [words]]")
+            for entry in entries:
+                if (
+                    not isinstance(entry, list) or len(entry) != 2 or not isinstance(entry[0], str)
+                    or not isinstance(entry[1], list) or not all(isinstance(word, str) and word for word in entry[1])
+                ):
+                    raise ValueError(f"{field}.{kind}: {entry!r} is not [value, [words]]")
+                if kind == "keywords":
+                    for word in entry[1]:
+                        if any(_is_boundary(char) for char in word):
+                            raise ValueError(f"{field}.keywords: {word!r} is not a single word")
+
+
+class PRClassifier:
+    """Classifies PRs by type and priority with rule tables compiled once."""
 
+    def __init__(self, rules: Dict = DEFAULT_RULES):
+        _check_rules(rules)
+        self.fields = list(rules)
+        self._defaults = {field: rules[field]["default"] for field in self.fields}
+        # label name -> [(field, rule index, value)]
+        self._labels: Dict[str, List[Tuple[str, int, str]]] = {}
+        # field -> [(value, keyword groups)] in rule order
+        self._keyword_rules: List[Tuple[str, List[Tuple[str, List[Tuple[str, Pattern]]]]]] = []
+        for field in self.fields:
+            for index, (value, names) in enumerate(rules[field]["labels"]):
+                for name in names:
+                    self._labels.setdefault(name.lower(), []).append((field, index, value))
+            self._keyword_rules.append((field, [
+                (value, _keyword_groups(word.lower() for word in words))
+                for value, words in rules[field]["keywords"]
+            ]))
+        self._memo: Dict[Tuple[str, int, str, str], Dict[str, str]] = {}
 
-def classify_pr_type(labels: List[Dict], title: str, body: str) -> str:
+    def classify(self, labels: Sequence[Label], title: str, body: str) -> Dict[str, str]:
+        """Return ``{field: value}`` for every rule field; the text is scanned only if labels leave a field open."""
+        label_hits = self._best(
+            hit for label in labels for hit in self._labels.get(label.name.lower(), ())
+        )
+        result = {}
+        keyword_hits = None
+        for field in self.fields:
+            if field in label_hits:
+                result[field] = label_hits[field]
+                continue
+            if keyword_hits is None:
+                # Only scan the text when some field is not decided by labels
+                keyword_hits = self._scan(f"{title or ''}\n{body or ''}".lower())
+            result[field] = keyword_hits.get(field, self._defaults[field])
+        return result
+
+    def classify_snapshot(self, pr_data: PRSnapshot) -> Dict[str, str]:
+        """``classify`` a PR version, memoized by (repository, number, updated_at, head SHA)."""
+        if not (pr_data.repository and pr_data.updated_at):
+            return self.classify(pr_data.labels, pr_data.title, pr_data.body)
+        key = (pr_data.repository, pr_data.pr_number, pr_data.updated_at, pr_data.head_sha)
+        result = self._memo.get(key)
+        if result is None:
+            if len(self._memo) >= MEMO_MAX_ENTRIES:
+                self._memo.clear()
+            result = self._memo[key] = self.classify(pr_data.labels, pr_data.title, pr_data.body)
+        return result
+
+    def _scan(self, text: str) -> Dict[str, str]:
+        """First matching keyword rule per field for lowered text."""
+        result = {}
+        for field, rules in self._keyword_rules:
+            for value, groups in rules:
+                for stem, pattern in groups:
+                    start = text.find(stem)
+                    if start != -1 and pattern.search(text, start) is not None:
+                        result[field] = value
+                        break
+                if field in result:
+                    break
+        return result
+
+    @staticmethod
+    def _best(hits: Iterable[Tuple[str, int, str]]) -> Dict[str, str]:
+        """Pick the earliest matching rule per field."""
+        best: Dict[str, Tuple[int, str]] = {}
+        for field, index, value in hits:
+            if field not in best or index < best[field][0]:
+                best[field] = (index, value)
+        return {field: value for field, (_, value) in best.items()}
+
+
+def _load_rules() -> Dict:
+    """Rules from ``PR_CLASSIFIER_RULES`` if set, else the defaults."""
+    path = os.getenv("PR_CLASSIFIER_RULES")
+    if not path:
+        return DEFAULT_RULES
+    try:
+        with open(path, encoding="utf-8") as f:
+            rules = json.load(f)
+        # Validate before replacing the defaults
+        _check_rules(rules)
+        return rules
+    except (OSError, ValueError) as e:
+        logger.warning("Error loading classifier rules from %s: %s", path, e)
+        return DEFAULT_RULES
+
+
+classifier = PRClassifier(_load_rules())
+
+
+def classify_pr_type(labels: Sequence[Label], title: str, body: str) -> str:
     """Classify PR type based on labels and content."""
-    label_names = [label.get("name", "").lower() for label in labels]
-    content = f"{title} {body}".lower()
-    
-    # Check for specific label types
-    if any(label in ["feature", "enhancement", "new-feature"] for label in label_names):
-        return "feature"
-    elif any(label in ["bug", "bugfix", "fix"] for label in label_names):
-        return "bugfix"
-    elif any(label in ["docs", "documentation"] for label in label_names):
-        return "docs"
-    elif any(label in ["refactor", "refactoring"] for label in label_names):
-        return "refactor"
-    
-    # Check content for type indicators
-    if any(word in content for word in ["fix", "bug", "issue", "problem"]):
-        return "bugfix"
-    elif any(word in content for word in ["feature", "add", "new", "implement"]):
-        return "feature"
-    elif any(word in content for word in ["doc", "readme", "comment"]):
-        return "docs"
-    elif any(word in content for word in ["refactor", "clean", "improve"]):
-        return "refactor"
-    
-    # Default to feature
-    return "feature"
-
-
-def classify_priority(labels: List[Dict], title: str, body: str) -> str:
+    return classifier.classify(labels, title, body)["pr_type"]
+
+
+def classify_priority(labels: Sequence[Label], title: str, body: str) -> str:
     """Classify PR priority based on labels and content."""
-    label_names = [label.get("name", "").lower() for label in labels]
-    content = f"{title} {body}".lower()
-    
-    # Check for priority labels
-    if any(label in ["urgent", "critical", "hotfix"] for label in label_names):
-        return "urgent"
-    elif any(label in ["high", "high-priority"] for label in label_names):
-        return "high"
-    elif any(label in ["low", "low-priority"] for label in label_names):
-        return "low"
-    
-    # Check content for priority indicators
-    if any(word in content for word in ["urgent", "critical", "hotfix", "emergency"]):
-        return "urgent"
-    elif any(word in content for word in ["high", "important", "blocking"]):
-        return "high"
-    elif any(word in content for word in ["low", "minor", "nice-to-have"]):
-        return "low"
-    
-    # Default to medium priority
-    return "medium"
-
-
-def get_assignee(assignees: List[Dict]) -> str:
+    return classifier.classify(labels, title, body)["priority"]
+
+
+def get_assignee(assignees: Sequence[Account]) -> str:
     """Extract assignee from assignees list."""
     if assignees and len(assignees) > 0:
-        return assignees[0].get("login", "")
+        return assignees[0].login
     return ""
 
 
-def analyze_pr_data(pr_data: Dict) -> Dict:
+def analyze_pr_data(pr_data: PRSnapshot) -> Dict:
     """Analyze PR data and return metadata."""
-    labels = pr_data.get("labels", [])
-    title = pr_data.get("title", "")
-    body = pr_data.get("body", "")
-    assignees = pr_data.get("assignees", [])
-    
+    metadata = classifier.classify_snapshot(pr_data)
     return {
-        "pr_type": classify_pr_type(labels, title, body),
-        "priority": classify_priority(labels, title, body),
-        "assignee": get_assignee(assignees)
-    } 
\ No newline at end of file
+        "pr_type": metadata["pr_type"],
+        "priority": metadata["priority"],
+        "assignee": get_assignee(pr_data.assignees)
+    }
+
+
+def classify_prs(prs: Iterable[PRSnapshot]) -> List[Dict]:
+    """Analyze many PRs with the shared compiled classifier."""
+    return [analyze_pr_data(pr_data) for pr_data in prs]
@@ -0,0 +1,212 @@
+"""
+Token budgeting for LLM prompts, and token usage accounting.
+
+PR content pasted into prompts (body, contributors, labels, ...) is fitted to
+a token budget: sections are trimmed lowest priority first, long code/log
+blocks in the body are collapsed, and lists keep their first entries. Token
+counts use ``tiktoken`` when it is installed and a character heuristic
+otherwise.
+"""
+import importlib.util
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Optional dependency, imported on first use (or by the startup warm-up) since it is slow to import
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+
+# Tokens available to PR-provided content in a prompt (the fixed instructions are extra)
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "2500"))
+
+# Fenced blocks longer than this many lines keep only their head and tail
+CODE_BLOCK_MAX_LINES = 20
+
+_encoding = None
+_CODE_BLOCK = re.compile(r"```[^\n]*\n(.*?)```", re.DOTALL)
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally, exactly with tiktoken or estimated (~4 chars per token)."""
+    global _encoding
+    if not text:
+        return 0
+    if TIKTOKEN_AVAILABLE:
+        if _encoding is None:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class Section:
+    """A piece of PR content in a prompt.
+
+    ``priority``: lower numbers are kept longer. ``kind``: "text" is trimmed
+    to its head and tail, "lines" keeps its first lines.
+    """
+    name: str
+    text: str
+    priority: int
+    kind: str = "text"
+
+
+def collapse_code_blocks(text: str, max_lines: int = CODE_BLOCK_MAX_LINES) -> str:
+    """Shorten long fenced blocks (pasted logs, stack traces) to their head and tail."""
+    def collapse(match: re.Match) -> str:
+        lines = match.group(1).splitlines()
+        if len(lines) <= max_lines:
+            return match.group(0)
+        head, tail = lines[: max_lines // 2], lines[-(max_lines // 4):]
+        omitted = len(lines) - len(head) - len(tail)
+        fence = match.group(0).split("\n", 1)[0]
+        return "\n".join([fence, *head, f"[... {omitted} lines omitted ...]", *tail, "```"])
+    return _CODE_BLOCK.sub(collapse, text)
+
+
+def trim_text(text: str, max_tokens: int) -> str:
+    """Keep the head and tail of ``text`` within roughly ``max_tokens``."""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    if max_tokens <= 0:
+        return "[... omitted ...]"
+    # Scale characters by the observed ratio so this works for both counters,
+    # then shrink until the result, omission marker included, fits
+    keep = int(len(text) * max_tokens / tokens)
+    while True:
+        head, tail = text[: keep * 3 // 4], text[len(text) - keep // 4:] if keep >= 4 else ""
+        trimmed = f"{head}\n[... {tokens - max_tokens} tokens omitted ...]\n{tail}".rstrip()
+        used = count_tokens(trimmed)
+        if used <= max_tokens or keep == 0:
+            return trimmed
+        keep = min(keep - 1, int(keep * max_tokens / used))
+
+
+def trim_lines(text: str, max_tokens: int) -> str:
+    """Keep the first lines of ``text`` within ``max_tokens`` and count the rest."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    lines = text.splitlines()
+    # Leave room for the "... and N more" line
+    budget = max_tokens - count_tokens(f"... and {len(lines)} more") - 1
+    kept: List[str] = []
+    used = 0
+    for line in lines:
+        line_tokens = count_tokens(line) + 1
+        if used + line_tokens > budget and kept:
+            break
+        kept.append(line)
+        used += line_tokens
+    if len(kept) < len(lines):
+        kept.append(f"... and {len(lines) - len(kept)} more")
+    return "\n".join(kept)
+
+
+def fit_sections(tool: str, sections: List[Section], budget: Optional[int] = None) -> Dict[str, str]:
+    """Trim sections, lowest priority first, until together they fit ``budget`` tokens."""
+    budget = PROMPT_MAX_TOKENS if budget is None else budget
+    texts = {section.name: section.text for section in sections}
+    sizes = {name: count_tokens(text) for name, text in texts.items()}
+    original = dict(sizes)
+
+    if sum(sizes.values()) > budget:
+        # Collapsing pasted logs usually recovers most of the excess on its own
+        for section in sections:
+            if section.kind == "text":
+                texts[section.name] = collapse_code_blocks(texts[section.name])
+                sizes[section.name] = count_tokens(texts[section.name])
+
+    for section in sorted(sections, key=lambda s: s.priority, reverse=True):
+        excess = sum(sizes.values()) - budget
+        if excess <= 0:
+            break
+        target = max(0, sizes[section.name] - excess)
+        text = texts[section.name]
+        text = trim_lines(text, target) if section.kind == "lines" else trim_text(text, target)
+        texts[section.name] = text
+        sizes[section.name] = count_tokens(text)
+
+    token_usage.record_prompt(tool, original, sizes)
+    return texts
+
+
+class TokenUsage:
+    """Thread-safe per-tool counters of prompt sections and completion usage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tools: Dict[str, Dict] = {}
+
+    def _tool(self, tool: str) -> Dict:
+        stats = self._tools.get(tool)
+        if stats is None:
+            stats = self._tools[tool] = {
+                "prompts": 0,
+                "trimmed_prompts": 0,
+                "sections": {},
+                "requests": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "max_prompt_tokens": 0,
+            }
+        return stats
+
+    def record_prompt(self, tool: str, original: Dict[str, int], fitted: Dict[str, int]) -> None:
+        """Record section sizes before and after fitting a prompt."""
+        with self._lock:
+            stats = self._tool(tool)
+            stats["prompts"] += 1
+            if fitted != original:
+                stats["trimmed_prompts"] += 1
+            for name, tokens in original.items():
+                section = stats["sections"].setdefault(name, {"tokens": 0, "trimmed_tokens": 0})
+                section["tokens"] += fitted[name]
+                section["trimmed_tokens"] += tokens - fitted[name]
+
+    def record_completion(self, tool: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Record the token usage of one upstream completion."""
+        logger.info("LLM %s call: %d prompt tokens, %d completion tokens", tool, prompt_tokens, completion_tokens)
+        with self._lock:
+            stats = self._tool(tool)
+            stats["requests"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["max_prompt_tokens"] = max(stats["max_prompt_tokens"], prompt_tokens)
+
+    def record_response(self, tool: str, data: Dict, result: Dict, content: str) -> None:
+        """Record usage from a completion response, counting locally if it has none."""
+        usage = result.get("usage") or {}
+        self.record_completion(
+            tool,
+            usage.get("prompt_tokens") or count_messages(data),
+            usage.get("completion_tokens") or count_tokens(content),
+        )
+
+    def stats(self) -> Dict:
+        """Return per-tool counters, with averages per upstream request."""
+        with self._lock:
+            result = {}
+            for tool, stats in self._tools.items():
+                requests = stats["requests"] or 1
+                result[tool] = {
+                    **stats,
+                    "sections": {name: dict(section) for name, section in stats["sections"].items()},
+                    "avg_prompt_tokens": round(stats["prompt_tokens"] / requests, 1),
+                    "avg_completion_tokens": round(stats["completion_tokens"] / requests, 1),
+                }
+            return {"counter": "tiktoken" if TIKTOKEN_AVAILABLE else "estimate", "tools": result}
+
+
+def count_messages(data: Dict) -> int:
+    """Count the prompt tokens of a chat completion request."""
+    # Each message carries a few tokens of role/formatting overhead
+    return sum(count_tokens(message.get("content", "")) + 4 for message in data.get("messages", []))
+
+
+token_usage = TokenUsage()
@@ -0,0 +1,92 @@
+"""
+Bounded LRU cache for HTTP responses with conditional-request validators.
+"""
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+@dataclass
+class CachedResponse:
+    """A cached response body together with its validators."""
+    body: Any
+    etag: Optional[str]
+    last_modified: Optional[str]
+    stored_at: float
+
+
+class ResponseCache:
+    """LRU cache of decoded response bodies keyed by URL.
+
+    Entries younger than ``ttl`` seconds are served without touching the
+    network. Older entries are kept around so their ``ETag``/``Last-Modified``
+    can be sent as a conditional request; a ``304`` refreshes them.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the entry for ``key`` (fresh or stale) and mark it recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        """Whether the entry can be served without revalidation."""
+        return time.monotonic() - entry.stored_at < self.ttl
+
+    def conditional_headers(self, entry: Optional[CachedResponse]) -> Dict[str, str]:
+        """Build ``If-None-Match``/``If-Modified-Since`` headers for an entry."""
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def store(self, key: str, body: Any, etag: Optional[str], last_modified: Optional[str]) -> None:
+        """Store a fresh response body, evicting the least recently used entries."""
+        self._entries[key] = CachedResponse(body, etag, last_modified, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def refresh(self, key: str) -> Optional[CachedResponse]:
+        """Restart the TTL of an entry after a ``304 Not Modified``."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry.stored_at = time.monotonic()
+        return entry
+
+    def discard(self, key: str) -> int:
+        """Drop the entry for exactly ``key``, if any."""
+        return 1 if self._entries.pop(key, None) is not None else 0
+
+    def invalidate(self, prefix: str) -> int:
+        """Drop every entry whose key starts with ``prefix``."""
+        keys = [key for key in self._entries if key.startswith(prefix)]
+        for key in keys:
+            del self._entries[key]
+        return len(keys)
+
+    def stats(self) -> Dict[str, int]:
+        """Return cache counters."""
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
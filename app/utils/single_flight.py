@@ -0,0 +1,55 @@
+"""
+Coalescing of identical concurrent async calls ("single flight").
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The call runs in its own task, so a caller that gives up (e.g. a client
+    disconnect cancelling its request) does not cancel the work for the others.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self._streams: Dict[Hashable, Any] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Return ``await func(*args)``, joining an in-flight call with the same key."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(func(*args))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    async def stream(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args: Any) -> Any:
+        """Return the open stream for ``key``, or start one with ``await func(*args)``.
+
+        Unlike ``do``, the key stays taken until the stream is ``closed``, so
+        callers arriving mid-stream join it too. The stream must replay its
+        items to each reader (e.g. ``JobStream``).
+        """
+        stream = self._streams.get(key)
+        if stream is not None and not stream.closed:
+            self.shared += 1
+            return stream
+        for other, open_stream in list(self._streams.items()):
+            if open_stream.closed:
+                del self._streams[other]
+        # Concurrent first callers still start only one stream
+        stream = await self.do(key, func, *args)
+        self._streams[key] = stream
+        return stream
+
+    def stats(self) -> Dict[str, int]:
+        """Return how many calls ran and how many were served by an in-flight one."""
+        streaming = sum(not stream.closed for stream in self._streams.values())
+        return {"in_flight": len(self._inflight), "streaming": streaming, "calls": self.calls, "shared": self.shared}
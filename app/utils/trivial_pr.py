@@ -0,0 +1,246 @@
+"""
+Local fast path for trivial PRs: docs-only changes, dependency bumps and tiny diffs.
+
+The changed-file list of the snapshot (paths, statuses, per-file line
+counts) is checked against simple rules. A match gets a templated
+description in microseconds instead of an LLM round trip. Docs-only and
+dependency PRs also get a templated review and score (skipping the diff
+download); tiny diffs can change behaviour, so their review still goes to
+the LLM. Rules can be replaced with a JSON file named by
+``TRIVIAL_PR_RULES`` (same shape as ``DEFAULT_RULES``); its ``repos``
+entries override the rules for single repositories, e.g.
+``{"repos": {"acme/infra": {"enabled": false}}}``.
+"""
+import json
+import logging
+import os
+import posixpath
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.models.github_snapshot import PRSnapshot
+from app.utils.metrics import trivial_prs
+from app.utils.pr_classifier import analyze_pr_data
+
+logger = logging.getLogger(__name__)
+
+TRIVIAL_PR_ENABLED = os.getenv("TRIVIAL_PR", "true").lower() == "true"
+
+# Categories are checked in the order of "categories"; the first that matches wins.
+DEFAULT_RULES: Dict = {
+    "enabled": True,
+    "categories": ["docs", "dependencies", "tiny"],
+    # Categories whose review (and score) is local too; the others only get a local description
+    "review_categories": ["docs", "dependencies"],
+    # docs: every file is documentation, by extension, exact name (bare or .txt) or directory
+    "docs_extensions": [".md", ".markdown", ".rst", ".adoc"],
+    "docs_files": ["README", "LICENSE", "AUTHORS", "CHANGELOG", "CONTRIBUTING", "NOTICE", "COPYING"],
+    "docs_dirs": ["docs/", "doc/"],
+    # Never documentation, whatever the name or directory (as are lockfiles and manifests)
+    "code_extensions": [
+        ".py", ".pyi", ".js", ".jsx", ".mjs", ".cjs", ".ts", ".tsx", ".go", ".rs", ".java", ".kt", ".kts",
+        ".scala", ".rb", ".php", ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".swift", ".m", ".sh", ".bash",
+        ".ps1", ".sql", ".lua", ".pl", ".r", ".ex", ".exs", ".erl", ".dart", ".vue", ".svelte",
+    ],
+    "docs_max_lines": 1000,
+    # dependencies: only lockfiles, plus small edits to dependency manifests
+    "lockfiles": [
+        "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock", "uv.lock", "Pipfile.lock",
+        "Cargo.lock", "go.sum", "Gemfile.lock", "composer.lock",
+    ],
+    "manifests": [
+        "package.json", "pyproject.toml", "requirements.txt", "Pipfile", "Cargo.toml", "go.mod",
+        "Gemfile", "composer.json",
+    ],
+    "manifest_max_lines": 10,
+    # tiny: a few lines in a few files
+    "tiny_max_lines": 10,
+    "tiny_max_files": 2,
+    # PRs classified with these priorities always get a full review
+    "skip_priorities": ["high", "urgent"],
+    "repos": {},
+}
+
+# Review scores and template hints by category
+SCORES = {"docs": 9, "dependencies": 8, "tiny": 8}
+
+_TEST_HINTS = {
+    "docs": "- Render the changed documents and check links and formatting",
+    "dependencies": "- Install from the updated lockfile and run the test suite",
+    "tiny": "- Run the tests covering the changed lines",
+}
+
+_REVIEW_HINTS = {
+    "docs": "- Proofread the changed text and check that links still resolve",
+    "dependencies": "- Check the changelogs of the updated packages for breaking changes\n- Make sure CI installed from the new lockfile",
+    "tiny": "- Confirm the change is intended and covered by a test",
+}
+
+
+@dataclass(frozen=True)
+class TrivialPR:
+    """Why a PR is trivial."""
+    category: str
+    reason: str
+
+
+def _is_doc(rules: Dict, path: str) -> bool:
+    """Whether a changed file is documentation."""
+    name = posixpath.basename(path)
+    stem, extension = posixpath.splitext(name)
+    extension = extension.lower()
+    if name in rules["lockfiles"] or name in rules["manifests"] or extension in rules["code_extensions"]:
+        return False
+    return (
+        extension in rules["docs_extensions"]
+        or (stem in rules["docs_files"] and extension in ("", ".txt"))
+        or any(path.startswith(prefix) for prefix in rules["docs_dirs"])
+    )
+
+
+def _docs(rules: Dict, files: Tuple, lines: int) -> Optional[TrivialPR]:
+    """Every file is documentation."""
+    if lines > rules["docs_max_lines"]:
+        return None
+    if not all(_is_doc(rules, f.path) for f in files):
+        return None
+    return TrivialPR("docs", f"Documentation only: {len(files)} file{'s' if len(files) != 1 else ''}, {lines} lines")
+
+
+def _dependencies(rules: Dict, files: Tuple, lines: int) -> Optional[TrivialPR]:
+    """Lockfiles, and manifests with only a few changed lines."""
+    lockfiles = 0
+    for f in files:
+        name = posixpath.basename(f.path)
+        if name in rules["lockfiles"]:
+            lockfiles += 1
+        elif name not in rules["manifests"] or f.additions + f.deletions > rules["manifest_max_lines"]:
+            return None
+    if not lockfiles:
+        return None
+    return TrivialPR("dependencies", f"Dependency update: {', '.join(f.path for f in files)}")
+
+
+def _tiny(rules: Dict, files: Tuple, lines: int) -> Optional[TrivialPR]:
+    """A few lines in a few files."""
+    if lines > rules["tiny_max_lines"] or len(files) > rules["tiny_max_files"]:
+        return None
+    return TrivialPR("tiny", f"Small change: {lines} line{'s' if lines != 1 else ''} in {len(files)} file{'s' if len(files) != 1 else ''}")
+
+
+_CHECKS = {"docs": _docs, "dependencies": _dependencies, "tiny": _tiny}
+
+
+class TrivialPRDetector:
+    """Applies the trivial-PR rules, with per-repository overrides, and counts matches."""
+
+    def __init__(self, rules: Dict = DEFAULT_RULES):
+        self.rules = {**DEFAULT_RULES, **rules}
+        self._repo_rules = {
+            repo.lower(): {**self.rules, **overrides} for repo, overrides in self.rules.get("repos", {}).items()
+        }
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = {}
+
+    def detect(self, pr_data: PRSnapshot, tool: str = "description") -> Optional[TrivialPR]:
+        """Return the trivial category of a PR, or None if ``tool`` needs the LLM for it.
+
+        Reviews are only served locally for the ``review_categories``.
+        """
+        if not TRIVIAL_PR_ENABLED:
+            return None
+        rules = self._repo_rules.get(pr_data.repository.lower(), self.rules)
+        files = pr_data.files
+        # Only decide on a complete file list
+        if not rules["enabled"] or not files or len(files) != pr_data.changed_files:
+            return None
+        if analyze_pr_data(pr_data)["priority"] in rules["skip_priorities"]:
+            return None
+
+        lines = sum(f.additions + f.deletions for f in files)
+        for category in rules["categories"]:
+            if tool == "review" and category not in rules["review_categories"]:
+                continue
+            check = _CHECKS.get(category)
+            match = check(rules, files, lines) if check is not None else None
+            if match is not None:
+                return match
+        return None
+
+    def record(self, tool: str, match: TrivialPR) -> None:
+        """Count a result served by the fast path."""
+        with self._lock:
+            tool_counts = self._counts.setdefault(tool, {})
+            tool_counts[match.category] = tool_counts.get(match.category, 0) + 1
+        trivial_prs.inc(tool=tool, category=match.category)
+
+    def stats(self) -> Dict:
+        """Return how often each category was served per tool."""
+        with self._lock:
+            return {
+                "enabled": TRIVIAL_PR_ENABLED,
+                "served": {tool: dict(counts) for tool, counts in self._counts.items()},
+            }
+
+
+def _file_lines(pr_data: PRSnapshot) -> str:
+    return "\n".join(f"- `{f.path}` ({f.status}, +{f.additions}/-{f.deletions})" for f in pr_data.files)
+
+
+def _contributor_lines(pr_data: PRSnapshot) -> str:
+    if not pr_data.contributors:
+        return "- No contributors found"
+    return "\n".join(
+        f"- @{c.login} ({c.name}) - {c.contributions} commit{'s' if c.contributions != 1 else ''}"
+        for c in pr_data.contributors
+    )
+
+
+def trivial_description(pr_data: PRSnapshot, match: TrivialPR) -> str:
+    """Templated PR description for a trivial PR."""
+    return f"""## Summary
+{pr_data.title}
+
+{match.reason}.
+
+## Changes Made
+{_file_lines(pr_data)}
+
+## Motivation/Context
+{(pr_data.body or "").strip() or "No description was provided."}
+
+## How to Test
+{_TEST_HINTS[match.category]}
+
+## Contributors
+{_contributor_lines(pr_data)}"""
+
+
+def trivial_review(pr_data: PRSnapshot, match: TrivialPR) -> Tuple[str, int]:
+    """Templated review and score for a trivial PR."""
+    review = f"""## Overall Assessment
+{match.reason}. This PR was reviewed with local checks only.
+
+## Files
+{_file_lines(pr_data)}
+
+## Recommendations
+{_REVIEW_HINTS[match.category]}"""
+    return review, SCORES[match.category]
+
+
+def _load_rules() -> Dict:
+    """Rules from ``TRIVIAL_PR_RULES`` if set, else the defaults."""
+    path = os.getenv("TRIVIAL_PR_RULES")
+    if not path:
+        return DEFAULT_RULES
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Error loading trivial PR rules from %s: %s", path, e)
+        return DEFAULT_RULES
+
+
+trivial_pr_detector = TrivialPRDetector(_load_rules())
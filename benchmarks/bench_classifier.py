@@ -0,0 +1,124 @@
+"""
+Microbenchmark: compiled PR classifier vs the previous substring-scan functions.
+
+"cold" classifies PR versions the classifier has not seen; "warm" repeats the
+batch, as a dashboard refresh or re-sync does, and is served from the memo.
+
+Run from the repository root:
+
+    uv run python benchmarks/bench_classifier.py [--prs 5000] [--body-words 400]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.github_snapshot import Account, Label, PRSnapshot  # noqa: E402
+from app.utils.pr_classifier import classifier, classify_prs  # noqa: E402
+
+WORDS = (
+    "the this that update module handler request response address additional refresh "
+    "documentation tests config cache parser value minor fix feature important render "
+    "client server latency memory thread queue token budget stream chunk review label"
+).split()
+
+
+def legacy_classify_pr_type(labels: List[Label], title: str, body: str) -> str:
+    """The original implementation, kept here for comparison."""
+    label_names = [label.name.lower() for label in labels]
+    content = f"{title} {body}".lower()
+    if any(label in ["feature", "enhancement", "new-feature"] for label in label_names):
+        return "feature"
+    elif any(label in ["bug", "bugfix", "fix"] for label in label_names):
+        return "bugfix"
+    elif any(label in ["docs", "documentation"] for label in label_names):
+        return "docs"
+    elif any(label in ["refactor", "refactoring"] for label in label_names):
+        return "refactor"
+    if any(word in content for word in ["fix", "bug", "issue", "problem"]):
+        return "bugfix"
+    elif any(word in content for word in ["feature", "add", "new", "implement"]):
+        return "feature"
+    elif any(word in content for word in ["doc", "readme", "comment"]):
+        return "docs"
+    elif any(word in content for word in ["refactor", "clean", "improve"]):
+        return "refactor"
+    return "feature"
+
+
+def legacy_classify_priority(labels: List[Label], title: str, body: str) -> str:
+    """The original implementation, kept here for comparison."""
+    label_names = [label.name.lower() for label in labels]
+    content = f"{title} {body}".lower()
+    if any(label in ["urgent", "critical", "hotfix"] for label in label_names):
+        return "urgent"
+    elif any(label in ["high", "high-priority"] for label in label_names):
+        return "high"
+    elif any(label in ["low", "low-priority"] for label in label_names):
+        return "low"
+    if any(word in content for word in ["urgent", "critical", "hotfix", "emergency"]):
+        return "urgent"
+    elif any(word in content for word in ["high", "important", "blocking"]):
+        return "high"
+    elif any(word in content for word in ["low", "minor", "nice-to-have"]):
+        return "low"
+    return "medium"
+
+
+def make_prs(count: int, body_words: int, seed: int = 42) -> List[PRSnapshot]:
+    rng = random.Random(seed)
+    prs = []
+    for i in range(count):
+        prs.append(PRSnapshot(
+            repository="acme/app",
+            pr_number=i,
+            updated_at="2024-01-01T00:00:00Z",
+            title=" ".join(rng.choices(WORDS, k=6)).capitalize(),
+            body=" ".join(rng.choices(WORDS, k=body_words)),
+            labels=(Label(rng.choice(["", "docs", "bug", "low"])),) if i % 3 == 0 else (),
+            assignees=(Account(f"user{i % 17}"),),
+        ))
+    return prs
+
+
+def best_of(runs: int, func, setup=None) -> float:
+    timings = []
+    for _ in range(runs):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prs", type=int, default=5000)
+    parser.add_argument("--body-words", type=int, default=400)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    prs = make_prs(args.prs, args.body_words)
+
+    def legacy() -> None:
+        for pr in prs:
+            legacy_classify_pr_type(pr.labels, pr.title, pr.body)
+            legacy_classify_priority(pr.labels, pr.title, pr.body)
+
+    legacy_time = best_of(args.runs, legacy)
+    cold_time = best_of(args.runs, lambda: classify_prs(prs), setup=classifier._memo.clear)
+    warm_time = best_of(args.runs, lambda: classify_prs(prs))
+
+    print(f"{args.prs} PRs, {args.body_words} body words, best of {args.runs}")
+    print(f"  legacy substring scans: {legacy_time * 1000:8.1f} ms ({legacy_time / args.prs * 1e6:6.1f} us/PR)")
+    for name, elapsed in (("compiled, cold", cold_time), ("compiled, warm", warm_time)):
+        print(f"  {name + ':':23} {elapsed * 1000:8.1f} ms ({elapsed / args.prs * 1e6:6.1f} us/PR, {legacy_time / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Cold start benchmark: import time of ``main``, time until the app accepts
+connections and until ``/ready``, and the first vs a repeated request.
+
+Imports are timed in fresh interpreters. The app is then started (uvicorn)
+against the local GitHub and OpenAI stand-ins, as in ``load_test.py``, with a
+fresh data directory so the Jinja bytecode cache starts empty; ``--runs 2`` or
+more reuses it for the later runs, as a restart would.
+
+Run from the repository root:
+
+    uv run python benchmarks/bench_startup.py [--imports 5] [--runs 2]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import start_processes  # noqa: E402
+from benchmarks.stub_servers import StubConfig  # noqa: E402
+
+_IMPORT_MAIN = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+
+
+def time_imports(runs: int) -> float:
+    """Median seconds to import ``main`` in a fresh interpreter."""
+    samples = []
+    env = {**os.environ, "LOG_LEVEL": "WARNING", "PR_STORE_PATH": "", "JINJA_CACHE_DIR": ""}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _IMPORT_MAIN], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        samples.append(float(output.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples)
+
+
+async def _poll(client: httpx.AsyncClient, url: str, want_ok: bool, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = await client.get(url)
+            if not want_ok or response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{url} not ready within {timeout:.0f}s")
+        await asyncio.sleep(0.01)
+
+
+async def time_startup(args: argparse.Namespace, data_dir: str) -> Dict:
+    """Start the stubs and the app; time listening, readiness and the first two requests."""
+    args.app_env = [f"JINJA_CACHE_DIR={os.path.join(data_dir, 'jinja_cache')}"]
+    start = time.perf_counter()
+    processes, urls = start_processes(args, StubConfig(llm_latency_ms=args.llm_latency_ms), data_dir)
+    try:
+        async with httpx.AsyncClient(timeout=60.0) as client:
+            await _poll(client, f"{urls['app']}/metrics", want_ok=False)
+            listening = time.perf_counter() - start
+            await _poll(client, f"{urls['app']}/ready", want_ok=True)
+            ready = time.perf_counter() - start
+            warmup = (await client.get(f"{urls['app']}/ready")).json()
+
+            requests = []
+            for number in (1, 2):
+                request_start = time.perf_counter()
+                response = await client.post(
+                    f"{urls['app']}/generate-pr-description",
+                    data={"pr_url": f"https://github.com/{args.repo}/pull/{number}"},
+                    headers={"HX-Request": "true"},
+                )
+                response.raise_for_status()
+                requests.append(time.perf_counter() - request_start)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+    return {
+        "listening_s": round(listening, 3),
+        "ready_s": round(ready, 3),
+        "first_request_ms": round(requests[0] * 1000, 1),
+        "second_request_ms": round(requests[1] * 1000, 1),
+        "warmup": warmup,
+    }
+
+
+async def run(args: argparse.Namespace) -> None:
+    print(f"import main: {time_imports(args.imports) * 1000:.1f} ms (median of {args.imports})")
+    with tempfile.TemporaryDirectory() as data_dir:
+        for run_number in range(1, args.runs + 1):
+            result = await time_startup(args, data_dir)
+            print(f"run {run_number}: {json.dumps(result)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imports", type=int, default=5, help="fresh interpreters to time the import in")
+    parser.add_argument("--runs", type=int, default=2, help="app starts (later ones reuse the bytecode cache)")
+    parser.add_argument("--repo", default="bench/repo")
+    parser.add_argument("--llm-latency-ms", type=float, default=50.0, help="completion latency of the stand-in")
+    args = parser.parse_args()
+    args.tokens, args.workers = 1, 1
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
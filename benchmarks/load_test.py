@@ -0,0 +1,280 @@
+"""
+Load test: drive the app's endpoints against local GitHub and OpenAI stand-ins.
+
+Starts ``benchmarks/stub_servers.py`` and the app (uvicorn) as subprocesses,
+points the app at the stubs through ``GITHUB_API_URL``/``OPENAI_BASE_URL``,
+sends requests at a fixed concurrency and reports throughput and
+p50/p95/p99 latency per scenario. Save a run with ``--json`` and pass it as
+``--baseline`` later to fail (exit code 1) on regressions.
+
+Run from the repository root:
+
+    uv run python benchmarks/load_test.py --scenarios description,review --concurrency 32 --requests 500
+    uv run python benchmarks/load_test.py --scenarios analysis --prs 1000 --latency-ms 150 --error-rate 0.02
+"""
+import argparse
+import asyncio
+import html
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.stub_servers import StubConfig, add_arguments, config_from_args  # noqa: E402
+
+# name -> (method, path, sends a PR URL, SSE stream path to follow)
+SCENARIOS: Dict[str, Tuple[str, str, bool, Optional[str]]] = {
+    "description": ("POST", "/generate-pr-description", True, None),
+    "review": ("POST", "/generate-pr-review", True, None),
+    "analysis": ("POST", "/generate-pr-analysis", True, None),
+    "description-stream": ("POST", "/generate-pr-description/stream", True, "/generate-pr-description/stream/"),
+    "review-stream": ("POST", "/generate-pr-review/stream", True, "/generate-pr-review/stream/"),
+    "analytics": ("GET", "/analytics", False, None),
+    "dashboard": ("GET", "/", False, None),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+async def wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while True:
+            try:
+                if (await client.get(url)).status_code < 500:
+                    return
+            except httpx.TransportError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{url} did not come up within {timeout:.0f}s")
+            await asyncio.sleep(0.2)
+
+
+def start_processes(args: argparse.Namespace, config: StubConfig, data_dir: str) -> Tuple[List[subprocess.Popen], Dict[str, str]]:
+    """Start the stubs and the app; return the processes and their base URLs."""
+    github_port, openai_port, app_port = free_port(), free_port(), free_port()
+    stub_command = [
+        sys.executable, os.path.join(ROOT, "benchmarks", "stub_servers.py"),
+        "--github-port", str(github_port), "--openai-port", str(openai_port),
+    ]
+    for name in StubConfig.__dataclass_fields__:
+        stub_command += [f"--{name.replace('_', '-')}", str(getattr(config, name))]
+
+    env = {
+        **os.environ,
+        "GITHUB_API_URL": f"http://127.0.0.1:{github_port}",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "GITHUB_TOKEN": "bench-token-0",
+        "GITHUB_TOKENS": ",".join(f"bench-token-{i}" for i in range(1, args.tokens)),
+        "OPENAI_API_KEY": "bench-key",
+        "PR_STORE_PATH": os.path.join(data_dir, "pr_store.sqlite3"),
+        "LLM_CACHE_DIR": "",
+        "LOG_LEVEL": "WARNING",
+    }
+    for item in args.app_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    app_command = [
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    processes = [
+        subprocess.Popen(stub_command, cwd=ROOT),
+        subprocess.Popen(app_command, cwd=ROOT, env=env),
+    ]
+    urls = {
+        "github": f"http://127.0.0.1:{github_port}",
+        "openai": f"http://127.0.0.1:{openai_port}",
+        "app": f"http://127.0.0.1:{app_port}",
+    }
+    return processes, urls
+
+
+async def request_once(client: httpx.AsyncClient, scenario: str, pr_number: int, repo: str) -> Optional[str]:
+    """Run one scenario request (following its SSE stream, if any); None on success, else why it failed.
+
+    Anything but a 200 fails, and so does a stream that ends without its "done" event.
+    """
+    method, path, sends_pr, stream_prefix = SCENARIOS[scenario]
+    headers = {"HX-Request": "true"}
+    data = {"pr_url": f"https://github.com/{repo}/pull/{pr_number}"} if sends_pr else None
+    response = await client.request(method, path, data=data, headers=headers)
+    if response.status_code != 200:
+        return str(response.status_code)
+    if stream_prefix is None:
+        return None
+
+    match = re.search(re.escape(stream_prefix) + r'[^"\s]+', response.text)
+    if match is None:
+        return "no stream URL"
+    async with client.stream("GET", html.unescape(match.group(0))) as stream:
+        if stream.status_code != 200:
+            return f"stream {stream.status_code}"
+        body = "".join([chunk async for chunk in stream.aiter_text()])
+    return None if "event: done" in body else "stream without done"
+
+
+async def drive(args: argparse.Namespace, app_url: str) -> Dict[str, Dict]:
+    """Send the requests at the target concurrency and collect latencies per scenario."""
+    scenarios = args.scenarios
+    total = args.requests
+    samples: Dict[str, List[float]] = {name: [] for name in scenarios}
+    errors: Dict[str, Dict[str, int]] = {name: {} for name in scenarios}
+    counter = iter(range(args.warmup + total))
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+
+        async def worker() -> None:
+            for i in counter:
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+                scenario = scenarios[i % len(scenarios)]
+                start = time.perf_counter()
+                try:
+                    failure = await request_once(client, scenario, i % args.prs + 1, args.repo)
+                except httpx.HTTPError as e:
+                    failure = type(e).__name__
+                elapsed = time.perf_counter() - start
+                if i < args.warmup:
+                    continue
+                samples[scenario].append(elapsed)
+                if failure is not None:
+                    errors[scenario][failure] = errors[scenario].get(failure, 0) + 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - start
+
+    results = {}
+    for name in scenarios:
+        ordered = sorted(samples[name])
+        results[name] = {
+            "requests": len(ordered),
+            "errors": sum(errors[name].values()),
+            "failures": errors[name],
+            "throughput": round(len(ordered) / wall, 2) if wall else 0.0,
+            **{f"p{p}_ms": round(percentile(ordered, p) * 1000, 1) for p in (50, 95, 99)},
+            "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+        }
+    results["_total"] = {
+        "requests": sum(len(v) for v in samples.values()),
+        "errors": sum(sum(counts.values()) for counts in errors.values()),
+        "throughput": round(sum(len(v) for v in samples.values()) / wall, 2) if wall else 0.0,
+        "wall_seconds": round(wall, 2),
+    }
+    return results
+
+
+def report(results: Dict[str, Dict], upstream: Dict[str, Dict]) -> None:
+    print(f"{'scenario':<20}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name, r in results.items():
+        if name.startswith("_"):
+            continue
+        print(f"{name:<20}{r['requests']:>7}{r['errors']:>8}{r['throughput']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}"
+              + (f"  failures {r['failures']}" if r["errors"] else ""))
+    total = results["_total"]
+    print(f"total: {total['requests']} requests, {total['errors']} errors, {total['throughput']:.1f} req/s in {total['wall_seconds']}s")
+    for service, stats in upstream.items():
+        print(f"{service} stub: {json.dumps(stats)}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Return the regressions of ``results`` against a saved run."""
+    regressions = []
+    for name, r in results.items():
+        old = baseline.get("results", baseline).get(name)
+        if name.startswith("_") or not old:
+            continue
+        if r["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {old['p95_ms']} -> {r['p95_ms']} ms")
+        if r["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {old['throughput']} -> {r['throughput']} req/s")
+        if r["errors"] > old["errors"]:
+            regressions.append(f"{name}: errors {old['errors']} -> {r['errors']}")
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> int:
+    config = config_from_args(args)
+    with tempfile.TemporaryDirectory() as data_dir:
+        processes, urls = start_processes(args, config, data_dir)
+        try:
+            for url in (f"{urls['github']}/_stats", f"{urls['openai']}/_stats", f"{urls['app']}/metrics"):
+                await wait_until_ready(url)
+            results = await drive(args, urls["app"])
+            async with httpx.AsyncClient() as client:
+                upstream = {service: (await client.get(f"{urls[service]}/_stats")).json() for service in ("github", "openai")}
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+    report(results, upstream)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results, "upstream": upstream}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default="description,review",
+                        type=lambda value: [name for name in value.split(",") if name],
+                        help=f"comma-separated, round-robin: {', '.join(SCENARIOS)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="measured requests (after warm-up)")
+    parser.add_argument("--duration", type=float, default=0, help="stop after this many seconds instead")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--prs", type=int, default=50, help="distinct PR numbers to cycle through (cache hit ratio)")
+    parser.add_argument("--repo", default="bench/repo")
+    parser.add_argument("--tokens", type=int, default=1, help="GitHub tokens in the app's pool")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="extra app environment")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed p95/throughput change vs the baseline")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
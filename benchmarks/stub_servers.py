@@ -0,0 +1,356 @@
+"""
+Local stand-ins for the GitHub REST/GraphQL API and the chat completions API.
+
+Both servers answer every endpoint the app calls, with configurable latency,
+payload size, error rate and rate-limit headers, so the real HTTP code paths
+(pooling, ETags, token pool, streaming, diff chunking) can be exercised and
+timed offline. Responses are deterministic per PR number, and the REST and
+GraphQL responses for a PR are rendered from the same ``pr_fixture``, so both
+GitHub backends build the same snapshot.
+
+Run on its own from the repository root:
+
+    uv run python benchmarks/stub_servers.py --github-port 9001 --openai-port 9002
+
+then start the app with ``GITHUB_API_URL=http://127.0.0.1:9001`` and
+``OPENAI_BASE_URL=http://127.0.0.1:9002/v1``. ``benchmarks/load_test.py``
+does this for you.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+@dataclass
+class StubConfig:
+    """Knobs for both stand-ins."""
+    latency_ms: float = 50.0
+    jitter_ms: float = 10.0
+    error_rate: float = 0.0
+    body_kb: float = 2.0
+    files: int = 20
+    commits: int = 10
+    diff_lines: int = 40
+    repo_prs: int = 500
+    rate_limit: int = 5000
+    rate_limit_window: float = 3600.0
+    llm_latency_ms: float = 800.0
+    llm_tokens: int = 300
+    llm_error_rate: float = 0.0
+    seed: int = 42
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Add the stub knobs to an argument parser (shared with the load test)."""
+    defaults = StubConfig()
+    group = parser.add_argument_group("stub servers")
+    group.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="GitHub response latency")
+    group.add_argument("--jitter-ms", type=float, default=defaults.jitter_ms, help="uniform +/- jitter on every latency")
+    group.add_argument("--error-rate", type=float, default=defaults.error_rate, help="fraction of GitHub calls answered with 500")
+    group.add_argument("--body-kb", type=float, default=defaults.body_kb, help="size of each PR body")
+    group.add_argument("--files", type=int, default=defaults.files, help="changed files per PR (and files in its diff)")
+    group.add_argument("--commits", type=int, default=defaults.commits, help="commits per PR")
+    group.add_argument("--diff-lines", type=int, default=defaults.diff_lines, help="changed lines per file in the diff")
+    group.add_argument("--repo-prs", type=int, default=defaults.repo_prs, help="PRs in the repository listing")
+    group.add_argument("--rate-limit", type=int, default=defaults.rate_limit, help="GitHub requests per token per window (403 once used up)")
+    group.add_argument("--rate-limit-window", type=float, default=defaults.rate_limit_window, help="seconds until a token's quota resets")
+    group.add_argument("--llm-latency-ms", type=float, default=defaults.llm_latency_ms, help="completion latency (spread over the chunks when streaming)")
+    group.add_argument("--llm-tokens", type=int, default=defaults.llm_tokens, help="completion length in tokens")
+    group.add_argument("--llm-error-rate", type=float, default=defaults.llm_error_rate, help="fraction of completions answered with 500")
+    group.add_argument("--seed", type=int, default=defaults.seed)
+
+
+def config_from_args(args: argparse.Namespace) -> StubConfig:
+    return StubConfig(**{name: getattr(args, name) for name in StubConfig.__dataclass_fields__})
+
+
+WORDS = (
+    "update parser handler cache token request response stream review render client server "
+    "fix add improve refactor config queue worker retry timeout memory latency docs test"
+).split()
+
+
+class _Quota:
+    """Per-token rate-limit window, reported the way GitHub does."""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._lock = threading.Lock()
+        self._used: Dict[str, int] = {}
+        self._reset: Dict[str, float] = {}
+
+    def take(self, token: str) -> Dict[str, str]:
+        with self._lock:
+            now = time.time()
+            if now >= self._reset.get(token, 0):
+                self._reset[token] = now + self.window
+                self._used[token] = 0
+            self._used[token] += 1
+            remaining = max(0, self.limit - self._used[token])
+            return {
+                "X-RateLimit-Limit": str(self.limit),
+                "X-RateLimit-Remaining": str(remaining),
+                "X-RateLimit-Used": str(self._used[token]),
+                "X-RateLimit-Reset": str(int(self._reset[token])),
+                "X-RateLimit-Resource": "core",
+                # One over the limit is the first rejected call
+                "_exhausted": "1" if self._used[token] > self.limit else "",
+            }
+
+
+def _words(config: StubConfig, pr_number: int, count: int) -> str:
+    local = random.Random(config.seed * 100003 + pr_number)
+    return " ".join(local.choices(WORDS, k=count))
+
+
+def pr_fixture(config: StubConfig, owner: str, repo: str, pr_number: int) -> Dict:
+    """Everything the stub knows about one PR, independent of the API that serves it."""
+    return {
+        "number": pr_number,
+        "title": f"{_words(config, pr_number, 5).capitalize()} (#{pr_number})",
+        "body": _words(config, pr_number, max(1, int(config.body_kb * 1024 / 7))),
+        "author": {"login": f"author{pr_number % 13}", "avatar_url": f"https://avatars.example/author{pr_number % 13}"},
+        "assignees": [f"reviewer{pr_number % 7}"],
+        "state": "open",
+        "created_at": "2024-01-01T00:00:00Z",
+        "updated_at": f"2024-03-{1 + pr_number % 28:02d}T{pr_number % 24:02d}:00:00Z",
+        "head_sha": hashlib.sha1(f"{owner}/{repo}#{pr_number}".encode()).hexdigest(),
+        "additions": config.files * config.diff_lines,
+        "deletions": config.files * config.diff_lines // 4,
+        "labels": [["bug", "enhancement", "documentation", "low"][pr_number % 4]],
+        "files": [
+            {"path": f"src/module_{i}.py", "status": "modified", "additions": config.diff_lines, "deletions": config.diff_lines // 4}
+            for i in range(config.files)
+        ],
+        "commits": _commits(pr_number, config.commits),
+        "html_url": f"https://github.com/{owner}/{repo}/pull/{pr_number}",
+    }
+
+
+def rest_pull(fixture: Dict) -> Dict:
+    """``GET /repos/{owner}/{repo}/pulls/{number}`` body for a PR fixture."""
+    return {
+        "number": fixture["number"],
+        "title": fixture["title"],
+        "body": fixture["body"],
+        "user": fixture["author"],
+        "assignees": [{"login": login} for login in fixture["assignees"]],
+        "state": fixture["state"],
+        "created_at": fixture["created_at"],
+        "updated_at": fixture["updated_at"],
+        "head": {"sha": fixture["head_sha"]},
+        "additions": fixture["additions"],
+        "deletions": fixture["deletions"],
+        "changed_files": len(fixture["files"]),
+        "html_url": fixture["html_url"],
+    }
+
+
+def graphql_pull(fixture: Dict) -> Dict:
+    """``pullRequest`` node of the app's GraphQL query for a PR fixture."""
+    def user(account: Dict) -> Dict:
+        return {"login": account["login"], "avatarUrl": account["avatar_url"]}
+
+    return {
+        "title": fixture["title"], "body": fixture["body"], "state": fixture["state"].upper(),
+        "createdAt": fixture["created_at"], "updatedAt": fixture["updated_at"], "headRefOid": fixture["head_sha"],
+        "additions": fixture["additions"], "deletions": fixture["deletions"], "changedFiles": len(fixture["files"]),
+        "author": user(fixture["author"]),
+        "assignees": {"nodes": [{"login": login} for login in fixture["assignees"]]},
+        "labels": {"nodes": [{"name": name, "color": "ededed", "description": ""} for name in fixture["labels"]]},
+        "commits": {"nodes": [
+            {"commit": {"author": {"user": user(c["author"])}, "committer": {"user": user(c["committer"])}}}
+            for c in fixture["commits"]
+        ]},
+        "files": {"nodes": [
+            {"path": f["path"], "changeType": f["status"].upper(), "additions": f["additions"], "deletions": f["deletions"]}
+            for f in fixture["files"]
+        ]},
+    }
+
+
+async def _delay(config: StubConfig, latency_ms: float, rng: random.Random) -> None:
+    jitter = rng.uniform(-config.jitter_ms, config.jitter_ms) if config.jitter_ms else 0.0
+    await asyncio.sleep(max(0.0, latency_ms + jitter) / 1000)
+
+
+def create_github_app(config: StubConfig) -> FastAPI:
+    """GitHub REST/GraphQL stand-in."""
+    app = FastAPI()
+    quota = _Quota(config.rate_limit, config.rate_limit_window)
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "errors": 0, "not_modified": 0, "rate_limited": 0}
+
+    def diff(pr_number: int) -> str:
+        lines = []
+        for index in range(config.files):
+            name = f"src/module_{index}.py"
+            lines += [f"diff --git a/{name} b/{name}", f"--- a/{name}", f"+++ b/{name}",
+                      f"@@ -1,{config.diff_lines} +1,{config.diff_lines} @@"]
+            lines += [f"+    value_{pr_number}_{i} = compute({i})  # {_words(config, pr_number + i, 4)}" for i in range(config.diff_lines)]
+        return "\n".join(lines) + "\n"
+
+    async def respond(request: Request, body, media_type: str = "application/json") -> Response:
+        stats["requests"] += 1
+        token = request.headers.get("Authorization", "anonymous")
+        headers = quota.take(token)
+        exhausted = headers.pop("_exhausted")
+        await _delay(config, config.latency_ms, rng)
+        if exhausted:
+            stats["rate_limited"] += 1
+            return JSONResponse({"message": "API rate limit exceeded"}, status_code=403, headers={**headers, "X-RateLimit-Remaining": "0"})
+        if config.error_rate and rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"message": "Server Error"}, status_code=500, headers=headers)
+
+        raw = body.encode() if isinstance(body, str) else json.dumps(body).encode()
+        etag = '"%s"' % hashlib.md5(raw).hexdigest()
+        headers["ETag"] = etag
+        if request.headers.get("If-None-Match") == etag:
+            stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+        return Response(raw, media_type=media_type, headers=headers)
+
+    @app.get("/repos/{owner}/{repo}/pulls")
+    async def list_pulls(request: Request, owner: str, repo: str, page: int = 1, per_page: int = 30):
+        numbers = range(config.repo_prs, 0, -1)[(page - 1) * per_page: page * per_page]
+        items = [rest_pull(pr_fixture(config, owner, repo, number)) for number in numbers]
+        # Listed newest-updated first, as with sort=updated&direction=desc
+        items.sort(key=lambda item: item["updated_at"], reverse=True)
+        return await respond(request, items)
+
+    @app.get("/repos/{owner}/{repo}/pulls/{pr_number}")
+    async def get_pull(request: Request, owner: str, repo: str, pr_number: int):
+        if "diff" in request.headers.get("Accept", ""):
+            return await respond(request, diff(pr_number), media_type="text/plain")
+        return await respond(request, rest_pull(pr_fixture(config, owner, repo, pr_number)))
+
+    @app.get("/repos/{owner}/{repo}/issues/{pr_number}/labels")
+    async def get_labels(request: Request, owner: str, repo: str, pr_number: int):
+        fixture = pr_fixture(config, owner, repo, pr_number)
+        return await respond(request, [{"name": name, "color": "ededed"} for name in fixture["labels"]])
+
+    @app.get("/repos/{owner}/{repo}/pulls/{pr_number}/files")
+    async def get_files(request: Request, owner: str, repo: str, pr_number: int):
+        fixture = pr_fixture(config, owner, repo, pr_number)
+        files = [{"filename": f["path"], **{k: v for k, v in f.items() if k != "path"}} for f in fixture["files"]]
+        return await respond(request, files)
+
+    @app.get("/repos/{owner}/{repo}/pulls/{pr_number}/commits")
+    async def get_commits(request: Request, owner: str, repo: str, pr_number: int):
+        return await respond(request, pr_fixture(config, owner, repo, pr_number)["commits"])
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        variables = (await request.json()).get("variables", {})
+        fixture = pr_fixture(config, variables.get("owner", ""), variables.get("repo", ""), int(variables.get("number", 0)))
+        return await respond(request, {"data": {"repository": {"pullRequest": graphql_pull(fixture)}}})
+
+    @app.get("/_stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+def _commits(pr_number: int, count: int) -> List[Dict]:
+    return [
+        {
+            "sha": hashlib.sha1(f"{pr_number}:{i}".encode()).hexdigest(),
+            "author": {"login": f"dev{(pr_number + i) % 5}", "avatar_url": f"https://avatars.example/dev{(pr_number + i) % 5}"},
+            "committer": (
+                {"login": "web-flow", "avatar_url": "https://avatars.example/web-flow"} if i % 3 == 0
+                else {"login": f"dev{(pr_number + i) % 5}", "avatar_url": f"https://avatars.example/dev{(pr_number + i) % 5}"}
+            ),
+        }
+        for i in range(count)
+    ]
+
+
+def create_openai_app(config: StubConfig) -> FastAPI:
+    """Chat completions stand-in (plain and ``stream: true``)."""
+    app = FastAPI()
+    rng = random.Random(config.seed + 1)
+    stats = {"requests": 0, "errors": 0, "streams": 0}
+
+    def completion_text() -> str:
+        # Roughly one word per token, with the review sections the app expects
+        sections = ["## Overall Assessment", "## Code Quality", "## Potential Issues", "## Suggestions", "## Testing", "## Documentation"]
+        words = rng.choices(WORDS, k=max(1, config.llm_tokens - 2 * len(sections)))
+        per_section = max(1, len(words) // len(sections))
+        return "\n\n".join(
+            f"{heading}\n{' '.join(words[i * per_section:(i + 1) * per_section])}" for i, heading in enumerate(sections)
+        )
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        stats["requests"] += 1
+        payload = await request.json()
+        if config.llm_error_rate and rng.random() < config.llm_error_rate:
+            stats["errors"] += 1
+            await _delay(config, config.llm_latency_ms / 4, rng)
+            return JSONResponse({"error": {"message": "stub failure"}}, status_code=500)
+
+        text = completion_text()
+        usage = {
+            "prompt_tokens": sum(len(m.get("content", "")) // 4 for m in payload.get("messages", [])),
+            "completion_tokens": config.llm_tokens,
+        }
+        if not payload.get("stream"):
+            await _delay(config, config.llm_latency_ms, rng)
+            return {"choices": [{"message": {"role": "assistant", "content": text}}], "usage": usage}
+
+        stats["streams"] += 1
+        pieces = text.split(" ")
+
+        async def events():
+            # A quarter of the latency to the first token, the rest spread over the chunks
+            await _delay(config, config.llm_latency_ms / 4, rng)
+            step = config.llm_latency_ms * 0.75 / 1000 / max(1, len(pieces) // 8)
+            for i in range(0, len(pieces), 8):
+                delta = " ".join(pieces[i:i + 8]) + (" " if i + 8 < len(pieces) else "")
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': delta}}]})}\n\n"
+                await asyncio.sleep(step)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/_stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+async def serve(config: StubConfig, github_port: int, openai_port: int, host: str = "127.0.0.1") -> None:
+    """Serve both stand-ins until cancelled."""
+    servers = [
+        uvicorn.Server(uvicorn.Config(create_github_app(config), host=host, port=github_port, log_level="warning")),
+        uvicorn.Server(uvicorn.Config(create_openai_app(config), host=host, port=openai_port, log_level="warning")),
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--github-port", type=int, default=9001)
+    parser.add_argument("--openai-port", type=int, default=9002)
+    add_arguments(parser)
+    args = parser.parse_args()
+    asyncio.run(serve(config_from_args(args), args.github_port, args.openai_port, args.host))
+
+
+if __name__ == "__main__":
+    main()
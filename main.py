@@ -1,67 +1,250 @@
+import asyncio
+import html
+import json
+import logging
 import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Dict, Generator, Literal, Optional
+from urllib.parse import urlencode
 from dotenv import load_dotenv
 
 from fastapi import FastAPI, Response, HTTPException, Form, Request
+from fastapi.concurrency import iterate_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from pydantic import BaseModel
 
 from fasthx import Jinja
 
+# Load environment variables from .env file before the services read their settings
+load_dotenv()
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").strip().upper())
+
 # Import from our modular structure
-from app.models.pr_models import User, PRDescriptionRequest, PRDescriptionResponse, PRReviewRequest, PRReviewResponse
-from app.services.github_service import parse_github_pr_url, fetch_github_pr_data
-from app.services.openai_service import generate_pr_description_with_openai
-from app.services.pr_review_service import generate_pr_review_with_openai
+from app.models.github_snapshot import PRSnapshot
+from app.models.pr_models import (
+    User,
+    PRDescriptionRequest,
+    PRDescriptionResponse,
+    PRReviewRequest,
+    PRReviewResponse,
+    PRAnalysisResponse,
+)
+from app.services.diff_review_service import build_diff_review_request
+from app.services.github_service import (
+    parse_github_pr_url,
+    fetch_github_pr_data,
+    close_github_client,
+    github_flight,
+    github_response_cache,
+)
+from app.services.github_tokens import get_token_pool
+from app.services.job_queue import Job, JobStream, job_queue
+from app.services.llm_cache import llm_cache
+from app.services.llm_client import llm_client
+from app.services.model_router import model_router
+from app.services import pr_store
+from app.services.openai_service import stream_pr_description_with_openai
+from app.services.pr_pipeline import (
+    build_pr_analysis,
+    build_pr_description,
+    build_pr_review,
+    generation_flight,
+    record_review_score,
+)
+from app.services.pr_review_service import stream_pr_review_with_openai
+from app.services.repo_sync import sync_flight, sync_repository, verify_sync_token
+from app.services.warmup import warmup
+from app.services.webhook_service import handle_pull_request_event, precompute_queue, verify_signature
+from app.utils.fragment_cache import FragmentCache, result_key
+from app.utils.json_response import FastJSONResponse, parse_fields, result_payload
+from app.utils.metrics import MetricsMiddleware, registry, stage
 from app.utils.pr_classifier import analyze_pr_data
-
-# Load environment variables from .env file
-load_dotenv()
+from app.utils.prompt_budget import token_usage
+from app.utils.trivial_pr import trivial_pr_detector
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the job workers and the warm-up, and release pooled upstream connections on shutdown."""
+    await job_queue.start()
+    # Serve right away; /ready reports 200 once the warm-up is done
+    warmup_task = asyncio.create_task(warmup.run(templates.env))
+    yield
+    warmup_task.cancel()
+    await job_queue.stop()
+    await precompute_queue.stop()
+    await close_github_client()
+    llm_client.close()
+
+
 # Create the app instance.
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Per-request latency histogram and Server-Timing header
+app.add_middleware(MetricsMiddleware)
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates that records template rendering as the "render" stage."""
+
+    def TemplateResponse(self, *args: Any, **kwargs: Any) -> Response:
+        with stage("render"):
+            return super().TemplateResponse(*args, **kwargs)
+
 
 # Create a FastAPI Jinja2Templates instance. This will be used in FastHX Jinja instance.
-templates = Jinja2Templates(directory=os.path.join(basedir, "templates"))
+templates = TimedTemplates(directory=os.path.join(basedir, "templates"))
+
+# Compiled templates are kept on disk so restarts skip Jinja compilation (empty to disable)
+JINJA_CACHE_DIR = os.getenv("JINJA_CACHE_DIR", os.path.join("data", "jinja_cache"))
+if JINJA_CACHE_DIR:
+    try:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+        templates.env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+    except OSError as e:
+        logging.getLogger(__name__).warning("Jinja bytecode cache disabled (%s): %s", JINJA_CACHE_DIR, e)
 
 # FastHX Jinja instance is initialized with the Jinja2Templates instance.
 jinja = Jinja(templates)
 
+# Rendered pages and result partials, served with ETags and compression.
+fragments = FragmentCache(templates, max_entries=int(os.getenv("FRAGMENT_CACHE_MAX_ENTRIES", "256")))
+
+# Background generation tools: pipeline, the template that renders its result and the result model.
+JOB_TOOLS = {
+    "description": (build_pr_description, "pr-description/pr-description-result.html", PRDescriptionResponse),
+    "review": (build_pr_review, "pr-review/pr-review-result.html", PRReviewResponse),
+    "analysis": (build_pr_analysis, "pr-analysis/pr-analysis-result.html", PRAnalysisResponse),
+}
+
+def _stream_url(path: str, github_data: PRSnapshot) -> str:
+    """SSE URL for a PR version, servable by any worker (no per-process stream state)."""
+    query = urlencode({"updated_at": github_data.updated_at, "head_sha": github_data.head_sha})
+    return f"{path}/{github_data.repository}/{github_data.pr_number}?{query}"
+
+
+async def _stream_snapshot(owner: str, repo: str, pr_number: int, updated_at: str, head_sha: str) -> PRSnapshot:
+    """The PR version a stream URL names: read from the shared PR store, else fetched again."""
+    if head_sha:
+        stored = await asyncio.to_thread(pr_store.get_pr_snapshot, owner, repo, pr_number, updated_at, head_sha)
+        if stored is not None:
+            return stored
+    return await fetch_github_pr_data(owner, repo, pr_number)
+
+
+def _format_sse(event: str, data: str) -> str:
+    """Format one Server-Sent Event; multi-line data becomes several data lines."""
+    lines = "".join(f"data: {line}\n" for line in data.split("\n"))
+    return f"event: {event}\n{lines}\n"
+
+
+def _relay_chunks(chunks: Generator[str, None, Any], parts: list) -> Generator[str, None, Any]:
+    """Forward text chunks as escaped SSE "chunk" events and return the stream's return value."""
+    while True:
+        try:
+            chunk = next(chunks)
+        except StopIteration as done:
+            return done.value
+        parts.append(chunk)
+        yield _format_sse("chunk", html.escape(chunk))
+
+
+# Query parameters of the result routes for API (non-HTMX) clients
+ResultView = Literal["lean", "full"]
+
+
+def _render_result(request: Request, template_name: str, result: BaseModel) -> Response:
+    """Render a result partial, reusing the fragment rendered for the same PR version and content."""
+    fragment = fragments.render(template_name, result.model_dump, key=result_key(result))
+    return fragments.respond(request, fragment, cache_control="private, no-cache")
+
+
+def _result_json(result: BaseModel, view: ResultView, fields: Optional[str]) -> Dict[str, Any]:
+    """Serialize a result for API clients (lean by default, see ``result_payload``)."""
+    try:
+        return result_payload(result, view, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _respond_result(request: Request, template_name: str, result: BaseModel, view: ResultView, fields: Optional[str]) -> Response:
+    """Render the result partial for HTMX, or return it as JSON to API clients."""
+    if request.headers.get("HX-Request"):
+        return _render_result(request, template_name, result)
+    return FastJSONResponse(_result_json(result, view, fields))
+
+
+async def _shared_stream(tool: str, github_data: PRSnapshot, events: Callable[[], AsyncIterator[str]]) -> JobStream:
+    """Generate ``events()`` on a queue worker, shared by every stream of the same PR version and tool.
+
+    Clients joining an open stream replay its events so far, then follow it live.
+    """
+    key = (github_data.repository.lower(), github_data.pr_number, github_data.updated_at, github_data.head_sha, f"{tool}-stream")
+    return await generation_flight.stream(key, job_queue.stream, f"{tool}-stream", events)
+
+
+def _event_stream(events: AsyncIterable[str]) -> Response:
+    """Wrap an SSE event generator in a streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @app.post("/generate-pr-description")
-@jinja.hx("pr-description/pr-description-result.html", no_data=True)
-def generate_pr_description(pr_url: str = Form(...)) -> PRDescriptionResponse:
+async def generate_pr_description(
+    request: Request, pr_url: str = Form(...), view: ResultView = "lean", fields: Optional[str] = None
+) -> Response:
     """Generate PR description from GitHub URL."""
-    # Parse GitHub PR URL
+    result = await job_queue.run("description", build_pr_description, pr_url)
+    return _respond_result(request, "pr-description/pr-description-result.html", result, view, fields)
+
+
+@app.post("/generate-pr-description/stream")
+async def generate_pr_description_stream(request: Request, pr_url: str = Form(...)) -> Response:
+    """Render PR details immediately and stream the generated description over SSE."""
     owner, repo, pr_number = parse_github_pr_url(pr_url)
-    
-    # Fetch PR data from GitHub
-    github_data = fetch_github_pr_data(owner, repo, pr_number)
-    
-    # Generate AI description
-    generated_description = generate_pr_description_with_openai(github_data)
-    
-    # Determine PR type and priority based on labels
-    metadata = analyze_pr_data(github_data)
-    pr_type = metadata["pr_type"]
-    priority = metadata["priority"]
-    assignee = metadata["assignee"]
-
-    body = github_data.get("body", "")
-    if not body:
-        body = ""
-
-    return PRDescriptionResponse(
-        title=github_data.get("title", "Unknown PR"),
-        repository=github_data.get("repository", "Unknown repository"),
-        description=body,
-        pr_type=pr_type,
-        priority=priority,
-        assignee=assignee,
-        generated_description=generated_description,
+    github_data = await fetch_github_pr_data(owner, repo, pr_number)
+    with stage("classify"):
+        metadata = analyze_pr_data(github_data)
+
+    result = PRDescriptionResponse(
+        title=github_data.title,
+        repository=github_data.repository,
+        description=github_data.body or "",
+        pr_type=metadata["pr_type"],
+        priority=metadata["priority"],
+        assignee=metadata["assignee"],
+        generated_description="",
         github_data=github_data,
     )
+    return templates.TemplateResponse(
+        "pr-description/pr-description-result.html",
+        {"request": request, **result.model_dump(), "stream_url": _stream_url("/generate-pr-description/stream", github_data)},
+    )
+
+
+@app.get("/generate-pr-description/stream/{owner}/{repo}/{pr_number}")
+async def stream_pr_description(owner: str, repo: str, pr_number: int, updated_at: str = "", head_sha: str = "") -> Response:
+    """Stream a PR description as SSE "chunk" events followed by a final "done" event."""
+    github_data = await _stream_snapshot(owner, repo, pr_number, updated_at, head_sha)
+
+    def events() -> Generator[str, None, None]:
+        parts: list = []
+        yield from _relay_chunks(stream_pr_description_with_openai(github_data), parts)
+        with stage("render"):
+            final = templates.get_template("pr-description/pr-description-generated.html").render(
+                generated_description="".join(parts).strip()
+            )
+        yield _format_sse("done", final)
+
+    return _event_stream(await _shared_stream("description", github_data, lambda: iterate_in_threadpool(events())))
 
 
 @app.get("/user-list")
@@ -90,10 +273,47 @@ def index(request: Request) -> Response:
     # Check if this is an HTMX request
     if request.headers.get("HX-Request"):
         # Return partial content for HTMX requests (just the main content)
-        return templates.TemplateResponse("dashboard/dashboard-content.html", {"request": request})
+        return fragments.page(request, "dashboard/dashboard-content.html")
     else:
         # Return full page for regular requests
-        return templates.TemplateResponse("dashboard/index.html", {"request": request})
+        return fragments.page(request, "dashboard/index.html")
+
+
+@app.get("/analytics")
+@jinja.hx("dashboard/dashboard-analytics.html")
+async def analytics(repository: Optional[str] = None) -> dict:
+    """Repo-wide PR analytics as JSON, or the dashboard panel for HTMX requests."""
+    # Imported here (and by the warm-up) so NumPy stays off the startup path
+    from app.services.pr_analytics import get_pr_analytics
+
+    return await get_pr_analytics(repository)
+
+
+@app.post("/repos/{owner}/{repo}/sync")
+async def sync_repo(request: Request, owner: str, repo: str) -> dict:
+    """Fetch the repository's PRs updated since its last sync into the PR store (requires ``REPO_SYNC_TOKEN``)."""
+    if not verify_sync_token(request.headers.get("Authorization")):
+        raise HTTPException(status_code=401, detail="Invalid or missing sync token", headers={"WWW-Authenticate": "Bearer"})
+    return await sync_repository(owner, repo)
+
+
+@app.post("/webhooks/github", status_code=202)
+async def github_webhook(request: Request) -> dict:
+    """Receive a signed GitHub webhook delivery and precompute results for changed PRs."""
+    body = await request.body()
+    if not verify_signature(body, request.headers.get("X-Hub-Signature-256")):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    event = request.headers.get("X-GitHub-Event", "")
+    if event == "ping":
+        return {"status": "pong"}
+    if event != "pull_request":
+        return {"status": "ignored", "event": event}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    return await handle_pull_request_event(payload)
 
 
 @app.get("/pr-description")
@@ -102,10 +322,10 @@ def pr_description(request: Request) -> Response:
     # Check if this is an HTMX request
     if request.headers.get("HX-Request"):
         # Return partial content for HTMX requests (just the main content)
-        return templates.TemplateResponse("pr-description/pr-description-content.html", {"request": request})
+        return fragments.page(request, "pr-description/pr-description-content.html")
     else:
         # Return full page for regular requests
-        return templates.TemplateResponse("pr-description/pr-description.html", {"request": request})
+        return fragments.page(request, "pr-description/pr-description.html")
 
 
 @app.get("/pr-review")
@@ -114,41 +334,188 @@ def pr_review(request: Request) -> Response:
     # Check if this is an HTMX request
     if request.headers.get("HX-Request"):
         # Return partial content for HTMX requests (just the main content)
-        return templates.TemplateResponse("pr-review/pr-review-content.html", {"request": request})
+        return fragments.page(request, "pr-review/pr-review-content.html")
     else:
         # Return full page for regular requests
-        return templates.TemplateResponse("pr-review/pr-review.html", {"request": request})
+        return fragments.page(request, "pr-review/pr-review.html")
 
 
 @app.post("/generate-pr-review")
-@jinja.hx("pr-review/pr-review-result.html", no_data=True)
-def generate_pr_review(pr_url: str = Form(...)) -> PRReviewResponse:
+async def generate_pr_review(
+    request: Request, pr_url: str = Form(...), view: ResultView = "lean", fields: Optional[str] = None
+) -> Response:
     """Generate PR review from GitHub URL."""
-    # Parse GitHub PR URL
+    result = await job_queue.run("review", build_pr_review, pr_url)
+    return _respond_result(request, "pr-review/pr-review-result.html", result, view, fields)
+
+
+@app.post("/generate-pr-review/stream")
+async def generate_pr_review_stream(request: Request, pr_url: str = Form(...)) -> Response:
+    """Render PR details immediately and stream the generated review over SSE."""
     owner, repo, pr_number = parse_github_pr_url(pr_url)
-    
-    # Fetch PR data from GitHub
-    github_data = fetch_github_pr_data(owner, repo, pr_number)
-    
-    # Generate AI review
-    review_analysis, review_score = generate_pr_review_with_openai(github_data)
-    
-    # Determine PR type and priority based on labels
-    metadata = analyze_pr_data(github_data)
-    pr_type = metadata["pr_type"]
-    priority = metadata["priority"]
-    assignee = metadata["assignee"]
-
-    return PRReviewResponse(
-        title=github_data.get("title", "Unknown PR"),
-        repository=github_data.get("repository", "Unknown repository"),
-        pr_type=pr_type,
-        priority=priority,
-        assignee=assignee,
-        review_analysis=review_analysis,
-        review_score=review_score,
+    github_data = await fetch_github_pr_data(owner, repo, pr_number)
+    with stage("classify"):
+        metadata = analyze_pr_data(github_data)
+
+    result = PRReviewResponse(
+        title=github_data.title,
+        repository=github_data.repository,
+        pr_type=metadata["pr_type"],
+        priority=metadata["priority"],
+        assignee=metadata["assignee"],
+        review_analysis="",
+        review_score=0,
         github_data=github_data,
     )
+    return templates.TemplateResponse(
+        "pr-review/pr-review-result.html",
+        {"request": request, **result.model_dump(), "stream_url": _stream_url("/generate-pr-review/stream", github_data)},
+    )
+
+
+@app.get("/generate-pr-review/stream/{owner}/{repo}/{pr_number}")
+async def stream_pr_review(owner: str, repo: str, pr_number: int, updated_at: str = "", head_sha: str = "") -> Response:
+    """Stream a PR review as SSE "chunk" events followed by a final "done" event with the score."""
+    github_data = await _stream_snapshot(owner, repo, pr_number, updated_at, head_sha)
+
+    def review_events(review_request: Dict) -> Generator[str, None, None]:
+        parts: list = []
+        review_score, scored = yield from _relay_chunks(stream_pr_review_with_openai(github_data, review_request), parts)
+        if scored:
+            record_review_score(github_data, review_score)
+        with stage("render"):
+            final = templates.get_template("pr-review/pr-review-analysis.html").render(
+                review_analysis="".join(parts).strip(),
+                review_score=review_score,
+            )
+        yield _format_sse("done", final)
+
+    async def events() -> AsyncIterator[str]:
+        # Review the diff chunks first, then stream the final review
+        with stage("diff_review"):
+            review_request = await build_diff_review_request(github_data)
+        async for event in iterate_in_threadpool(review_events(review_request)):
+            yield event
+
+    return _event_stream(await _shared_stream("review", github_data, events))
+
+
+@app.get("/pr-analysis")
+def pr_analysis(request: Request) -> Response:
+    """This route serves the pr-analysis.html template."""
+    # Check if this is an HTMX request
+    if request.headers.get("HX-Request"):
+        # Return partial content for HTMX requests (just the main content)
+        return fragments.page(request, "pr-analysis/pr-analysis-content.html")
+    else:
+        # Return full page for regular requests
+        return fragments.page(request, "pr-analysis/pr-analysis.html")
+
+
+@app.post("/generate-pr-analysis")
+async def generate_pr_analysis(
+    request: Request, pr_url: str = Form(...), view: ResultView = "lean", fields: Optional[str] = None
+) -> Response:
+    """Generate PR description and review together from one GitHub fetch."""
+    result = await job_queue.run("analysis", build_pr_analysis, pr_url)
+    return _respond_result(request, "pr-analysis/pr-analysis-result.html", result, view, fields)
+
+
+@app.post("/jobs/{tool}")
+async def submit_job(request: Request, tool: str, pr_url: str = Form(...)) -> Response:
+    """Queue a generation job and return its ID (or a polling partial for HTMX) right away."""
+    if tool not in JOB_TOOLS:
+        raise HTTPException(status_code=404, detail=f"Unknown tool: {tool}")
+    pipeline, _, _ = JOB_TOOLS[tool]
+    job = await job_queue.submit(tool, pipeline, pr_url, persist=True)
+    if request.headers.get("HX-Request"):
+        return _render_job_status(request, job)
+    return JSONResponse({"job_id": job.id, "status": job.status, "status_url": f"/jobs/{job.id}"}, status_code=202)
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, view: ResultView = "lean", fields: Optional[str] = None) -> Response:
+    """Return a job's status, or its rendered result once it is done."""
+    job = await job_queue.lookup(job_id, _decode_job_result)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    if not request.headers.get("HX-Request"):
+        return FastJSONResponse({
+            "job_id": job.id,
+            "tool": job.kind,
+            "status": job.status,
+            "wait_time": round(job.wait_time, 3),
+            "run_time": round(job.run_time, 3),
+            "error": _job_error(job),
+            "result": _result_json(job.result, view, fields) if job.status == "done" else None,
+        })
+
+    if job.status == "done":
+        _, template_name, _ = JOB_TOOLS[job.kind]
+        return _render_result(request, template_name, job.result)
+    return _render_job_status(request, job)
+
+
+def _decode_job_result(kind: str, result: str) -> BaseModel:
+    """Rebuild the result of a job persisted by any worker."""
+    _, _, result_type = JOB_TOOLS[kind]
+    return result_type.model_validate_json(result)
+
+
+def _job_error(job: Job) -> Optional[str]:
+    """Human readable error for a failed job."""
+    if job.error is None:
+        return None
+    return getattr(job.error, "detail", None) or str(job.error)
+
+
+def _render_job_status(request: Request, job: Job) -> Response:
+    """Render the polling partial for a queued, running or failed job."""
+    return templates.TemplateResponse("jobs/job-status.html", {
+        "request": request,
+        "job_id": job.id,
+        "status": job.status,
+        "position": job_queue.position(job),
+        "wait_time": job.wait_time,
+        "run_time": job.run_time,
+        "error": _job_error(job),
+    })
+
+
+@app.get("/stats")
+async def stats() -> dict:
+    """Return cache and upstream usage counters."""
+    return {
+        "github_cache": github_response_cache.stats(),
+        "fragments": fragments.stats(),
+        "github_quota": get_token_pool().stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_client": llm_client.stats(),
+        "model_routes": model_router.stats(),
+        "trivial_prs": trivial_pr_detector.stats(),
+        "warmup": warmup.stats(),
+        "tokens": token_usage.stats(),
+        "jobs": job_queue.stats(),
+        "precompute_jobs": precompute_queue.stats(),
+        "single_flight": {
+            "github": github_flight.stats(),
+            "generation": generation_flight.stats(),
+            "repo_sync": sync_flight.stats(),
+        },
+    }
+
+
+@app.get("/ready")
+async def ready() -> Response:
+    """Readiness probe: 200 once the startup warm-up has finished, 503 until then."""
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.ready else 503)
+
+
+@app.get("/metrics")
+async def metrics() -> Response:
+    """Per-stage, per-upstream and per-route latency histograms and fallback counters (Prometheus format)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
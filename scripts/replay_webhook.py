@@ -0,0 +1,74 @@
+"""
+Replay a GitHub ``pull_request`` webhook delivery against a running app.
+
+Either send a saved payload (e.g. copied from the webhook's "Recent
+Deliveries" page) or build a minimal one from a PR URL. The body is signed
+with ``GITHUB_WEBHOOK_SECRET`` exactly as GitHub signs it.
+
+Run from the repository root:
+
+    uv run python scripts/replay_webhook.py --pr-url https://github.com/owner/repo/pull/123
+    uv run python scripts/replay_webhook.py --payload delivery.json
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+
+import httpx
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+load_dotenv()
+
+from app.services.github_service import parse_github_pr_url  # noqa: E402
+from app.services.webhook_service import sign_payload  # noqa: E402
+
+
+def build_payload(pr_url: str, action: str) -> dict:
+    """Minimal ``pull_request`` payload with the fields the app reads."""
+    owner, repo, pr_number = parse_github_pr_url(pr_url)
+    return {
+        "action": action,
+        "number": pr_number,
+        "pull_request": {"number": pr_number, "html_url": pr_url, "state": "open"},
+        "repository": {"full_name": f"{owner}/{repo}"},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--payload", help="JSON file with a recorded delivery body")
+    source.add_argument("--pr-url", help="build a minimal payload for this PR")
+    parser.add_argument("--action", default="synchronize", help="action for --pr-url payloads")
+    parser.add_argument("--event", default="pull_request")
+    parser.add_argument("--url", default="http://localhost:8001/webhooks/github")
+    parser.add_argument("--secret", default=os.getenv("GITHUB_WEBHOOK_SECRET", ""))
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("set GITHUB_WEBHOOK_SECRET or pass --secret")
+    if args.payload:
+        with open(args.payload, "rb") as f:
+            body = f.read()
+    else:
+        body = json.dumps(build_payload(args.pr_url, args.action)).encode()
+
+    response = httpx.post(
+        args.url,
+        content=body,
+        headers={
+            "Content-Type": "application/json",
+            "X-GitHub-Event": args.event,
+            "X-GitHub-Delivery": str(uuid.uuid4()),
+            "X-Hub-Signature-256": sign_payload(body, args.secret),
+        },
+    )
+    print(response.status_code, response.text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+"""
+Shared test setup.
+
+The services read their settings from the environment at import time, so the
+environment is pinned here, before any test imports the app: no GitHub token
+or OpenAI key (mock data and mock generations), a throwaway PR store, and no
+on-disk caches.
+"""
+import os
+import tempfile
+
+_DATA_DIR = tempfile.mkdtemp(prefix="pr-toolbox-tests-")
+
+os.environ.update({
+    "GITHUB_TOKEN": "",
+    "GITHUB_TOKENS": "",
+    "OPENAI_API_KEY": "",
+    "PR_STORE_PATH": os.path.join(_DATA_DIR, "pr_store.sqlite3"),
+    "REPO_SYNC_TOKEN": "",
+    "LLM_CACHE_DIR": "",
+    "JINJA_CACHE_DIR": "",
+    "LOG_LEVEL": "WARNING",
+})
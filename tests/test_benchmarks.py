@@ -0,0 +1,68 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
+
+from app.services import github_service, github_tokens, pr_store
+from app.services.github_tokens import TokenPool
+from benchmarks.load_test import request_once
+from benchmarks.stub_servers import StubConfig, create_github_app
+
+
+def test_rest_and_graphql_backends_build_the_same_snapshot(monkeypatch):
+    config = StubConfig(latency_ms=0, jitter_ms=0, files=3, commits=6)
+    monkeypatch.setattr(github_tokens, "_pool", TokenPool(["stub-token"]))
+    monkeypatch.setattr(pr_store, "get_pr_snapshot", lambda *args: None)
+    monkeypatch.setattr(pr_store, "save_pr_snapshot", lambda *args: None)
+
+    async def fetch(backend: str, pr_number: int):
+        monkeypatch.setattr(github_service, "GITHUB_BACKEND", backend)
+        transport = httpx.ASGITransport(app=create_github_app(config))
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "app", pr_number)
+
+    for pr_number in (1, 2, 7):
+        rest = asyncio.run(fetch("rest", pr_number))
+        graphql = asyncio.run(fetch("graphql", pr_number))
+        assert rest == graphql
+        assert rest.labels and rest.contributors and rest.files and rest.user.avatar_url
+
+
+def load_test_app() -> FastAPI:
+    app = FastAPI()
+
+    def page(tool: str, kind: str) -> HTMLResponse:
+        return HTMLResponse(f'<div sse-connect="/generate-pr-{tool}/stream/{kind}?a=1&amp;b=2"></div>')
+
+    @app.post("/generate-pr-description/stream")
+    async def post_description():
+        return page("description", "ok")
+
+    @app.post("/generate-pr-review/stream")
+    async def post_review():
+        return page("review", "cut")
+
+    @app.post("/generate-pr-description")
+    async def accepted():
+        return Response(status_code=202)
+
+    @app.get("/generate-pr-{tool}/stream/{kind}")
+    async def stream(tool: str, kind: str, a: str, b: str):
+        events = ["event: chunk\ndata: hi\n\n"] + (["event: done\ndata: ok\n\n"] if kind == "ok" else [])
+        return StreamingResponse(iter(events), media_type="text/event-stream")
+
+    return app
+
+
+def test_load_test_counts_non_200_and_unfinished_streams_as_failures():
+    async def scenario():
+        transport = httpx.ASGITransport(app=load_test_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+            return [
+                await request_once(client, name, 1, "acme/app")
+                for name in ("description-stream", "review-stream", "description")
+            ]
+
+    assert asyncio.run(scenario()) == [None, "stream without done", "202"]
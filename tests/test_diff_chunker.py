@@ -0,0 +1,51 @@
+from typing import List
+
+from app.utils import diff_chunker
+from app.utils.diff_chunker import DiffChunk, DiffChunker
+from app.utils.prompt_budget import count_tokens
+
+
+def file_diff(name: str, hunks: int, lines: int) -> List[str]:
+    diff = [f"diff --git a/{name} b/{name}", f"--- a/{name}", f"+++ b/{name}"]
+    for hunk in range(hunks):
+        diff.append(f"@@ -{hunk * 10},3 +{hunk * 10},3 @@")
+        diff.extend(f"+    value_{hunk}_{line} = compute({line})" for line in range(lines))
+    return diff
+
+
+def chunk(lines: List[str], **options) -> tuple:
+    chunker = DiffChunker(**options)
+    chunks: List[DiffChunk] = []
+    for line in lines:
+        chunks.extend(chunker.feed(line))
+    chunks.extend(chunker.close())
+    return chunks, chunker
+
+
+def test_chunks_are_measured_with_the_prompt_token_counter(monkeypatch):
+    seen = []
+    monkeypatch.setattr(diff_chunker, "count_tokens", lambda text: seen.append(text) or count_tokens(text))
+    chunks, _ = chunk(file_diff("a.py", 1, 3))
+
+    assert seen[0] == "diff --git a/a.py b/a.py"
+    assert chunks[0].tokens == count_tokens(chunks[0].text)
+
+
+def test_small_files_share_a_chunk_and_large_ones_split_at_hunks():
+    lines = file_diff("a.py", 1, 2) + file_diff("b.py", 1, 2) + file_diff("big.py", 6, 20)
+    chunks, chunker = chunk(lines, max_tokens=400)
+
+    assert chunks[0].files == ["a.py", "b.py"]
+    assert all(piece.files == ["big.py"] for piece in chunks[1:]) and len(chunks) > 2
+    assert all(piece.tokens <= 400 for piece in chunks)
+    assert all(piece.text.startswith("diff --git a/big.py") for piece in chunks[1:])
+    assert chunker.files == 3 and chunker.skipped == []
+
+
+def test_oversized_hunks_are_truncated_and_extra_files_skipped():
+    lines = file_diff("huge.py", 1, 500) + file_diff("next.py", 1, 2)
+    chunks, chunker = chunk(lines, max_tokens=200, max_chunks=1)
+
+    assert len(chunks) == 1 and chunks[0].files == ["huge.py"]
+    assert chunks[0].text.endswith("... [hunk truncated]")
+    assert chunker.skipped == ["next.py"]
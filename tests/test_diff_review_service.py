@@ -0,0 +1,117 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from app.models.github_snapshot import PRSnapshot
+from app.services import diff_review_service
+from app.utils.diff_chunker import DiffChunk
+
+
+def make_pr(additions: int = 20, changed_files: int = 2) -> PRSnapshot:
+    return PRSnapshot(
+        title="Add retry budget",
+        repository="acme/app",
+        pr_number=7,
+        head_sha="abc123",
+        additions=additions,
+        changed_files=changed_files,
+    )
+
+
+def diff_lines(files: int, lines_per_file: int):
+    for index in range(files):
+        name = f"src/module_{index}.py"
+        yield from (f"diff --git a/{name} b/{name}", f"--- a/{name}", f"+++ b/{name}", f"@@ -1,{lines_per_file} +1,{lines_per_file} @@")
+        yield from (f"+    value_{i} = compute({i})  # padding to make the line longer" for i in range(lines_per_file))
+
+
+class Recorder:
+    """Stand-in for the blocking completion call that tracks concurrency."""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    def __call__(self, tool, data, timeout=None):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.calls.append((tool, data["model"], threading.current_thread().name))
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return f"note from {tool}"
+
+
+def test_chunk_calls_of_concurrent_reviews_share_one_bounded_executor(monkeypatch):
+    recorder = Recorder()
+    monkeypatch.setattr(diff_review_service, "_complete", recorder)
+    monkeypatch.setattr(
+        diff_review_service, "_executor",
+        concurrent.futures.ThreadPoolExecutor(max_workers=3, thread_name_prefix="diff-review"),
+    )
+
+    async def reviews():
+        chunks = [DiffChunk(files=[f"f{i}.py"], text="+x = 1") for i in range(6)]
+        # Three reviews at once, six chunks each
+        await asyncio.gather(*(
+            diff_review_service._review_chunk(make_pr(), chunk) for _ in range(3) for chunk in chunks
+        ))
+
+    asyncio.run(reviews())
+    assert len(recorder.calls) == 18
+    assert recorder.peak <= 3
+    assert all(thread.startswith("diff-review") for _, _, thread in recorder.calls)
+
+
+def test_chunk_calls_are_routed_by_their_own_prompt_size(monkeypatch):
+    recorder = Recorder(delay=0)
+    monkeypatch.setattr(diff_review_service, "_complete", recorder)
+    small = DiffChunk(files=["a.py"], text="+x = 1")
+    full = DiffChunk(files=["b.py"], text="\n".join(f"+    value_{i} = compute({i})" for i in range(400)))
+
+    # A huge PR's chunks are still small prompts and never go to the large model
+    asyncio.run(diff_review_service._review_chunk(make_pr(additions=20, changed_files=2), small))
+    asyncio.run(diff_review_service._review_chunk(make_pr(additions=5000, changed_files=80), small))
+    asyncio.run(diff_review_service._review_chunk(make_pr(additions=5000, changed_files=80), full))
+    assert [model for _, model, _ in recorder.calls] == ["gpt-4o-mini", "gpt-4o-mini", "gpt-3.5-turbo"]
+
+
+def test_large_diff_is_reviewed_in_chunks(monkeypatch):
+    recorder = Recorder(delay=0)
+    monkeypatch.setattr(diff_review_service, "_complete", recorder)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(diff_review_service, "get_token_pool", lambda: True)
+    monkeypatch.setattr(diff_review_service, "DIFF_REVIEW_CHUNK_TOKENS", 500)
+
+    async def fake_diff(owner, repo, pr_number):
+        for line in diff_lines(files=6, lines_per_file=60):
+            yield line
+
+    monkeypatch.setattr(diff_review_service.github_service, "iter_pr_diff_lines", fake_diff)
+    request = asyncio.run(diff_review_service.build_diff_review_request(make_pr(additions=360, changed_files=6)))
+
+    chunk_calls = [call for call in recorder.calls if call[0] == "review_chunk"]
+    assert len(chunk_calls) > 1
+    assert "Findings from the diff, by part" in request["messages"][-1]["content"]
+
+
+def test_small_diff_goes_into_the_review_prompt(monkeypatch):
+    recorder = Recorder(delay=0)
+    monkeypatch.setattr(diff_review_service, "_complete", recorder)
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    monkeypatch.setattr(diff_review_service, "get_token_pool", lambda: True)
+
+    async def fake_diff(owner, repo, pr_number):
+        for line in diff_lines(files=1, lines_per_file=5):
+            yield line
+
+    monkeypatch.setattr(diff_review_service.github_service, "iter_pr_diff_lines", fake_diff)
+    request = asyncio.run(diff_review_service.build_diff_review_request(make_pr()))
+
+    assert recorder.calls == []
+    assert "```diff" in request["messages"][-1]["content"]
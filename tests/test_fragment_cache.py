@@ -0,0 +1,53 @@
+import gzip
+
+from fastapi.testclient import TestClient
+
+import main
+from app.utils import fragment_cache
+from app.utils.fragment_cache import FragmentCache
+
+
+def test_pages_answer_if_none_match_with_304():
+    client = TestClient(main.app)
+    partial = client.get("/pr-description", headers={"HX-Request": "true"})
+    full = client.get("/pr-description")
+
+    assert partial.status_code == full.status_code == 200
+    assert partial.headers["ETag"] != full.headers["ETag"]
+    assert "HX-Request" in partial.headers["Vary"]
+
+    again = client.get("/pr-description", headers={"HX-Request": "true", "If-None-Match": partial.headers["ETag"]})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["ETag"] == partial.headers["ETag"]
+
+
+def test_large_fragments_are_compressed_once(monkeypatch):
+    monkeypatch.setattr(fragment_cache, "brotli", None)
+    client = TestClient(main.app)
+    plain = client.get("/pr-description", headers={"Accept-Encoding": "identity"})
+    compressed = client.get("/pr-description", headers={"Accept-Encoding": "gzip"})
+    refused = client.get("/pr-description", headers={"Accept-Encoding": "gzip;q=0"})
+
+    assert len(plain.content) >= fragment_cache.COMPRESS_MIN_BYTES
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    # The test client decodes gzip transparently
+    assert compressed.content == plain.content
+    assert "Content-Encoding" not in refused.headers
+
+
+def test_context_is_only_built_on_a_miss():
+    cache = FragmentCache(main.templates, max_entries=1)
+    built = []
+
+    def context():
+        built.append(1)
+        return {"generated_description": "Adds caching"}
+
+    template = "pr-description/pr-description.html"
+    first = cache.render(template, context, key=("acme/app", 1, "v1"))
+    second = cache.render(template, context, key=("acme/app", 1, "v1"))
+    cache.render(template, context, key=("acme/app", 1, "v2"))
+
+    assert second is first and len(built) == 2
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 1
+    assert gzip.decompress(first.encoded("gzip")) == first.body
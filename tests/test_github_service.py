@@ -0,0 +1,216 @@
+import asyncio
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.services import github_service, github_tokens, pr_store
+from app.services.github_tokens import TokenPool
+from app.utils.response_cache import ResponseCache
+from benchmarks.stub_servers import StubConfig, create_github_app
+
+
+@pytest.fixture
+def stub_github(monkeypatch):
+    """Point the service at the stub GitHub app with one pooled token and no PR store."""
+    monkeypatch.setattr(github_tokens, "_pool", TokenPool(["stub-token"]))
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "rest")
+    monkeypatch.setattr(github_service, "github_response_cache", ResponseCache())
+    monkeypatch.setattr(pr_store, "get_pr_snapshot", lambda *args: None)
+    monkeypatch.setattr(pr_store, "save_pr_snapshot", lambda *args: None)
+    return create_github_app(StubConfig(latency_ms=0, jitter_ms=0, files=2, commits=3))
+
+
+def test_follow_up_calls_run_concurrently(monkeypatch, stub_github):
+    in_flight, peak, urls = [0], [0], []
+    get_json = github_service._get_json
+
+    async def tracking_get_json(url, timeout, type=None):
+        urls.append(url)
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        await asyncio.sleep(0.01)
+        try:
+            return await get_json(url, timeout, type)
+        finally:
+            in_flight[0] -= 1
+
+    monkeypatch.setattr(github_service, "_get_json", tracking_get_json)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=stub_github)
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "app", 3)
+
+    snapshot = asyncio.run(scenario())
+
+    # The PR itself first, then labels, files and commits at once
+    assert urls[0] == "/repos/acme/app/pulls/3" and len(urls) == 4
+    assert peak[0] == 3
+    assert snapshot.labels and len(snapshot.files) == 2 and snapshot.contributors
+
+
+def test_failed_follow_up_calls_leave_their_fields_empty(monkeypatch, stub_github):
+    stub = httpx.ASGITransport(app=stub_github)
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/labels"):
+            return httpx.Response(500)
+        return await stub.handle_async_request(request)
+
+    async def scenario():
+        mock = httpx.MockTransport(route)
+        async with httpx.AsyncClient(transport=mock, base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "app", 5)
+
+    snapshot = asyncio.run(scenario())
+
+    assert snapshot.labels == () and snapshot.files and snapshot.head_sha
+
+
+def test_client_is_shared_until_closed():
+    async def scenario():
+        first = github_service.get_github_client()
+        same = github_service.get_github_client()
+        await github_service.close_github_client()
+        return first, same, github_service.get_github_client()
+
+    first, same, reopened = asyncio.run(scenario())
+
+    assert first is same and reopened is not first
+    assert not reopened.is_closed
+    asyncio.run(github_service.close_github_client())
+
+
+def test_stale_responses_are_revalidated_with_their_etag(monkeypatch, stub_github):
+    cache = ResponseCache(ttl=60)
+    monkeypatch.setattr(github_service, "github_response_cache", cache)
+    sent = []
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        sent.append(request.headers.get("If-None-Match"))
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"X-RateLimit-Remaining": "4999"})
+        return httpx.Response(200, json=[{"name": "bug"}], headers={"ETag": '"v1"'})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            url = "/repos/acme/app/issues/1/labels"
+            first = await github_service._get_json(url, timeout=5)
+            fresh = await github_service._get_json(url, timeout=5)
+            cache.get(url).stored_at -= 120
+            revalidated = await github_service._get_json(url, timeout=5)
+            return first, fresh, revalidated
+
+    first, fresh, revalidated = asyncio.run(scenario())
+
+    assert first == fresh == revalidated == [{"name": "bug"}]
+    # Fresh hits skip the network; the stale one is a conditional request
+    assert sent == [None, '"v1"']
+    assert (cache.hits, cache.misses, cache.not_modified) == (1, 1, 1)
+
+
+def test_graphql_backend_is_one_request_billed_to_graphql(monkeypatch, stub_github):
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "graphql")
+    stub, requests = httpx.ASGITransport(app=stub_github), []
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        requests.append((request.method, request.url.path))
+        return await stub.handle_async_request(request)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "app", 4)
+
+    snapshot = asyncio.run(scenario())
+
+    assert requests == [("POST", "/graphql")]
+    assert snapshot.head_sha and snapshot.files and snapshot.contributors
+    assert [token["requests"] for token in github_tokens._pool.stats()["tokens"]] == [1]
+    assert "graphql" in github_tokens._pool.stats()["tokens"][0]["quota"]
+
+
+def test_graphql_errors_fall_back_to_mock_data(monkeypatch, stub_github):
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "graphql")
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"data": {"repository": None}, "errors": [{"type": "NOT_FOUND"}]})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "missing", 4)
+
+    snapshot = asyncio.run(scenario())
+
+    assert snapshot.title == "Sample PR #4" and snapshot.head_sha == ""
+
+
+def test_rate_limits_on_every_token_are_a_503_not_mock_data(monkeypatch, stub_github):
+    monkeypatch.setattr(github_tokens, "_pool", TokenPool(["a-token", "b-token", "c-token"], reserve=0))
+    sent = []
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        sent.append(request.headers["Authorization"])
+        return httpx.Response(429, headers={"Retry-After": "30"})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            await github_service._fetch_github_pr_data("acme", "app", 1)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+
+    assert len(set(sent)) == 3
+    assert raised.value.status_code == 503
+    assert 29 <= int(raised.value.headers["Retry-After"]) <= 31
+
+
+def test_graphql_rate_limit_errors_are_a_503(monkeypatch, stub_github):
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "graphql")
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"data": None, "errors": [{"type": "RATE_LIMITED", "message": "API rate limit exceeded"}]})
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            await github_service._fetch_github_pr_data("acme", "app", 1)
+
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(scenario())
+
+    assert raised.value.status_code == 503 and "Retry-After" in raised.value.headers
+
+
+def test_snapshots_with_failed_follow_ups_are_not_stored(monkeypatch):
+    monkeypatch.setattr(github_tokens, "_pool", TokenPool(["stub-token"]))
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "rest")
+    stub = httpx.ASGITransport(app=create_github_app(StubConfig(latency_ms=0, jitter_ms=0, files=2, commits=3)))
+    failures = [1]
+
+    async def route(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/labels") and failures:
+            failures.pop()
+            return httpx.Response(500)
+        return await stub.handle_async_request(request)
+
+    async def fetch():
+        # A fresh response cache each time, as on another worker
+        monkeypatch.setattr(github_service, "github_response_cache", ResponseCache())
+        async with httpx.AsyncClient(transport=httpx.MockTransport(route), base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            return await github_service._fetch_github_pr_data("acme", "partial", 6)
+
+    partial = asyncio.run(fetch())
+    assert partial.labels == ()
+    assert pr_store.get_pr_snapshot("acme", "partial", 6, partial.updated_at, partial.head_sha) is None
+
+    complete = asyncio.run(fetch())
+    assert complete.labels
+    assert pr_store.get_pr_snapshot("acme", "partial", 6, complete.updated_at, complete.head_sha) == complete
@@ -0,0 +1,56 @@
+import msgspec
+import pytest
+
+from app.models.github_snapshot import (
+    Account,
+    PRSnapshot,
+    WireFile,
+    WireLabel,
+    WirePullRequest,
+    decode_snapshot,
+    encode_snapshot,
+    to_account,
+    to_labels,
+)
+from app.models.pr_models import PRReviewResponse
+
+
+def test_wire_structs_read_only_the_declared_fields():
+    raw = (
+        b'{"number": 5, "title": "Add cache", "body": null, "user": {"login": "ada", "avatar_url": "https://a/ada",'
+        b' "site_admin": false}, "head": {"sha": "abc", "repo": {"id": 1}}, "_links": {"self": {"href": "x"}},'
+        b' "updated_at": "2024-01-02T00:00:00Z", "additions": 3}'
+    )
+    pr = msgspec.json.decode(raw, type=WirePullRequest)
+
+    assert (pr.number, pr.title, pr.body, pr.head.sha, pr.additions) == (5, "Add cache", None, "abc", 3)
+    assert pr.assignees == [] and pr.state == "open"
+    with pytest.raises(msgspec.ValidationError):
+        msgspec.json.decode(b'[{"filename": "a.py", "additions": "many"}]', type=list[WireFile])
+
+
+def test_snapshots_round_trip_and_share_accounts():
+    snapshot = PRSnapshot(
+        title="Add cache", user=to_account(Account("ada", "https://a/ada")), labels=to_labels([WireLabel("bug")]),
+        repository="acme/app", pr_number=5, head_sha="abc",
+    )
+    decoded = decode_snapshot(encode_snapshot(snapshot))
+
+    assert decoded == snapshot
+    assert decoded.user is snapshot.user and decoded.labels[0] is snapshot.labels[0]
+    with pytest.raises(AttributeError):
+        decoded.title = "changed"
+    assert to_account(Account("", "")) is None
+
+
+def test_response_models_accept_and_emit_plain_json():
+    snapshot = PRSnapshot(title="Add cache", repository="acme/app", pr_number=5, files=())
+    response = PRReviewResponse(
+        title="Add cache", repository="acme/app", pr_type="feature", priority="low", assignee="",
+        review_analysis="ok", review_score=7, github_data=snapshot,
+    )
+
+    restored = PRReviewResponse.model_validate_json(response.model_dump_json())
+
+    assert restored.github_data == snapshot
+    assert isinstance(restored.github_data, PRSnapshot)
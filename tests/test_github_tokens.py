@@ -0,0 +1,64 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services import github_tokens
+from app.services.github_tokens import GitHubRateLimited, TokenPool
+
+
+def test_remaining_quota_is_exported_on_metrics():
+    pool = TokenPool(["ghp_first1111", "ghp_second2222"])
+    pool.update("ghp_first1111", {"X-RateLimit-Remaining": "4200", "X-RateLimit-Limit": "5000"})
+    pool.update("ghp_second2222", {"X-RateLimit-Remaining": "10", "X-RateLimit-Limit": "5000"})
+    assert asyncio.run(pool.acquire()) == "ghp_first1111"
+    pool.mark_exhausted("ghp_second2222", "graphql", retry_after=30)
+
+    body = TestClient(main.app).get("/metrics").text
+
+    assert 'pr_toolbox_github_quota_remaining{token="...1111",resource="core"} 4199' in body
+    assert 'pr_toolbox_github_quota_remaining{token="...2222",resource="graphql"} 0' in body
+    assert 'pr_toolbox_github_quota_limit{token="...1111",resource="core"} 5000' in body
+    assert 'pr_toolbox_github_quota_remaining{token="...2222",resource="core"} 10' in body
+    assert "ghp_first" not in body
+
+
+def test_calls_go_to_the_token_with_the_most_quota():
+    pool = TokenPool(["a-token", "b-token"], reserve=10)
+    pool.update("a-token", {"X-RateLimit-Remaining": "12"})
+    pool.update("b-token", {"X-RateLimit-Remaining": "13"})
+
+    picked = [asyncio.run(pool.acquire()) for _ in range(4)]
+
+    assert picked == ["b-token", "a-token", "b-token", "a-token"]
+    assert pool.stats()["delayed"] == 0
+
+
+def test_exhausted_pools_wait_for_the_earliest_reset(monkeypatch):
+    pool = TokenPool(["a-token", "b-token"], reserve=0, max_wait=30)
+    pool.mark_exhausted("a-token", "core", retry_after=20)
+    pool.mark_exhausted("b-token", "core", retry_after=5)
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+        # The window of the sooner token rolls over while we wait
+        pool._state("b-token").quota("core").reset_at = time.time() - 1
+
+    monkeypatch.setattr(github_tokens.asyncio, "sleep", fake_sleep)
+
+    assert asyncio.run(pool.acquire()) == "b-token"
+    assert len(slept) == 1 and 4 <= slept[0] <= 5
+    assert pool.stats()["delayed"] == 1
+
+
+def test_waits_longer_than_max_wait_are_rejected():
+    pool = TokenPool(["a-token"], reserve=0, max_wait=30)
+    pool.mark_exhausted("a-token", "core", retry_after=600)
+
+    with pytest.raises(GitHubRateLimited) as raised:
+        asyncio.run(pool.acquire())
+    assert 590 <= raised.value.retry_after <= 600
+    assert pool.stats()["rejected"] == 1
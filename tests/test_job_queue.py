@@ -0,0 +1,107 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main
+from app.models.github_snapshot import Account, PRSnapshot
+from app.models.pr_models import PRDescriptionResponse
+from app.services.job_queue import JobQueue
+
+
+def make_result() -> PRDescriptionResponse:
+    snapshot = PRSnapshot(title="Add cache", repository="acme/app", pr_number=3, user=Account("octocat", "https://a/1"))
+    return PRDescriptionResponse(
+        title="Add cache", repository="acme/app", description="", pr_type="feature",
+        priority="medium", assignee="octocat", generated_description="Adds a cache.", github_data=snapshot,
+    )
+
+
+def decode(kind: str, result: str) -> PRDescriptionResponse:
+    return PRDescriptionResponse.model_validate_json(result)
+
+
+def test_persisted_job_is_visible_to_another_worker():
+    async def scenario():
+        async def pipeline():
+            return make_result()
+
+        worker_a, worker_b = JobQueue(workers=1), JobQueue(workers=1)
+        job = await worker_a.submit("description", pipeline, persist=True)
+        await job.done.wait()
+        found = await worker_b.lookup(job.id, decode)
+        await worker_a.stop()
+        return job, found
+
+    job, found = asyncio.run(scenario())
+
+    assert found is not None and found is not job
+    assert found.status == "done"
+    assert found.result == job.result
+    assert found.result.github_data.user.login == "octocat"
+    assert found.run_time >= 0
+
+
+def test_failed_job_keeps_its_error():
+    async def scenario():
+        async def pipeline():
+            raise ValueError("bad PR URL")
+
+        worker_a, worker_b = JobQueue(workers=1), JobQueue(workers=1)
+        job = await worker_a.submit("description", pipeline, persist=True)
+        await job.done.wait()
+        found = await worker_b.lookup(job.id, decode)
+        await worker_a.stop()
+        return found
+
+    found = asyncio.run(scenario())
+
+    assert found.status == "failed"
+    assert str(found.error) == "bad PR URL"
+
+
+def test_unknown_job_is_not_found():
+    assert asyncio.run(JobQueue().lookup("missing", decode)) is None
+
+
+def test_streams_share_the_worker_limit():
+    async def scenario():
+        queue = JobQueue(workers=1)
+        release = asyncio.Event()
+        started = []
+
+        def source(name):
+            async def events():
+                started.append(name)
+                yield f"{name}-1"
+                await release.wait()
+                yield f"{name}-2"
+            return events
+
+        first = await queue.stream("stream", source("a"))
+        second = await queue.stream("stream", source("b"))
+        await asyncio.sleep(0.05)
+        started_before_release = list(started)
+        release.set()
+        events = [event async for event in first] + [event async for event in second]
+        await queue.stop()
+        return started_before_release, events
+
+    started_before_release, events = asyncio.run(scenario())
+
+    assert started_before_release == ["a"]
+    assert events == ["a-1", "a-2", "b-1", "b-2"]
+
+
+def test_job_poll_served_from_the_store():
+    with TestClient(main.app) as client:
+        response = client.post("/jobs/description", data={"pr_url": "https://github.com/acme/app/pull/5"})
+        job_id = response.json()["job_id"]
+        for _ in range(100):
+            if client.get(f"/jobs/{job_id}").json()["status"] == "done":
+                break
+        # Another worker has no in-memory record of the job
+        main.job_queue._jobs.clear()
+        body = client.get(f"/jobs/{job_id}").json()
+
+    assert body["status"] == "done"
+    assert body["result"]["repository"] == "acme/app"
@@ -0,0 +1,38 @@
+import json
+
+import pytest
+
+from app.models.github_snapshot import Account, PRSnapshot
+from app.models.pr_models import PRReviewResponse
+from app.utils import json_response
+from app.utils.json_response import dumps, result_payload
+
+
+def make_result() -> PRReviewResponse:
+    snapshot = PRSnapshot(title="Añadir caché", repository="acme/app", pr_number=4, user=Account("zoë", "https://a/z"))
+    return PRReviewResponse(
+        title="Añadir caché", repository="acme/app", pr_type="feature", priority="medium",
+        assignee="", review_analysis="Looks good ✓", review_score=8, github_data=snapshot,
+    )
+
+
+def test_dumps_without_orjson_is_compact_utf8_json(monkeypatch):
+    monkeypatch.setattr(json_response, "orjson", None)
+    payload = result_payload(make_result(), "full")
+
+    body = dumps(payload)
+
+    assert json.loads(body) == payload
+    assert "Añadir caché".encode() in body and b'", "' not in body
+
+
+def test_lean_view_replaces_the_snapshot_with_a_summary():
+    payload = result_payload(make_result())
+    assert "github_data" not in payload
+    assert payload["pr"]["pr_number"] == 4
+
+
+def test_fields_selection_rejects_unknown_names():
+    assert result_payload(make_result(), fields=["title", "review_score"]) == {"title": "Añadir caché", "review_score": 8}
+    with pytest.raises(ValueError, match="Unknown fields: nope"):
+        result_payload(make_result(), fields=["nope"])
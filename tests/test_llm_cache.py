@@ -0,0 +1,60 @@
+import os
+import time
+
+from app.services.llm_cache import LLMCache, completion_key
+
+
+def payload(index: int) -> dict:
+    return {"model": "gpt-4o-mini", "messages": [{"role": "user", "content": f"PR {index}"}], "max_tokens": 100}
+
+
+def disk_files(directory) -> list:
+    return [name for _, _, names in os.walk(directory) for name in names if name.endswith(".json")]
+
+
+def test_memory_tier_is_an_lru():
+    cache = LLMCache(max_entries=2)
+    cache.store(payload(1), "one")
+    cache.store(payload(2), "two")
+    cache.get(payload(1))
+    cache.store(payload(3), "three")
+
+    assert cache.get(payload(2)) is None
+    assert cache.get(payload(1)) == "one"
+    assert cache.stats()["evictions"] == 1
+
+
+def test_disk_is_capped_keeping_the_recently_used(tmp_path):
+    cache = LLMCache(max_entries=1, directory=str(tmp_path), disk_max_entries=3, sweep_every=100)
+    for index in range(5):
+        cache.store(payload(index), f"content {index}")
+        path = cache._path(completion_key(payload(index)))
+        os.utime(path, (time.time() - 100 + index, time.time() - 100 + index))
+    # Reading entry 0 from disk makes it the most recently used
+    assert LLMCache(directory=str(tmp_path)).get(payload(0)) == "content 0"
+
+    assert cache.sweep() == 2
+    fresh = LLMCache(directory=str(tmp_path))
+    assert [fresh.get(payload(index)) for index in range(5)] == ["content 0", None, None, "content 3", "content 4"]
+    assert cache.stats()["disk_evictions"] == 2
+
+
+def test_expired_disk_entries_are_misses(tmp_path):
+    cache = LLMCache(max_entries=1, directory=str(tmp_path), disk_ttl=60)
+    cache.store(payload(1), "old")
+    (path,) = [os.path.join(root, name) for root, _, names in os.walk(tmp_path) for name in names]
+    os.utime(path, (time.time() - 120, time.time() - 120))
+
+    assert LLMCache(directory=str(tmp_path), disk_ttl=60).get(payload(1)) is None
+    assert disk_files(tmp_path) == []
+
+
+def test_writes_trigger_a_sweep(tmp_path):
+    cache = LLMCache(max_entries=1, directory=str(tmp_path), disk_max_entries=2, sweep_every=3)
+    counts = []
+    for index in range(7):
+        cache.store(payload(index), "x")
+        counts.append(len(disk_files(tmp_path)))
+
+    # Swept on the first write, then on every third
+    assert counts == [1, 2, 3, 2, 3, 4, 2]
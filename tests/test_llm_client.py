@@ -0,0 +1,115 @@
+import io
+import json
+import time
+
+import pytest
+import requests
+
+from app.services import llm_client
+from app.services.llm_client import CircuitBreaker, CircuitOpenError, LLMClient
+
+
+def make_response(status: int = 200, body: bytes = b'{"choices": []}', headers: dict = None) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.raw = io.BytesIO(body)
+    response.headers.update(headers or {})
+    return response
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(LLMClient, "_backoff", staticmethod(lambda attempt, retry_after=None: 0))
+    client = LLMClient()
+    yield client
+    client.close()
+
+
+def test_retryable_statuses_are_retried(monkeypatch, client):
+    responses = [make_response(503), make_response(429, headers={"Retry-After": "1"}), make_response(200)]
+    sent = []
+    monkeypatch.setattr(client, "_post", lambda tool, data, timeout=None, stream=False: sent.append(tool) or responses.pop(0))
+
+    assert client.complete("review", {"messages": []}) == {"choices": []}
+    assert len(sent) == 3 and client.retries == 2
+    assert client.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(monkeypatch, client):
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: make_response(400))
+
+    with pytest.raises(requests.HTTPError):
+        client.complete("review", {})
+    assert client.retries == 0
+
+
+def test_breaker_fails_fast_then_lets_one_probe_through():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == CircuitBreaker.HALF_OPEN
+    # Only the one probe while half-open
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_open_circuit_rejects_calls_without_sending(monkeypatch, client):
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: pytest.fail("request sent while the circuit is open"))
+    for _ in range(client.breaker.failure_threshold):
+        client.breaker.record_failure()
+
+    with pytest.raises(CircuitOpenError):
+        client.complete("description", {})
+    assert client.rejected == 1
+
+
+def test_slow_calls_are_hedged_and_the_first_answer_wins(monkeypatch, client):
+    monkeypatch.setattr(llm_client, "LLM_HEDGE", True)
+    monkeypatch.setattr(llm_client, "LLM_HEDGE_MIN_DELAY", 0.02)
+    client._latencies["review"].extend([0.01] * llm_client.HEDGE_MIN_SAMPLES)
+    calls = []
+
+    def post(tool, data, timeout=None, stream=False):
+        calls.append(tool)
+        if len(calls) == 1:
+            time.sleep(0.3)
+            return make_response(body=b'{"copy": "primary"}')
+        return make_response(body=b'{"copy": "hedge"}')
+
+    monkeypatch.setattr(client, "_post", post)
+
+    assert client.complete("review", {}) == {"copy": "hedge"}
+    assert client.hedged == 1 and client.hedge_wins == 1
+
+
+def test_stream_yields_content_deltas(monkeypatch, client):
+    events = [{"choices": [{"delta": {"content": part}}]} for part in ("Adds ", "a cache.")]
+    body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+    response = make_response(body=body.encode(), headers={"Content-Type": "text/event-stream"})
+    response.encoding = "utf-8"
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: response)
+
+    assert list(client.stream("description", {})) == ["Adds ", "a cache."]
+
+
+def test_a_probe_failing_with_any_error_reopens_the_circuit(monkeypatch, client):
+    client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    client.breaker.record_failure()
+
+    def broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError("connection dropped mid-body")
+
+    monkeypatch.setattr(client, "_post", broken)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        client.complete("review", {})
+    assert client.breaker.state == CircuitBreaker.OPEN
+
+    # The next probe goes out and closes the circuit again
+    monkeypatch.setattr(client, "_post", lambda *args, **kwargs: make_response())
+    assert client.complete("review", {}) == {"choices": []}
+    assert client.breaker.state == CircuitBreaker.CLOSED
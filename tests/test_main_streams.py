@@ -0,0 +1,54 @@
+import html
+import re
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.models.github_snapshot import PRSnapshot
+from app.services import pr_store
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_stream_url_names_the_pr_version(client):
+    response = client.post(
+        "/generate-pr-description/stream",
+        data={"pr_url": "https://github.com/acme/app/pull/12"},
+        headers={"HX-Request": "true"},
+    )
+
+    assert response.status_code == 200
+    match = re.search(r'sse-connect="([^"]+)"', response.text)
+    url = html.unescape(match.group(1))
+    assert url.startswith("/generate-pr-description/stream/")
+    assert "/12?" in url and "updated_at=" in url and "head_sha=" in url
+
+
+def test_stream_is_served_without_a_prior_post(client):
+    # Another worker never saw the POST that rendered this URL
+    with client.stream("GET", "/generate-pr-description/stream/acme/app/12") as response:
+        body = "".join(response.iter_text())
+
+    assert response.status_code == 200
+    assert "event: done" in body
+
+
+def test_stream_reads_the_snapshot_from_the_shared_store(client, monkeypatch):
+    snapshot = PRSnapshot(title="Stored PR", repository="acme/app", pr_number=42, updated_at="2024-01-02T00:00:00Z", head_sha="feed")
+    pr_store.save_pr_snapshot("acme", "app", 42, snapshot)
+
+    async def no_fetch(*args):
+        raise AssertionError("stream should not refetch a stored PR version")
+
+    monkeypatch.setattr(main, "fetch_github_pr_data", no_fetch)
+    url = main._stream_url("/generate-pr-description/stream", snapshot)
+    with client.stream("GET", url) as response:
+        body = "".join(response.iter_text())
+
+    assert response.status_code == 200
+    assert "event: done" in body
@@ -0,0 +1,60 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.metrics import (
+    MetricsMiddleware,
+    Registry,
+    github_endpoint,
+    registry,
+    server_timing_header,
+    stage,
+    upstream,
+)
+
+
+def test_stages_and_upstream_calls_reach_the_server_timing_header():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        with stage("classify"):
+            pass
+        for _ in range(2):
+            with upstream("github", "/repos/{owner}/{repo}/pulls/{n}/files") as call:
+                call.status = 200
+        return {"id": item_id}
+
+    response = TestClient(app).get("/items/5")
+    timing = response.headers["Server-Timing"]
+
+    assert timing.startswith("classify;dur=")
+    assert 'github.files;desc="2 calls";dur=' in timing
+    assert ", total;dur=" in timing
+    # Routes are labelled by template, not by path
+    assert 'route="/items/{item_id}",status="200"' in registry.render()
+
+
+def test_github_endpoints_are_templated():
+    assert github_endpoint("/repos/acme/app/pulls/12/files?per_page=100") == "/repos/{owner}/{repo}/pulls/{n}/files"
+    assert github_endpoint("/graphql") == "/graphql"
+
+
+def test_registry_renders_prometheus_text():
+    local = Registry()
+    requests = local.counter("demo_requests", "Requests.", ("status",))
+    latency = local.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(status="200")
+    requests.inc(2, status="200")
+    latency.observe(0.5)
+
+    text = local.render()
+
+    assert "# TYPE demo_requests counter" in text
+    assert 'demo_requests_total{status="200"} 3' in text
+    assert 'demo_seconds_bucket{le="0.1"} 0' in text and 'demo_seconds_bucket{le="1"} 1' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 1' in text and "demo_seconds_count 1" in text
+
+
+def test_server_timing_names_are_sanitised():
+    assert server_timing_header([("llm call", 0.0125)], 0.02) == "llm_call;dur=12.5, total;dur=20.0"
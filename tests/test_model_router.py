@@ -0,0 +1,56 @@
+import json
+
+from app.models.github_snapshot import ChangedFile, PRSnapshot
+from app.services import model_router
+from app.services.model_router import ModelRouter
+
+
+def make_pr(additions: int = 10, changed_files: int = 1, title: str = "Add export button") -> PRSnapshot:
+    files = tuple(ChangedFile(f"src/f{i}.py", "modified", additions // max(changed_files, 1), 0) for i in range(changed_files))
+    return PRSnapshot(title=title, repository="acme/app", pr_number=1, additions=additions, changed_files=changed_files, files=files)
+
+
+def request(prompt: str = "Describe this PR") -> dict:
+    return {"model": "gpt-3.5-turbo", "messages": [{"role": "user", "content": prompt}], "max_tokens": 1000}
+
+
+def test_prs_are_routed_by_size_and_priority():
+    router = ModelRouter()
+
+    assert router.select(make_pr(), request()).name == "small"
+    assert router.select(make_pr(additions=400, changed_files=12), request()).name == "medium"
+    assert router.select(make_pr(additions=5000, changed_files=80), request()).name == "large"
+    # Urgent fixes skip the small model however small they are
+    assert router.select(make_pr(title="Critical security fix"), request()).name == "medium"
+    # So do small PRs with a long prompt
+    assert router.select(make_pr(), request("word " * 8000)).name == "large"
+
+
+def test_route_sets_model_budget_and_timeout():
+    router = ModelRouter()
+    data = request()
+
+    routed, timeout = router.route("review", make_pr(), data)
+
+    assert (routed["model"], routed["max_tokens"], timeout) == ("gpt-4o-mini", 700, 15)
+    assert data["model"] == "gpt-3.5-turbo"
+    assert router.stats()["chosen"] == {"review": {"small": 1}}
+
+
+def test_disabled_routing_leaves_requests_alone(monkeypatch):
+    monkeypatch.setattr(model_router, "MODEL_ROUTING_ENABLED", False)
+    data = request()
+
+    assert ModelRouter().route("description", make_pr(), data) == (data, None)
+
+
+def test_route_table_is_loaded_from_a_file(monkeypatch, tmp_path):
+    table = {"routes": [{"name": "only", "model": "local-model", "timeout": 5}]}
+    path = tmp_path / "routes.json"
+    path.write_text(json.dumps(table))
+    monkeypatch.setenv("MODEL_ROUTES", str(path))
+    assert model_router._load_routes() == table
+
+    # An invalid table keeps the defaults
+    path.write_text(json.dumps({"routes": [{"name": "broken"}]}))
+    assert model_router._load_routes() is model_router.DEFAULT_ROUTES
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from app.models.github_snapshot import Contributor, PRSnapshot, encode_snapshot
+from app.services import pr_analytics, pr_store
+
+
+@pytest.fixture(autouse=True)
+def fresh_columns(monkeypatch):
+    monkeypatch.setattr(pr_analytics, "_columns", None)
+    monkeypatch.setattr(pr_analytics, "_rows", {})
+    monkeypatch.setattr(pr_analytics, "_seq", 0)
+
+
+def save(repo: str, number: int, title: str, updated_at: str = "2024-01-01", **fields) -> PRSnapshot:
+    snapshot = PRSnapshot(
+        title=title, repository=f"acme/{repo}", pr_number=number, updated_at=updated_at, head_sha="abc", **fields
+    )
+    pr_store.save_pr_snapshot("acme", repo, number, snapshot)
+    return snapshot
+
+
+def summary(repository: str):
+    return asyncio.run(pr_analytics.get_pr_analytics(repository))
+
+
+def test_reads_only_changed_rows_and_never_reclassifies(monkeypatch):
+    save("inc", 1, "Fix crash", contributors=(Contributor("ada", "", 3),))
+    save("inc", 2, "Add export")
+    assert summary("acme/inc")["pr_types"] == {"bugfix": 1, "feature": 1}
+
+    reads = []
+    changes = pr_store.analytics_changes
+    monkeypatch.setattr(pr_store, "analytics_changes", lambda since: reads.append(changes(since)) or reads[-1])
+    monkeypatch.setattr(pr_store, "_decode", lambda snapshot: pytest.fail("analytics decoded a snapshot"))
+
+    save("inc", 1, "Update docs readme", updated_at="2024-01-02")
+    pr_store.save_review_score("acme", "inc", 2, "abc", 8)
+    result = summary("acme/inc")
+
+    assert [len(rows) for rows in reads] == [2]
+    assert result["pr_types"] == {"docs": 1, "feature": 1}
+    assert result["review_scores"]["reviewed"] == 1 and result["review_scores"]["average"] == 8.0
+    assert result["top_contributors"] == []
+
+    # Unchanged store: nothing read, columns reused
+    columns = pr_analytics._columns
+    summary("acme/inc")
+    assert reads[-1] == [] and pr_analytics._columns is columns
+
+
+def test_every_write_gets_a_higher_seq():
+    save("seq", 1, "Fix crash")
+    first = pr_store.analytics_changes(0)[-1][0]
+    save("seq", 1, "Fix crash again", updated_at="2024-01-02")
+    second = pr_store.analytics_changes(first)
+    pr_store.save_review_score("acme", "seq", 1, "abc", 5)
+    third = pr_store.analytics_changes(second[-1][0])
+
+    assert [row[3] for row in second] == [1]
+    assert [(row[3], row[-1]) for row in third] == [(1, 5)]
+
+
+def test_snapshots_without_analytics_rows_are_backfilled():
+    snapshot = PRSnapshot(title="Refactor parser", repository="acme/old", pr_number=9, updated_at="2024-01-01", head_sha="x")
+    conn = pr_store._connect()
+    with conn:
+        conn.execute(
+            "INSERT INTO pr_snapshots VALUES (?, ?, ?, ?, ?, ?, ?)",
+            ("acme", "old", 9, snapshot.updated_at, snapshot.head_sha, encode_snapshot(snapshot).decode(), 0.0),
+        )
+
+    assert summary("acme/old")["pr_types"] == {"refactor": 1}
+    assert pr_store.backfill_analytics() == 0
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from app.models.github_snapshot import Label, PRSnapshot
+from app.utils import pr_classifier
+from app.utils.pr_classifier import DEFAULT_RULES, PRClassifier
+
+
+def classify(title: str, body: str = "", labels=()):
+    return PRClassifier().classify([Label(name) for name in labels], title, body)
+
+
+def test_keywords_match_whole_words_only():
+    assert classify("Address the padding")["pr_type"] == "feature"  # default, not "add"
+    assert classify("Update docs", "This fixes the login.")["pr_type"] == "bugfix"
+    assert classify("Handle (urgent) request")["priority"] == "urgent"
+    assert classify("Make bug-fix tooling nicer")["pr_type"] == "feature"  # hyphens join words
+    assert classify("nice-to-have: tidy up")["priority"] == "low"
+
+
+def test_first_rule_wins_over_later_ones():
+    # "add" (feature) appears before "fix" (bugfix), but bugfix is the earlier rule
+    assert classify("Add a retry and fix the timeout")["pr_type"] == "bugfix"
+    assert classify("Minor but important change")["priority"] == "high"
+
+
+def test_labels_take_precedence_over_text():
+    result = classify("Fix crash", labels=["documentation", "low-priority"])
+    assert result == {"pr_type": "docs", "priority": "low"}
+
+
+def test_memo_is_keyed_by_pr_version():
+    classifier = PRClassifier()
+    first = PRSnapshot(title="Fix crash", repository="acme/app", pr_number=1, updated_at="2024-01-01", head_sha="a")
+    edited = PRSnapshot(title="Add retry", repository="acme/app", pr_number=1, updated_at="2024-01-02", head_sha="a")
+
+    assert classifier.classify_snapshot(first)["pr_type"] == "bugfix"
+    assert classifier.classify_snapshot(edited)["pr_type"] == "feature"
+    assert list(classifier._memo) == [("acme/app", 1, "2024-01-01", "a"), ("acme/app", 1, "2024-01-02", "a")]
+
+
+def test_snapshots_without_a_version_are_not_memoized():
+    classifier = PRClassifier()
+    classifier.classify_snapshot(PRSnapshot(title="Fix crash"))
+    assert classifier._memo == {}
+
+
+@pytest.mark.parametrize("rules", [
+    {},
+    {"pr_type": {"labels": [], "keywords": []}},
+    {"pr_type": {"labels": [], "keywords": [["bugfix", "fix"]], "default": "feature"}},
+    {"pr_type": {"labels": [], "keywords": [["bugfix", ["bug fix"]]], "default": "feature"}},
+])
+def test_invalid_rules_are_rejected(rules):
+    with pytest.raises(ValueError):
+        PRClassifier(rules)
+
+
+def test_invalid_rules_file_falls_back_to_defaults(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"pr_type": {"labels": [], "keywords": [["bugfix", ["fix it"]]], "default": "x"}}))
+    monkeypatch.setenv("PR_CLASSIFIER_RULES", str(path))
+    assert pr_classifier._load_rules() is DEFAULT_RULES
+
+    path.write_text(json.dumps({"pr_type": {"labels": [], "keywords": [["bugfix", ["oops"]]], "default": "x"}}))
+    assert PRClassifier(pr_classifier._load_rules()).classify([], "Oops.", "") == {"pr_type": "bugfix"}
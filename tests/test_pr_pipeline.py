@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+from fastapi.testclient import TestClient
+
+import main
+from app.models.github_snapshot import ChangedFile, PRSnapshot
+from app.services import pr_pipeline, pr_review_service
+from app.services.llm_client import CircuitOpenError
+
+
+def test_analysis_fetches_once_and_generates_both_concurrently(monkeypatch):
+    fetches, review_started = [], threading.Event()
+
+    async def fetch(owner, repo, pr_number):
+        fetches.append((owner, repo, pr_number))
+        return PRSnapshot(title="Fix crash on empty input", repository=f"{owner}/{repo}", pr_number=pr_number)
+
+    def describe(github_data):
+        # Only returns if the review is already running alongside it
+        assert review_started.wait(timeout=2), "review did not start while the description was generating"
+        return "Generated description"
+
+    async def review(github_data):
+        review_started.set()
+        await asyncio.sleep(0.01)
+        return "Looks good", 8
+
+    monkeypatch.setattr(pr_pipeline, "fetch_github_pr_data", fetch)
+    monkeypatch.setattr(pr_pipeline, "generate_pr_description_with_openai", describe)
+    monkeypatch.setattr(pr_pipeline, "_review", review)
+
+    result = asyncio.run(pr_pipeline.build_pr_analysis("https://github.com/acme/app/pull/12"))
+
+    assert fetches == [("acme", "app", 12)]
+    assert result.generated_description == "Generated description"
+    assert (result.review_analysis, result.review_score) == ("Looks good", 8)
+    assert result.pr_type == "bugfix"
+
+
+def test_analysis_endpoint_returns_both_results():
+    with TestClient(main.app) as client:
+        response = client.post(
+            "/generate-pr-analysis",
+            data={"pr_url": "https://github.com/acme/app/pull/31"},
+            params={"fields": "generated_description,review_score,repository"},
+        )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["repository"] == "acme/app"
+    assert body["generated_description"] and isinstance(body["review_score"], int)
+
+
+def test_only_real_review_scores_are_recorded(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(pr_pipeline, "record_review_score", lambda github_data, score: recorded.append((github_data.pr_number, score)))
+
+    async def no_diff(github_data):
+        return None
+
+    monkeypatch.setattr(pr_pipeline, "build_diff_review_request", no_diff)
+
+    def review(pr_number: int):
+        files = (ChangedFile("src/export.py", "modified", 150, 20), ChangedFile("src/views.py", "modified", 80, 0))
+        pr = PRSnapshot(title="Add export", repository="acme/app", pr_number=pr_number, additions=230, deletions=20,
+                        changed_files=2, files=files)
+        return asyncio.run(pr_pipeline._review(pr))
+
+    # No API key: mock review
+    review(101)
+
+    def outage(tool, data, timeout=None):
+        raise CircuitOpenError("LLM provider unavailable (circuit open)")
+
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(pr_review_service.llm_client, "complete", outage)
+    assert review(102)[1] == 5
+
+    answer = {"choices": [{"message": {"content": "Clean change with good tests."}}]}
+    monkeypatch.setattr(pr_review_service.llm_client, "complete", lambda tool, data, timeout=None: answer)
+    analysis, score = review(103)
+
+    assert recorded == [(103, score)]
@@ -0,0 +1,76 @@
+import logging
+
+from app.utils import prompt_budget
+from app.utils.prompt_budget import Section, TokenUsage, collapse_code_blocks, count_tokens, fit_sections, trim_lines
+
+BODY = " ".join(["The exporter now streams rows instead of buffering the whole table."] * 300)
+CONTRIBUTORS = "\n".join(f"contributor{i} ({i} commits)" for i in range(200))
+
+
+def sections() -> list:
+    return [
+        Section("title", "Stream CSV exports", priority=0),
+        Section("contributors", CONTRIBUTORS, priority=3, kind="lines"),
+        Section("body", BODY, priority=2),
+    ]
+
+
+def fitted_tokens(texts: dict) -> int:
+    return sum(count_tokens(text) for text in texts.values())
+
+
+def test_lowest_priority_sections_are_trimmed_first():
+    budget = count_tokens(BODY) + 60
+    texts = fit_sections("test", sections(), budget)
+
+    # The body fits once the contributors are cut, so it is left alone
+    assert texts["body"] == BODY and texts["title"] == "Stream CSV exports"
+    assert texts["contributors"].startswith("contributor0 (0 commits)")
+    assert texts["contributors"].endswith("more")
+    assert fitted_tokens(texts) <= budget
+
+
+def test_fitted_prompts_stay_within_the_budget():
+    for budget in (100, 500, 1500):
+        texts = fit_sections("test", sections(), budget)
+        assert budget - 20 <= fitted_tokens(texts) <= budget, budget
+        assert "tokens omitted" in texts["body"]
+
+
+def test_long_code_blocks_are_collapsed_before_trimming():
+    log = "\n".join(f"ERROR line {i}: connection reset" for i in range(200))
+    body = f"Fixes the crash below.\n\n```text\n{log}\n```\nDone."
+
+    collapsed = collapse_code_blocks(body)
+
+    assert "[... 185 lines omitted ...]" in collapsed
+    assert "ERROR line 9:" in collapsed and "ERROR line 195:" in collapsed and "ERROR line 100:" not in collapsed
+    assert collapsed.startswith("Fixes the crash below.") and collapsed.endswith("```\nDone.")
+    # When collapsing is enough, nothing else in the body is cut
+    texts = fit_sections("test", [Section("body", body, priority=2)], count_tokens(collapsed))
+    assert texts["body"] == collapsed
+
+
+def test_lines_keep_their_head_and_count_the_rest():
+    assert trim_lines(CONTRIBUTORS, 10_000) == CONTRIBUTORS
+    trimmed = trim_lines(CONTRIBUTORS, 40)
+    assert count_tokens(trimmed) <= 40
+    kept = trimmed.splitlines()
+    assert kept[-1] == f"... and {200 - len(kept) + 1} more"
+
+
+def test_usage_counters_and_per_call_log(caplog):
+    usage = TokenUsage()
+    usage.record_prompt("review", {"title": 5, "body": 900}, {"title": 5, "body": 400})
+    usage.record_prompt("review", {"title": 5, "body": 100}, {"title": 5, "body": 100})
+    with caplog.at_level(logging.INFO, logger=prompt_budget.__name__):
+        usage.record_response("review", {"messages": []}, {"usage": {"prompt_tokens": 700, "completion_tokens": 300}}, "text")
+        usage.record_response("review", {"messages": [{"content": "abcd" * 25}]}, {}, "abcd" * 10)
+
+    stats = usage.stats()["tools"]["review"]
+
+    assert (stats["prompts"], stats["trimmed_prompts"]) == (2, 1)
+    assert stats["sections"]["body"] == {"tokens": 500, "trimmed_tokens": 500}
+    assert stats["requests"] == 2 and stats["max_prompt_tokens"] == 700
+    assert stats["avg_completion_tokens"] == (300 + count_tokens("abcd" * 10)) / 2
+    assert "LLM review call: 700 prompt tokens, 300 completion tokens" in caplog.text
@@ -0,0 +1,52 @@
+import asyncio
+
+import httpx
+from fastapi.testclient import TestClient
+
+import main
+from app.services import github_service, github_tokens, repo_sync
+from app.services.github_tokens import TokenPool
+from benchmarks.stub_servers import StubConfig, create_github_app
+
+
+def test_sync_endpoint_requires_the_bearer_token(monkeypatch):
+    calls = []
+
+    async def fake_sync(owner, repo):
+        calls.append((owner, repo))
+        return {"repository": f"{owner}/{repo}"}
+
+    monkeypatch.setattr(main, "sync_repository", fake_sync)
+    client = TestClient(main.app)
+
+    # Disabled while no token is configured
+    assert client.post("/repos/acme/app/sync", headers={"Authorization": "Bearer "}).status_code == 401
+
+    monkeypatch.setattr(repo_sync, "REPO_SYNC_TOKEN", "s3cret")
+    assert client.post("/repos/acme/app/sync").status_code == 401
+    assert client.post("/repos/acme/app/sync", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.post("/repos/acme/app/sync", headers={"Authorization": "Basic s3cret"}).status_code == 401
+    response = client.post("/repos/acme/app/sync", headers={"Authorization": "Bearer s3cret"})
+
+    assert response.status_code == 200 and response.json() == {"repository": "acme/app"}
+    assert calls == [("acme", "app")]
+
+
+def test_resync_only_lists_what_changed(monkeypatch):
+    monkeypatch.setattr(github_tokens, "_pool", TokenPool(["stub-token"]))
+    monkeypatch.setattr(github_service, "GITHUB_BACKEND", "rest")
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=create_github_app(StubConfig(latency_ms=0, jitter_ms=0, repo_prs=5)))
+        async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+            monkeypatch.setattr(github_service, "_client", client)
+            listed = await github_service.list_pull_requests("acme", "synced", page=1, per_page=3)
+            first = await repo_sync.sync_repository("acme", "synced")
+            second = await repo_sync.sync_repository("acme", "synced")
+        return listed, first, second
+
+    listed, first, second = asyncio.run(scenario())
+
+    assert len(listed) == 3 and listed[0].updated_at >= listed[-1].updated_at
+    assert (first["listed"], first["fetched"], first["complete"]) == (5, 5, True)
+    assert (second["listed"], second["fetched"], second["cursor"]) == (0, 0, first["cursor"])
@@ -0,0 +1,35 @@
+from app.utils.response_cache import ResponseCache
+
+
+def test_conditional_headers_carry_both_validators():
+    cache = ResponseCache()
+    cache.store("/a", {"x": 1}, '"etag"', "Wed, 01 May 2024 00:00:00 GMT")
+
+    assert cache.conditional_headers(cache.get("/a")) == {
+        "If-None-Match": '"etag"',
+        "If-Modified-Since": "Wed, 01 May 2024 00:00:00 GMT",
+    }
+    assert cache.conditional_headers(None) == {}
+
+
+def test_entries_expire_but_stay_for_revalidation():
+    cache = ResponseCache(ttl=60)
+    cache.store("/a", "body", '"v1"', None)
+    entry = cache.get("/a")
+    entry.stored_at -= 61
+
+    assert not cache.is_fresh(entry)
+    assert cache.refresh("/a") is entry and cache.is_fresh(entry)
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.store("/repos/acme/app/pulls/1", 1, None, None)
+    cache.store("/repos/acme/app/pulls/2", 2, None, None)
+    cache.get("/repos/acme/app/pulls/1")
+    cache.store("/repos/acme/other/pulls/3", 3, None, None)
+
+    assert cache.get("/repos/acme/app/pulls/2") is None
+    assert cache.stats()["evictions"] == 1
+    assert cache.invalidate("/repos/acme/app/") == 1
+    assert cache.stats()["entries"] == 1
@@ -0,0 +1,82 @@
+import asyncio
+import threading
+import time
+
+import httpx
+
+import main
+from app.services.job_queue import JobQueue
+from app.utils.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_result():
+    async def scenario():
+        flight, calls = SingleFlight(), []
+
+        async def fetch(value):
+            calls.append(value)
+            await asyncio.sleep(0.01)
+            return value * 2
+
+        results = await asyncio.gather(*(flight.do("key", fetch, 21) for _ in range(5)))
+        return results, calls, flight.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+
+    assert results == [42] * 5
+    assert calls == [21]
+    assert stats["calls"] == 1 and stats["shared"] == 4
+
+
+def test_stream_is_shared_until_it_closes():
+    async def scenario():
+        flight, queue, starts = SingleFlight(), JobQueue(workers=2), []
+        release = asyncio.Event()
+
+        async def events():
+            starts.append(len(starts))
+            yield "one"
+            await release.wait()
+            yield "two"
+
+        first = await flight.stream("pr", queue.stream, "stream", events)
+        await asyncio.sleep(0.01)
+        # Joins mid-stream and still sees the first event
+        late = await flight.stream("pr", queue.stream, "stream", events)
+        release.set()
+        seen = ([event async for event in first], [event async for event in late])
+        again = await flight.stream("pr", queue.stream, "stream", events)
+        await queue.stop()
+        return first, late, again, seen, starts, flight.stats()
+
+    first, late, again, seen, starts, stats = asyncio.run(scenario())
+
+    assert late is first and again is not first
+    assert seen == (["one", "two"], ["one", "two"])
+    assert stats["shared"] == 1
+
+
+def test_concurrent_sse_clients_share_one_upstream_stream(monkeypatch):
+    calls = []
+
+    def slow_stream(github_data):
+        calls.append(threading.get_ident())
+        for word in ("Adds ", "a ", "cache."):
+            time.sleep(0.02)
+            yield word
+
+    monkeypatch.setattr(main, "stream_pr_description_with_openai", slow_stream)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            url = "/generate-pr-description/stream/acme/app/77?updated_at=2024-01-01&head_sha=abc"
+            bodies = await asyncio.gather(*(client.get(url) for _ in range(4)))
+        await main.job_queue.stop()
+        return [response.text for response in bodies]
+
+    bodies = asyncio.run(scenario())
+
+    assert len(calls) == 1
+    assert len(set(bodies)) == 1
+    assert "cache." in bodies[0] and "event: done" in bodies[0]
@@ -0,0 +1,67 @@
+from typing import Tuple
+
+from app.models.github_snapshot import ChangedFile, PRSnapshot
+from app.utils.trivial_pr import TrivialPRDetector
+
+
+def make_pr(*files: Tuple[str, int], title: str = "Update files") -> PRSnapshot:
+    changed = tuple(ChangedFile(path, "modified", lines, 0) for path, lines in files)
+    return PRSnapshot(
+        title=title,
+        repository="acme/app",
+        pr_number=1,
+        changed_files=len(changed),
+        additions=sum(lines for _, lines in files),
+        files=changed,
+    )
+
+
+detector = TrivialPRDetector()
+
+
+def category(pr: PRSnapshot, tool: str = "description"):
+    match = detector.detect(pr, tool)
+    return match.category if match else None
+
+
+def test_docs_only_prs_are_trivial():
+    assert category(make_pr(("README.md", 40), ("docs/guide/setup.rst", 120)), "review") == "docs"
+    assert category(make_pr(("LICENSE", 20), ("CHANGELOG", 15), ("NOTICE.txt", 3)), "review") == "docs"
+    assert category(make_pr(("docs/images/flow.png", 0), ("docs/index.md", 30)), "review") == "docs"
+
+
+def test_code_manifests_and_lockfiles_are_never_docs():
+    for path, lines in [
+        ("requirements.txt", 305),
+        ("CMakeLists.txt", 200),
+        (".github/CODEOWNERS", 50),
+        ("LICENSE.py", 40),
+        ("docs/conf.py", 800),
+    ]:
+        assert category(make_pr((path, lines)), "review") is None, path
+    # A docs change that also touches code is not docs-only
+    assert category(make_pr(("README.md", 10), ("src/app.py", 30))) is None
+
+
+def test_dependency_bumps_are_trivial():
+    pr = make_pr(("uv.lock", 300), ("pyproject.toml", 2))
+    assert category(pr) == "dependencies"
+    assert category(pr, "review") == "dependencies"
+
+
+def test_tiny_code_changes_only_skip_the_description():
+    pr = make_pr(("src/auth.py", 8), title="Disable token check")
+    assert category(pr) == "tiny"
+    assert category(pr, "review") is None
+
+
+def test_high_priority_and_incomplete_file_lists_are_never_trivial():
+    assert category(make_pr(("README.md", 5), title="Urgent docs fix")) is None
+    pr = make_pr(("README.md", 5))
+    incomplete = PRSnapshot(**{**{f: getattr(pr, f) for f in pr.__struct_fields__}, "changed_files": 3})
+    assert category(incomplete) is None
+
+
+def test_repository_overrides():
+    overridden = TrivialPRDetector({"repos": {"acme/app": {"enabled": False}}})
+    assert overridden.detect(make_pr(("README.md", 5))) is None
@@ -0,0 +1,49 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from app.services import warmup as warmup_module
+from app.services.warmup import Warmup
+
+
+def test_heavy_modules_are_not_imported_at_startup():
+    code = "import main, sys; print(sorted(m for m in ('numpy', 'tiktoken', 'app.services.pr_analytics') if m in sys.modules))"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    ).stdout
+
+    assert output.strip() == "[]"
+
+
+def test_warmup_compiles_templates_and_reports_failed_steps(monkeypatch):
+    def broken_import():
+        raise ImportError("no such module")
+
+    monkeypatch.setattr(warmup_module, "_load_deferred", broken_import)
+    warmup = Warmup()
+
+    asyncio.run(warmup.run(main.templates.env))
+    stats = warmup.stats()
+
+    assert warmup.ready and stats["templates"] > 10
+    assert set(stats["steps"]) == {"templates", "imports"}
+    assert stats["errors"] == {"imports": "no such module"}
+
+
+def test_ready_turns_200_once_the_warmup_is_done(monkeypatch):
+    monkeypatch.setattr(main, "warmup", Warmup())
+    with TestClient(main.app) as client:
+        for _ in range(100):
+            response = client.get("/ready")
+            if response.status_code == 200:
+                break
+            assert response.status_code == 503 and response.json()["ready"] is False
+            time.sleep(0.02)
+
+    assert response.status_code == 200 and response.json()["ready"] is True
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from app.services import webhook_service
+from app.services.job_queue import JobQueue
+from app.services.webhook_service import sign_payload
+from app.utils.response_cache import ResponseCache
+
+
+class RecordingQueue:
+    """Stands in for the job queue; jobs stay queued until marked otherwise."""
+
+    def __init__(self):
+        self.jobs = []
+
+    async def submit(self, kind, func, *args, persist=False):
+        job = SimpleNamespace(id=f"job-{len(self.jobs)}", kind=kind, args=args, status="queued", finished_at=None)
+        self.jobs.append(job)
+        return job
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    queue = RecordingQueue()
+    monkeypatch.setattr(webhook_service, "precompute_queue", queue)
+    monkeypatch.setattr(webhook_service, "_pending", {})
+    monkeypatch.setattr(webhook_service, "GITHUB_WEBHOOK_SECRET", "hook-secret")
+    return queue
+
+
+def delivery(action: str = "synchronize", number: int = 7, state: str = "open") -> dict:
+    return {
+        "action": action,
+        "repository": {"full_name": "acme/app"},
+        "pull_request": {"number": number, "state": state, "html_url": f"https://github.com/acme/app/pull/{number}"},
+    }
+
+
+def post(client: TestClient, payload: dict, event: str = "pull_request", secret: str = "hook-secret"):
+    body = json.dumps(payload).encode()
+    headers = {"X-GitHub-Event": event, "X-Hub-Signature-256": sign_payload(body, secret)}
+    return client.post("/webhooks/github", content=body, headers=headers)
+
+
+def test_unsigned_or_missigned_deliveries_are_rejected(queue):
+    client = TestClient(main.app)
+
+    assert client.post("/webhooks/github", content=b"{}", headers={"X-GitHub-Event": "ping"}).status_code == 401
+    assert post(client, delivery(), secret="wrong").status_code == 401
+    assert post(client, {}, event="ping").json() == {"status": "pong"}
+    assert queue.jobs == []
+
+
+def test_updates_invalidate_the_pr_and_queue_one_precompute(monkeypatch, queue):
+    cache = ResponseCache()
+    for url in ("/repos/acme/app/pulls/7", "/repos/acme/app/pulls/7/files?per_page=100",
+                "/repos/acme/app/issues/7/labels", "/repos/acme/app/pulls/70"):
+        cache.store(url, [], None, None)
+    monkeypatch.setattr(webhook_service, "github_response_cache", cache)
+    client = TestClient(main.app)
+
+    first = post(client, delivery()).json()
+    # A burst of pushes joins the job that has not started yet
+    second = post(client, delivery(action="edited")).json()
+
+    assert first["status"] == "queued" and first["invalidated"] == 3
+    assert second["job_id"] == first["job_id"]
+    assert cache.get("/repos/acme/app/pulls/70") is not None
+    assert [job.args for job in queue.jobs] == [("https://github.com/acme/app/pull/7",)]
+
+    # Once the job is running, the next update needs a fresh one
+    queue.jobs[0].status = "running"
+    assert post(client, delivery()).json()["job_id"] == "job-1"
+
+
+def test_closed_prs_and_other_actions_are_not_precomputed(queue):
+    assert asyncio.run(webhook_service.handle_pull_request_event(delivery(action="labeled")))["status"] == "ignored"
+    assert asyncio.run(webhook_service.handle_pull_request_event(delivery(state="closed")))["status"] == "invalidated"
+    assert queue.jobs == []
+
+
+def test_precomputes_never_fill_the_interactive_queue(monkeypatch):
+    monkeypatch.setattr(webhook_service, "_pending", {})
+    monkeypatch.setattr(webhook_service, "precompute_queue", JobQueue(workers=1, max_pending=2))
+
+    async def slow_analysis(pr_url):
+        await asyncio.sleep(1)
+
+    monkeypatch.setattr(webhook_service, "build_pr_analysis", slow_analysis)
+
+    async def burst():
+        results = [await webhook_service.handle_pull_request_event(delivery(number=n)) for n in range(1, 6)]
+        depth = main.job_queue.stats()["depth"]
+        await webhook_service.precompute_queue.stop()
+        return results, depth
+
+    results, depth = asyncio.run(burst())
+
+    assert [result["status"] for result in results].count("queued") == 3
+    assert results[-1] == {**results[-1], "status": "invalidated", "precompute": "skipped, queue full"}
+    assert depth == 0